@@ -0,0 +1,350 @@
+"""
+Optional asyncio download engine (requires aiohttp).
+
+All listings share one event loop running on a background thread, so many
+listings can be in flight at once without a thread pool per listing. Each host
+gets its own semaphore: listing pages (redfin.com / zillow.com) are kept to a
+handful of concurrent requests while the photo CDNs get a much wider limit.
+"""
+import asyncio
+import atexit
+import concurrent.futures
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+import cancellation
+import download_engine
+import http_transport
+import profiling
+import rate_limit
+import retry_policy
+import telemetry
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+AVAILABLE = aiohttp is not None
+
+# Concurrency limits
+LISTING_HOST_LIMIT = 4
+CDN_HOST_LIMIT = 64
+TOTAL_LIMIT = 256
+
+LISTING_DOMAINS = ('redfin.com', 'zillow.com')
+
+
+def is_listing_host(host):
+    """True for the listing sites themselves (not their photo CDNs)."""
+    host = host.lower()
+    return any(host == d or host.endswith('.' + d) for d in LISTING_DOMAINS)
+
+
+def telemetry_trace():
+    """
+    aiohttp hooks that time DNS and connection setup into the
+    telemetry.RequestRecord passed as a request's trace_request_ctx.
+    """
+    trace = aiohttp.TraceConfig()
+
+    async def on_connection_create_start(session, ctx, params):
+        ctx.connect_started = time.perf_counter()
+        ctx.dns = 0.0
+
+    async def on_dns_resolvehost_start(session, ctx, params):
+        ctx.dns_started = time.perf_counter()
+
+    async def on_dns_resolvehost_end(session, ctx, params):
+        ctx.dns = time.perf_counter() - ctx.dns_started
+
+    async def on_connection_create_end(session, ctx, params):
+        record = ctx.trace_request_ctx
+        if isinstance(record, telemetry.RequestRecord):
+            total = time.perf_counter() - ctx.connect_started
+            record.connection_opened(ctx.dns, max(0.0, total - ctx.dns))
+
+    async def on_request_end(session, ctx, params):
+        record = ctx.trace_request_ctx
+        if isinstance(record, telemetry.RequestRecord):
+            record.headers_received(params.response.status)
+
+    trace.on_connection_create_start.append(on_connection_create_start)
+    trace.on_dns_resolvehost_start.append(on_dns_resolvehost_start)
+    trace.on_dns_resolvehost_end.append(on_dns_resolvehost_end)
+    trace.on_connection_create_end.append(on_connection_create_end)
+    trace.on_request_end.append(on_request_end)
+    return trace
+
+
+class AsyncDownloadEngine:
+    """Runs ImageJobs on a shared event loop with per-host semaphores."""
+
+    def __init__(self, listing_limit=LISTING_HOST_LIMIT, cdn_limit=CDN_HOST_LIMIT, total_limit=TOTAL_LIMIT):
+        if not AVAILABLE:
+            raise RuntimeError("The async engine requires aiohttp (pip install aiohttp)")
+        self.listing_limit = listing_limit
+        self.cdn_limit = cdn_limit
+        self.total_limit = total_limit
+        self._loop = None
+        self._thread = None
+        self._session = None
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    # --- event loop management ---
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+                self._thread.start()
+        return self._loop
+
+    def _submit(self, coro, is_cancelled=None):
+        """
+        Run a coroutine on the engine loop and block for its result.
+
+        If `is_cancelled` is a CancelToken, cancelling it cancels the coroutine
+        (aborting its open connections) and raises RequestCancelled.
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+        if not isinstance(is_cancelled, cancellation.CancelToken):
+            return future.result()
+        handle = is_cancelled.on_cancel(future.cancel)
+        try:
+            return future.result()
+        except concurrent.futures.CancelledError:
+            raise http_transport.RequestCancelled() from None
+        finally:
+            is_cancelled.remove(handle)
+
+    async def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.total_limit, limit_per_host=0, ttl_dns_cache=300)
+            read_timeout = http_transport.IMAGE_TIMEOUT[1]
+            timeout = aiohttp.ClientTimeout(sock_connect=http_transport.IMAGE_TIMEOUT[0], sock_read=read_timeout)
+            self._session = aiohttp.ClientSession(headers=http_transport.DEFAULT_HEADERS,
+                                                  connector=connector, timeout=timeout,
+                                                  trace_configs=[telemetry_trace()])
+        return self._session
+
+    def _semaphore(self, url):
+        host = urlparse(url).netloc.lower()
+        sem = self._semaphores.get(host)
+        if sem is None:
+            limit = self.listing_limit if is_listing_host(host) else self.cdn_limit
+            sem = asyncio.Semaphore(limit)
+            self._semaphores[host] = sem
+        return sem
+
+    # --- coroutines ---
+
+    async def fetch_page_async(self, url, headers=None):
+        session = await self._get_session()
+        timeout = aiohttp.ClientTimeout(sock_connect=http_transport.PAGE_TIMEOUT[0], sock_read=http_transport.PAGE_TIMEOUT[1])
+        record = telemetry.RequestRecord(url, kind='page')
+        async with self._semaphore(url):
+            await rate_limit.bucket_for(url).acquire_async()
+            record.begin()
+            try:
+                async with session.get(url, timeout=timeout, headers=headers, trace_request_ctx=record) as response:
+                    rate_limit.observe_response(url, response.status, response.headers)
+                    response.raise_for_status()
+                    text = await response.text()
+                    record.bytes = len(text)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                telemetry.recorder.finish(record, error=type(e).__name__)
+                raise
+            telemetry.recorder.finish(record)
+            return response.status, dict(response.headers), text
+
+    async def fetch_job_async(self, job, is_cancelled, policy=None):
+        if is_cancelled():
+            return False
+        if job.existing_file():
+            return True
+
+        started = time.monotonic()
+        try:
+            for filename, img_url, variant in job.ordered_candidates():
+                attempt = 0
+                while True:
+                    if is_cancelled():
+                        return False
+                    attempt += 1
+                    job.requests += 1
+                    record = telemetry.RequestRecord(img_url, kind='image', listing=job.listing, variant=variant,
+                                                     attempt=attempt, listing_url=job.listing_url)
+                    try:
+                        async with self._semaphore(img_url):
+                            with profiling.span('image fetch', index=job.index, url=img_url, attempt=attempt):
+                                ok, status = await self.stream_to_file(img_url, job.path_for(filename),
+                                                                       is_cancelled, record)
+                        if ok:
+                            telemetry.recorder.finish(record)
+                            job.failure = None
+                            job.bytes = os.path.getsize(job.path_for(filename))
+                            job.record_success(img_url, variant)
+                            return True
+                        kind = retry_policy.classify_status(status)
+                        reason = f"HTTP {status}" if status != 200 else "placeholder image"
+                        if status is not None:
+                            telemetry.recorder.finish(record, error=reason)
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        kind, reason = retry_policy.classify_exception(e)
+                        telemetry.recorder.finish(record, error=reason if kind == retry_policy.TRANSIENT
+                                                  else type(e).__name__)
+                    if is_cancelled():
+                        return False
+                    job.failure = {'reason': reason, 'kind': kind, 'attempts': attempt, 'url': img_url}
+                    if not (policy and policy.should_retry(kind, attempt)):
+                        break
+                    await policy.sleep_async(attempt)
+            return False
+        finally:
+            job.elapsed = time.monotonic() - started
+
+    async def stream_to_file(self, url, path, is_cancelled, record=None):
+        """
+        Async twin of download_engine.stream_to_file (resumable via .part
+        files); returns (ok, status). Timings and bytes go into `record`.
+
+        File writes and hashing run on the loop's default executor, so a slow
+        disk or a large resumed partial never stalls the other transfers.
+        """
+        loop = asyncio.get_running_loop()
+        session = await self._get_session()
+        part = await loop.run_in_executor(None, download_engine.PartFile, path, url)
+        record = record or telemetry.RequestRecord(url, kind='image')
+        await rate_limit.bucket_for(url).acquire_async()
+        if is_cancelled():
+            return False, None
+        record.begin()
+        async with session.get(url, headers=part.request_headers(), trace_request_ctx=record) as response:
+            rate_limit.observe_response(url, response.status, response.headers)
+            status = response.status
+            if part.must_restart(status, response.headers):
+                await loop.run_in_executor(None, part.discard)
+                return await self.stream_to_file(url, path, is_cancelled, record)
+            f = await loop.run_in_executor(None, part.begin, status, response.headers)
+            if f is None:
+                return False, status
+            try:
+                async for chunk in response.content.iter_chunked(download_engine.CHUNK_SIZE):
+                    await loop.run_in_executor(None, part.write, f, chunk)
+                    record.bytes += len(chunk)
+                    if is_cancelled():
+                        return False, status
+            finally:
+                await loop.run_in_executor(None, f.close)
+        with profiling.span('image write', path=path):
+            return await loop.run_in_executor(None, part.finish), status
+
+    async def download_async(self, jobs, is_cancelled, on_progress, policy=None, on_image=None):
+        downloaded = 0
+        completed = 0
+        total = len(jobs)
+        tasks = []
+
+        # A CancelToken cancels every task straight away instead of waiting for one to finish
+        handle = None
+        if isinstance(is_cancelled, cancellation.CancelToken):
+            loop = asyncio.get_running_loop()
+
+            def cancel_tasks():
+                for task in tasks:
+                    task.cancel()
+            handle = is_cancelled.on_cancel(lambda: loop.call_soon_threadsafe(cancel_tasks))
+
+        try:
+            # Probe the first photo alone so the rest start on the right variant
+            if jobs and jobs[0].needs_probe():
+                tasks.append(asyncio.ensure_future(self.fetch_job_async(jobs[0], is_cancelled, policy)))
+                try:
+                    ok = await tasks[0]
+                except asyncio.CancelledError:
+                    return downloaded
+                if ok:
+                    downloaded += 1
+                completed += 1
+                if on_image:
+                    on_image(jobs[0], ok)
+                if on_progress:
+                    on_progress(completed, total, ok)
+                jobs = jobs[1:]
+
+            if is_cancelled():
+                return downloaded
+
+            async def fetch(job):
+                return job, await self.fetch_job_async(job, is_cancelled, policy)
+
+            tasks.extend(asyncio.ensure_future(fetch(job)) for job in jobs)
+            for next_done in asyncio.as_completed(tasks[-len(jobs):] if jobs else []):
+                try:
+                    job, ok = await next_done
+                except asyncio.CancelledError:
+                    break
+                if is_cancelled():
+                    break
+                if ok:
+                    downloaded += 1
+                completed += 1
+                if on_image:
+                    on_image(job, ok)
+                if on_progress:
+                    on_progress(completed, total, ok)
+        finally:
+            if handle is not None:
+                is_cancelled.remove(handle)
+            for task in tasks:
+                task.cancel()
+        return downloaded
+
+    # --- blocking wrappers (safe to call from any worker thread) ---
+
+    def fetch_page(self, url, is_cancelled=None, headers=None):
+        """Fetch a listing page through the listing-host semaphore; returns (status, headers, text)."""
+        return self._submit(self.fetch_page_async(url, headers), is_cancelled)
+
+    def run_jobs(self, jobs, is_cancelled=lambda: False, on_progress=None, policy=None, on_image=None):
+        """Download jobs on the shared loop; returns the number downloaded."""
+        return self._submit(self.download_async(jobs, is_cancelled, on_progress, policy, on_image))
+
+    def close(self):
+        if self._loop is None:
+            return
+        if self._session is not None:
+            self._submit(self._session.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Return the process-wide async engine (created on first use)."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = AsyncDownloadEngine()
+            atexit.register(_engine.close)
+        return _engine
+
+
+def fetch_page(url, is_cancelled=None, headers=None):
+    return get_engine().fetch_page(url, is_cancelled=is_cancelled, headers=headers)
+
+
+def run_jobs(jobs, is_cancelled=lambda: False, on_progress=None, policy=None, on_image=None):
+    return get_engine().run_jobs(jobs, is_cancelled=is_cancelled, on_progress=on_progress, policy=policy,
+                                 on_image=on_image)
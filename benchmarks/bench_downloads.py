@@ -0,0 +1,278 @@
+"""
+Benchmark the download engines against the local CDN stand-in (cdn_server.py).
+
+    python benchmarks/bench_downloads.py                                  # both engines, clean network
+    python benchmarks/bench_downloads.py --listings 8 --photos 40 --bandwidth 3000
+    python benchmarks/bench_downloads.py --throttle 0.02 --server-error 0.03 --slowloris 0.01
+    python benchmarks/bench_downloads.py --cancel-after 1.5               # stop mid-download, time the abort
+
+Each engine runs in its own process against a freshly started server (same
+seed, so the same fault mix), downloading real listings end to end through
+download_engine.download_listing into a temporary library. Reported per
+engine: images downloaded and failed, images/s, MB/s, p50/p99 per-image fetch
+latency (retries included), peak RSS and, with --cancel-after, how long the
+engine took to stop after its CancelToken was cancelled.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import cancellation  # noqa: E402
+import concurrency  # noqa: E402
+import download_engine  # noqa: E402
+import download_queue  # noqa: E402
+import rate_limit  # noqa: E402
+
+SERVER_SCRIPT = os.path.join(BENCH_DIR, 'cdn_server.py')
+SERVER_OPTIONS = ('photos', 'image_kb', 'latency', 'jitter', 'bandwidth', 'not_found', 'throttle', 'server_error',
+                  'slowloris', 'slowloris_seconds', 'seed')
+MB = 1024 * 1024
+# A cancelled engine must stop within this long; --cancel-after runs fail past it
+CANCEL_DEADLINE_MS = 200
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100.0 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def listing_urls(pages_base, count):
+    """Alternate Redfin and Zillow listing URLs on the stand-in server."""
+    urls = []
+    for n in range(1, count + 1):
+        if n % 2:
+            urls.append(f"{pages_base}/redfin.com/CA/Testville/{n}-Benchmark-Way-90000/home/{n}")
+        else:
+            urls.append(f"{pages_base}/zillow.com/homedetails/{n}-Benchmark-Ave/{n}_zpid/")
+    return urls
+
+
+def run_engine(args):
+    """Child process: download every listing with one engine and print a JSON result line."""
+    download_engine.REDFIN_CDN = f"{args.cdn}/photo"
+    download_engine.ZILLOW_CDN = f"{args.cdn}/fp"
+    rate_limit.configure('default', args.cdn_rate, args.cdn_burst)
+
+    library = tempfile.mkdtemp(prefix='bench_downloads_')
+    token = cancellation.CancelToken()
+    budget = concurrency.WorkerBudget(args.image_budget)
+    lock = threading.Lock()
+    latencies = []
+    counts = {'ok': 0, 'failed': 0, 'bytes': 0, 'listings_failed': 0}
+    cancelled_at = []
+
+    def on_image(job, ok):
+        with lock:
+            if ok:
+                counts['ok'] += 1
+                counts['bytes'] += job.bytes
+                latencies.append(job.elapsed)
+            else:
+                counts['failed'] += 1
+
+    def download(url):
+        try:
+            download_engine.download_listing(url, library, engine=args.child, is_cancelled=token, budget=budget,
+                                             on_image=on_image)
+        except Exception as e:
+            if not token():
+                print(f"{url}: {e}", file=sys.stderr)
+                with lock:
+                    counts['listings_failed'] += 1
+
+    def cancel_later():
+        if not token.wait(args.cancel_after):
+            cancelled_at.append(time.perf_counter())
+            token.cancel()
+
+    urls = listing_urls(args.pages, args.listings)
+    started = time.perf_counter()
+    if args.cancel_after:
+        threading.Thread(target=cancel_later, daemon=True).start()
+    with ThreadPoolExecutor(max_workers=max(1, args.parallel)) as executor:
+        list(executor.map(download, urls))
+    finished = time.perf_counter()
+    if not cancelled_at:
+        token.cancel()  # stops the cancel timer
+    seconds = (cancelled_at[0] if cancelled_at else finished) - started
+
+    with urllib.request.urlopen(f"{args.cdn}/_stats", timeout=5) as response:
+        server = json.load(response)
+    if not args.keep:
+        shutil.rmtree(library, ignore_errors=True)
+
+    result = {
+        'engine': args.child,
+        'listings': len(urls),
+        'images': counts['ok'],
+        'failed': counts['failed'],
+        'listings_failed': counts['listings_failed'],
+        'seconds': round(seconds, 3),
+        'images_per_sec': round(counts['ok'] / seconds, 2) if seconds > 0 else 0.0,
+        'mb_per_sec': round(counts['bytes'] / MB / seconds, 2) if seconds > 0 else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'peak_rss_mb': round(peak_rss() / MB, 1) if peak_rss() is not None else None,
+        'cancel_ms': round((finished - cancelled_at[0]) * 1000, 1) if cancelled_at else None,
+        'server': server,
+        'library': library if args.keep else None,
+    }
+    print(json.dumps(result), flush=True)
+    return 0
+
+
+def start_server(args):
+    """Start cdn_server.py on free ports; return (process, {'cdn': url, 'pages': url})."""
+    command = [sys.executable, SERVER_SCRIPT, '--port', '0']
+    for option in SERVER_OPTIONS:
+        command += [f"--{option.replace('_', '-')}", str(getattr(args, option))]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line:
+        process.wait()
+        raise RuntimeError("the benchmark server did not start")
+    return process, json.loads(line)
+
+
+def run_child(engine, urls, args):
+    command = [sys.executable, os.path.abspath(__file__), '--child', engine, '--cdn', urls['cdn'],
+               '--pages', urls['pages'], '--listings', str(args.listings), '--parallel', str(args.parallel),
+               '--image-budget', str(args.image_budget), '--cdn-rate', str(args.cdn_rate),
+               '--cdn-burst', str(args.cdn_burst), '--cancel-after', str(args.cancel_after)]
+    if args.keep:
+        command.append('--keep')
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if args.verbose and completed.stdout:
+        print(completed.stdout.rsplit('\n', 2)[0])
+    if completed.returncode != 0 or not completed.stdout.strip():
+        print(completed.stderr, file=sys.stderr)
+        return None
+    if completed.stderr and args.verbose:
+        print(completed.stderr, file=sys.stderr)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def print_table(results, args):
+    print(f"{'engine':<8} {'images':>9} {'failed':>7} {'seconds':>8} {'img/s':>8} {'MB/s':>7} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'peak RSS':>9}" + (f" {'cancel ms':>10}" if args.cancel_after else ''))
+    for r in results:
+        rss = f"{r['peak_rss_mb']:.0f} MB" if r['peak_rss_mb'] is not None else 'n/a'
+        line = (f"{r['engine']:<8} {r['images']:>9} {r['failed']:>7} {r['seconds']:>8.2f} {r['images_per_sec']:>8.1f} "
+                f"{r['mb_per_sec']:>7.1f} {r['p50_ms']:>8.0f} {r['p99_ms']:>8.0f} {rss:>9}")
+        if args.cancel_after:
+            line += f" {r['cancel_ms'] if r['cancel_ms'] is not None else 'finished':>10}"
+        print(line)
+    for r in results:
+        served = ', '.join(f"{k} {v}" for k, v in sorted(r['server'].items()))
+        print(f"  {r['engine']} server: {served}")
+        if r['listings_failed']:
+            print(f"  {r['engine']}: {r['listings_failed']} listings failed")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the download engines against a local CDN stand-in.")
+    parser.add_argument('--engine', action='append', choices=download_engine.ENGINES,
+                        help="engine to run (repeatable; default: every engine)")
+    parser.add_argument('--listings', type=int, default=4, help="listings to download (default: 4)")
+    parser.add_argument('-p', '--parallel', type=int, default=download_queue.DEFAULT_PARALLEL_LISTINGS,
+                        help=f"listings downloaded at once (default: {download_queue.DEFAULT_PARALLEL_LISTINGS})")
+    parser.add_argument('--image-budget', type=int, default=download_queue.DEFAULT_IMAGE_BUDGET,
+                        help=f"image fetches in flight across listings (default: {download_queue.DEFAULT_IMAGE_BUDGET})")
+    parser.add_argument('--cdn-rate', type=float, default=rate_limit.DEFAULT_RATE[0],
+                        help=f"client-side CDN requests per second; 0 disables the limit "
+                             f"(default: {rate_limit.DEFAULT_RATE[0]:g})")
+    parser.add_argument('--cdn-burst', type=int, default=rate_limit.DEFAULT_RATE[1],
+                        help=f"client-side CDN burst (default: {rate_limit.DEFAULT_RATE[1]})")
+    parser.add_argument('--cancel-after', type=float, default=0,
+                        help="cancel the download after this many seconds and report how long stopping took; "
+                             f"exits 1 if an engine takes over {CANCEL_DEADLINE_MS} ms")
+    parser.add_argument('--keep', action='store_true', help="keep the downloaded libraries")
+    parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    parser.add_argument('-v', '--verbose', action='store_true', help="show the engines' own output")
+
+    server = parser.add_argument_group("server (see cdn_server.py --help)")
+    server.add_argument('--photos', type=int, default=30)
+    server.add_argument('--image-kb', type=int, default=250)
+    server.add_argument('--latency', type=float, default=30.0)
+    server.add_argument('--jitter', type=float, default=10.0)
+    server.add_argument('--bandwidth', type=float, default=0)
+    server.add_argument('--not-found', type=float, default=0.0)
+    server.add_argument('--throttle', type=float, default=0.0)
+    server.add_argument('--server-error', type=float, default=0.0)
+    server.add_argument('--slowloris', type=float, default=0.0)
+    server.add_argument('--slowloris-seconds', type=float, default=15.0)
+    server.add_argument('--seed', type=int, default=0)
+
+    # Used when this script re-runs itself for one engine
+    parser.add_argument('--child', choices=download_engine.ENGINES, help=argparse.SUPPRESS)
+    parser.add_argument('--cdn', help=argparse.SUPPRESS)
+    parser.add_argument('--pages', help=argparse.SUPPRESS)
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    if args.child:
+        return run_engine(args)
+
+    engines = args.engine or list(download_engine.ENGINES)
+    if 'async' in engines:
+        import async_engine
+        if not async_engine.AVAILABLE:
+            print("Skipping the async engine (aiohttp is not installed)", file=sys.stderr)
+            engines = [e for e in engines if e != 'async']
+
+    results = []
+    for engine in engines:
+        process, urls = start_server(args)
+        try:
+            result = run_child(engine, urls, args)
+        finally:
+            process.terminate()
+            process.wait()
+        if result is None:
+            print(f"The {engine} run failed", file=sys.stderr)
+            return 1
+        results.append(result)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results, args)
+    slow = [r for r in results if r['cancel_ms'] is not None and r['cancel_ms'] > CANCEL_DEADLINE_MS]
+    for r in slow:
+        print(f"The {r['engine']} engine took {r['cancel_ms']} ms to stop (limit {CANCEL_DEADLINE_MS} ms)",
+              file=sys.stderr)
+    return 1 if slow else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+"""
+Benchmark the listing-page extractors over a corpus of saved pages.
+
+    python benchmarks/bench_extractors.py                  # fixtures in benchmarks/fixtures
+    python benchmarks/bench_extractors.py page.html ...    # your own saved pages (redfin_*.html / zillow_*.html)
+    python benchmarks/bench_extractors.py --inflate 2      # pad each page to ~2 MB like a live listing page
+    python benchmarks/bench_extractors.py --save-baseline  # record the current numbers as the baseline
+
+Every Redfin page is run through the original BeautifulSoup extractor and the
+single-pass extractor with each available parser backend; every Zillow page
+through the BeautifulSoup extractor and the __NEXT_DATA__ fast path. For each
+strategy the harness reports parse time, peak memory (tracemalloc) and the
+field hit-rate: how many pages yielded an address, price, beds, baths, sqft,
+description and photos.
+
+The script exits non-zero if the strategies disagree on any page, or if the
+run regresses against the baseline (benchmarks/baseline.json): a field hit
+count drops, peak memory grows, or parse time grows by more than --tolerance.
+Timings are only compared on the machine that recorded the baseline.
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import extractors  # noqa: E402
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCH_DIR, 'fixtures')
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+
+FIELDS = ('address', 'price', 'beds', 'baths', 'sqft', 'description', 'images')
+
+# Allowed growth over the baseline before a run counts as a regression
+DEFAULT_TOLERANCE = 0.25
+# Differences below these are noise, whatever the tolerance says
+TIME_SLACK = 0.002
+MEMORY_SLACK = 16 * 1024
+
+# Markup that pads a page the way live listing pages are padded: navigation,
+# recommendation cards and large inline JSON blobs
+FILLER = (
+    '<div class="homecard"><span class="homecard-price">$1,000,000</span>'
+    '<span class="homecard-stats">Listed by Agent Name</span><a href="/x">View</a></div>\n'
+    '<script>window.__data = {"related": [' + ','.join(['{"id": 12345, "name": "Nearby home", '
+                                                        '"price": 900000}'] * 20) + ']};</script>\n'
+)
+
+
+def inflate(html, megabytes):
+    """Pad a page with filler markup to roughly `megabytes` MB."""
+    if megabytes <= 0:
+        return html
+    repeats = int(megabytes * 1024 * 1024 / len(FILLER)) + 1
+    cut = html.rfind('</body>')
+    cut = cut if cut != -1 else len(html)
+    return html[:cut] + FILLER * repeats + html[cut:]
+
+
+def time_call(func, repeat):
+    """Run func `repeat` times; return (result, median seconds)."""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return result, statistics.median(timings)
+
+
+def peak_memory(func):
+    """Peak bytes allocated by Python while running func once."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def redfin_variants():
+    variants = [('soup', lambda html, url: extractors.extract_redfin_soup(html, url))]
+    for backend in extractors.PARSER_BACKENDS:
+        variants.append((f"scan/{backend}", lambda html, url, b=backend: extractors.extract_redfin(html, url, b)))
+    return variants
+
+
+def zillow_variants():
+    return [
+        ('soup', lambda html, url: extractors.extract_zillow_soup(html, url)),
+        ('next-data', lambda html, url: extractors.extract_zillow(html, url)),
+    ]
+
+
+def as_tuple(listing):
+    return listing.address, listing.details, listing.images
+
+
+def field_hits(listing):
+    """Names of the fields a listing actually found."""
+    details = listing.details
+    hits = set()
+    if listing.address and listing.address != 'property':
+        hits.add('address')
+    for field in ('price', 'beds', 'baths', 'sqft'):
+        if details.get(field, 'N/A') != 'N/A':
+            hits.add(field)
+    if details.get('description', 'No description available') != 'No description available':
+        hits.add('description')
+    if listing.images:
+        hits.add('images')
+    return hits
+
+
+class Stats:
+    """Totals for one strategy across the corpus."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.peak_bytes = 0
+        self.pages = 0
+        self.hits = {field: 0 for field in FIELDS}
+
+    def to_dict(self):
+        return {'seconds': self.seconds, 'peak_bytes': self.peak_bytes, 'pages': self.pages, 'hits': self.hits}
+
+
+def bench_site(site, pages, variants, args, results):
+    """Run every strategy on every page into `results`; return the number of mismatching results."""
+    stats = {name: results.setdefault(f"{site}/{name}", Stats()) for name, _ in variants}
+    mismatches = 0
+    print(f"\n{site + ' page':<32} {'size':>8}  " + '  '.join(f"{name:>16}" for name, _ in variants))
+    for path in pages:
+        with open(path, 'r', encoding='utf-8') as f:
+            html = inflate(f.read(), args.inflate)
+        url = f'https://www.{site}.com/' + os.path.basename(path)
+
+        reference = None
+        cells = []
+        for name, func in variants:
+            listing, seconds = time_call(lambda: func(html, url), args.repeat)
+            s = stats[name]
+            s.seconds += seconds
+            s.peak_bytes = max(s.peak_bytes, peak_memory(lambda: func(html, url)))
+            s.pages += 1
+            for field in field_hits(listing):
+                s.hits[field] += 1
+            cells.append(f"{seconds * 1000:>13.1f} ms")
+            if reference is None:
+                reference = as_tuple(listing)
+            elif as_tuple(listing) != reference:
+                mismatches += 1
+                print(f"  MISMATCH in {name} for {path}:\n    expected {reference}\n    got      {as_tuple(listing)}")
+        print(f"{os.path.basename(path):<32} {len(html) / 1024:>6.0f}KB  " + '  '.join(f"{c:>16}" for c in cells))
+
+    print(f"{'total':<32} {'':>8}  " + '  '.join(f"{stats[name].seconds * 1000:>13.1f} ms" for name, _ in variants))
+    print(f"{'peak memory':<32} {'':>8}  " + '  '.join(f"{stats[name].peak_bytes / 1024:>13.0f} KB"
+                                                       for name, _ in variants))
+    for field in FIELDS:
+        print(f"{'  ' + field:<32} {'':>8}  " + '  '.join(
+            f"{stats[name].hits[field]:>13}/{stats[name].pages:<2}" for name, _ in variants))
+    return mismatches
+
+
+def corpus_signature(pages, args):
+    return {'pages': sorted(os.path.basename(p) for p in pages), 'inflate': args.inflate}
+
+
+def save_baseline(path, pages, args, results):
+    data = corpus_signature(pages, args)
+    data['host'] = platform.node()
+    data['python'] = platform.python_version()
+    data['strategies'] = {name: s.to_dict() for name, s in sorted(results.items())}
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.write('\n')
+    print(f"\nBaseline saved to {path}")
+
+
+def compare_baseline(path, pages, args, results):
+    """Print regressions against the baseline; return how many there are."""
+    with open(path, 'r') as f:
+        baseline = json.load(f)
+    if {k: baseline.get(k) for k in ('pages', 'inflate')} != corpus_signature(pages, args):
+        print(f"\nBaseline {path} was recorded for a different corpus; not comparing")
+        return 0
+    compare_time = baseline.get('host') == platform.node()
+
+    regressions = []
+    for name, s in sorted(results.items()):
+        base = baseline['strategies'].get(name)
+        if base is None:
+            continue
+        for field in FIELDS:
+            if s.hits[field] < base['hits'].get(field, 0):
+                regressions.append(f"{name}: {field} found on {s.hits[field]} pages (baseline {base['hits'][field]})")
+        if s.peak_bytes > base['peak_bytes'] * (1 + args.tolerance) + MEMORY_SLACK:
+            regressions.append(f"{name}: peak memory {s.peak_bytes / 1024:.0f} KB "
+                               f"(baseline {base['peak_bytes'] / 1024:.0f} KB)")
+        if compare_time and s.seconds > base['seconds'] * (1 + args.tolerance) + TIME_SLACK:
+            regressions.append(f"{name}: {s.seconds * 1000:.1f} ms (baseline {base['seconds'] * 1000:.1f} ms)")
+
+    print(f"\nCompared with {path}" + ("" if compare_time else " (recorded on another machine: timings skipped)"))
+    for line in regressions:
+        print(f"  REGRESSION {line}")
+    return len(regressions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the listing-page extractors.")
+    parser.add_argument('pages', nargs='*', help="saved listing pages named redfin_*.html or zillow_*.html "
+                                                 "(default: everything in benchmarks/fixtures)")
+    parser.add_argument('--repeat', type=int, default=5, help="runs per page and extractor (default: 5)")
+    parser.add_argument('--inflate', type=float, default=0, help="pad each page to about this many MB")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="baseline file (default: benchmarks/baseline.json)")
+    parser.add_argument('--save-baseline', action='store_true', help="record this run as the baseline")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f"allowed time/memory growth over the baseline (default: {DEFAULT_TOLERANCE:g})")
+    args = parser.parse_args()
+
+    pages = args.pages or sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.html')))
+    if not pages:
+        print("No pages to benchmark", file=sys.stderr)
+        return 2
+
+    results = {}
+    mismatches = 0
+    print(f"parser backends: {', '.join(extractors.PARSER_BACKENDS)}; "
+          f"JSON decoder: {'orjson' if extractors.orjson is not None else 'json'}")
+    for site, variants in (('redfin', redfin_variants()), ('zillow', zillow_variants())):
+        site_pages = [p for p in pages if os.path.basename(p).startswith(site)]
+        if site_pages:
+            mismatches += bench_site(site, site_pages, variants, args, results)
+
+    if args.save_baseline:
+        if mismatches:
+            print(f"{mismatches} result mismatches; baseline not saved", file=sys.stderr)
+            return 1
+        save_baseline(args.baseline, pages, args, results)
+        return 0
+
+    regressions = compare_baseline(args.baseline, pages, args, results) if os.path.exists(args.baseline) else 0
+    if mismatches:
+        print(f"{mismatches} result mismatches", file=sys.stderr)
+    if regressions:
+        print(f"{regressions} regressions against the baseline", file=sys.stderr)
+    return 1 if mismatches or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
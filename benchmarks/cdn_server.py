@@ -0,0 +1,298 @@
+"""
+Local stand-in for the listing sites and their photo CDNs.
+
+Serves the URL layouts the download engines use, so throughput, pooling,
+retry and cancellation changes can be measured offline and reproducibly:
+
+    /photo/<cdn>/bigphoto/<id>/<name>.(webp|jpg)           like ssl.cdn-redfin.com
+    /fp/<photo id>-<size>.(webp|jpg)                       like photos.zillowstatic.com
+    /redfin.com/<...>/home/<n>                             a Redfin listing page
+    /zillow.com/homedetails/<slug>/<n>_zpid/               a Zillow listing page
+    /_stats                                                request counters (JSON)
+
+Listing pages link to the real CDN hosts, exactly like the live pages; point
+download_engine.REDFIN_CDN / ZILLOW_CDN at this server to fetch the photos
+from it (benchmarks/bench_downloads.py does). Photos are generated on the fly
+and are unique per URL; they support strong ETags and Range requests.
+
+Faults are injected into photo responses only, at the given rates and from a
+seeded random generator:
+
+    python benchmarks/cdn_server.py --port 8800 --latency 40 --bandwidth 2000 \\
+        --not-found 0.02 --throttle 0.01 --server-error 0.02 --slowloris 0.005
+
+A slow-loris response sends its headers and then one byte per second for
+--slowloris-seconds before dropping the connection.
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REDFIN_PHOTO_PATH = re.compile(r'^/photo/(\d+)/(?:bigphoto|mbphoto|mbphotov3)/(\d+)/([A-Za-z0-9_]+)\.(webp|jpg)$')
+ZILLOW_PHOTO_PATH = re.compile(r'^/fp/([a-f0-9]+)-([a-z0-9_]+)\.(webp|jpg)$')
+REDFIN_PAGE_PATH = re.compile(r'^/redfin\.com/.*/home/(\d+)/?$')
+ZILLOW_PAGE_PATH = re.compile(r'^/zillow\.com/homedetails/.*?(\d+)_zpid/?$')
+
+SEND_CHUNK = 16 * 1024
+# Random bytes photos are cut from (each photo gets its own prefix, so no two are identical)
+NOISE = random.Random(0).randbytes(4 * 1024 * 1024)
+CONTENT_TYPES = {'webp': 'image/webp', 'jpg': 'image/jpeg'}
+
+
+class Faults:
+    """Seeded fault injection shared by every handler thread."""
+
+    def __init__(self, not_found=0.0, throttle=0.0, server_error=0.0, slowloris=0.0, seed=0):
+        self.rates = [('not_found', not_found), ('throttle', throttle),
+                      ('server_error', server_error), ('slowloris', slowloris)]
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self):
+        """Return the fault for the next photo response, or None."""
+        with self._lock:
+            roll = self._random.random()
+        for name, rate in self.rates:
+            if roll < rate:
+                return name
+            roll -= rate
+        return None
+
+    def choice(self, options):
+        with self._lock:
+            return self._random.choice(options)
+
+
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {}
+
+    def add(self, key):
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def to_dict(self):
+        with self._lock:
+            return dict(self.counts)
+
+
+def photo_body(path, size):
+    """Deterministic, unique-per-URL image body of `size` bytes."""
+    digest = hashlib.sha256(path.encode('utf-8')).digest()
+    offset = int.from_bytes(digest[:4], 'big') % (len(NOISE) - size) if size < len(NOISE) else 0
+    body = b'\xff\xd8\xff\xe0' + digest + NOISE[offset:offset + size]
+    return body[:size]
+
+
+def redfin_page(listing, photos):
+    address = f"{listing} Benchmark Way, Testville, CA 90{listing % 1000:03d}"
+    urls = ',\n'.join(f'{{"url":"https://ssl.cdn-redfin.com/photo/45/bigphoto/{listing}/BM{listing}_{i}.jpg"}}'
+                      for i in range(photos))
+    return f'''<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{address} | MLS# BM{listing} | Redfin</title>
+</head>
+<body>
+<div class="HomeInfoV2">
+  <div class="street-address"><h1 class="full-address">{address}</h1></div>
+  <div class="home-main-stats-variant">
+    <div class="stat-block price-section" data-rf-test-id="abp-price"><div class="statsValue">${900000 + listing * 1000:,}</div></div>
+    <div class="stat-block beds-section"><div class="statsValue">3</div><span class="statsLabel">Beds</span></div>
+    <div class="stat-block baths-section"><div class="statsValue">2</div><span class="statsLabel">Baths</span></div>
+    <div class="stat-block sqft-section"><span class="statsValue">1,850</span><span class="statsLabel">Sq Ft</span></div>
+  </div>
+</div>
+<div class="remarks" data-rf-test-id="listingRemarks"><p><span>Generated listing {listing} for download benchmarks.</span></p></div>
+<script>
+root.__reactServerState.InitialContext = {{"photos":[
+{urls}
+]}};
+</script>
+</body>
+</html>
+'''
+
+
+def zillow_page(listing, photos):
+    address = f"{listing} Benchmark Ave, Testville, WA 98{listing % 1000:03d}"
+    ids = [hashlib.md5(f"zillow-{listing}-{i}".encode()).hexdigest() for i in range(photos)]
+    prop = {
+        'zpid': listing, 'price': 700000 + listing * 1000, 'bedrooms': 4, 'bathrooms': 2.5, 'livingArea': 2210,
+        'description': f"Generated listing {listing} for download benchmarks.",
+        'responsivePhotos': [{'mixedSources': {'jpeg': [
+            {'url': f"https://photos.zillowstatic.com/fp/{i}-cc_ft_960.jpg", 'width': 960}]}} for i in ids],
+    }
+    gdp = {f'ForSalePriorityQuery{{"zpid":{listing}}}': {'property': prop}}
+    next_data = {'props': {'pageProps': {'componentProps': {'gdpClientCache': json.dumps(gdp)}}}}
+    return f'''<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{address} | Zillow</title>
+</head>
+<body>
+<div id="__next"></div>
+<script id="__NEXT_DATA__" type="application/json">{json.dumps(next_data)}</script>
+</body>
+</html>
+'''
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Set on the server class by make_server()
+    config = None
+    faults = None
+    stats = None
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        try:
+            self.route()
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def route(self):
+        path = self.path.split('?')[0]
+        if path == '/_stats':
+            return self.send_body(200, json.dumps(self.stats.to_dict()).encode(), 'application/json')
+
+        time.sleep(max(0.0, random.gauss(self.config.latency, self.config.jitter)) / 1000)
+
+        match = REDFIN_PAGE_PATH.match(path)
+        if match:
+            self.stats.add('pages')
+            return self.send_body(200, redfin_page(int(match.group(1)), self.config.photos).encode(), 'text/html')
+        match = ZILLOW_PAGE_PATH.match(path)
+        if match:
+            self.stats.add('pages')
+            return self.send_body(200, zillow_page(int(match.group(1)), self.config.photos).encode(), 'text/html')
+
+        match = REDFIN_PHOTO_PATH.match(path) or ZILLOW_PHOTO_PATH.match(path)
+        if not match:
+            self.stats.add('404')
+            return self.send_body(404, b'not found', 'text/plain')
+        self.send_photo(path, CONTENT_TYPES[match.group(match.lastindex)])
+
+    def send_photo(self, path, content_type):
+        fault = self.faults.draw()
+        if fault == 'not_found':
+            self.stats.add('404')
+            return self.send_body(404, b'not found', 'text/plain')
+        if fault == 'throttle':
+            self.stats.add('429')
+            return self.send_body(429, b'slow down', 'text/plain', {'Retry-After': '1'})
+        if fault == 'server_error':
+            status = self.faults.choice((500, 502, 503))
+            self.stats.add(str(status))
+            return self.send_body(status, b'server error', 'text/plain')
+
+        body = photo_body(path, self.config.image_bytes)
+        etag = '"%s"' % hashlib.sha1(body[:64]).hexdigest()
+        status, extra = 200, {'ETag': etag, 'Accept-Ranges': 'bytes'}
+        start = 0
+        range_header = self.headers.get('Range', '')
+        if range_header.startswith('bytes=') and self.headers.get('If-Range', etag) == etag:
+            start = int(range_header[6:].split('-')[0] or 0)
+            if start >= len(body):
+                self.stats.add('416')
+                return self.send_body(416, b'', 'text/plain', {'Content-Range': f"bytes */{len(body)}"})
+            status = 206
+            extra['Content-Range'] = f"bytes {start}-{len(body) - 1}/{len(body)}"
+
+        if fault == 'slowloris':
+            self.stats.add('slowloris')
+            return self.send_slowloris(body[start:], content_type)
+        self.stats.add('photos' if status == 200 else 'resumed')
+        self.send_body(status, body[start:], content_type, extra)
+
+    def send_body(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        rate = self.config.bandwidth * 1024
+        for offset in range(0, len(body), SEND_CHUNK):
+            chunk = body[offset:offset + SEND_CHUNK]
+            self.wfile.write(chunk)
+            if rate > 0:
+                time.sleep(len(chunk) / rate)
+
+    def send_slowloris(self, body, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        deadline = time.monotonic() + self.config.slowloris_seconds
+        offset = 0
+        while time.monotonic() < deadline and offset < len(body):
+            self.wfile.write(body[offset:offset + 1])
+            self.wfile.flush()
+            offset += 1
+            time.sleep(1.0)
+        self.close_connection = True
+
+
+def make_server(port, config, faults, stats):
+    """Create a ThreadingHTTPServer on 127.0.0.1:`port` sharing config, faults and stats."""
+    handler = type('BoundHandler', (Handler,), {'config': config, 'faults': faults, 'stats': stats})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Redfin/Zillow pages and photo CDNs.")
+    parser.add_argument('--port', type=int, default=8800, help="photo CDN port (0 picks a free one; default: 8800)")
+    parser.add_argument('--page-port', type=int, default=None,
+                        help="listing page port (default: CDN port + 1, or a free one with --port 0)")
+    parser.add_argument('--photos', type=int, default=30, help="photos per listing page (default: 30)")
+    parser.add_argument('--image-kb', type=int, default=250, help="size of every photo in KB (default: 250)")
+    parser.add_argument('--latency', type=float, default=30.0, help="time to first byte in ms (default: 30)")
+    parser.add_argument('--jitter', type=float, default=10.0, help="latency standard deviation in ms (default: 10)")
+    parser.add_argument('--bandwidth', type=float, default=0, help="per-response cap in KB/s (default: unlimited)")
+    parser.add_argument('--not-found', type=float, default=0.0, help="fraction of photo requests answered 404")
+    parser.add_argument('--throttle', type=float, default=0.0, help="fraction answered 429 with Retry-After: 1")
+    parser.add_argument('--server-error', type=float, default=0.0, help="fraction answered 500/502/503")
+    parser.add_argument('--slowloris', type=float, default=0.0, help="fraction answered with a slow-loris body")
+    parser.add_argument('--slowloris-seconds', type=float, default=15.0,
+                        help="how long a slow-loris response trickles before dropping (default: 15)")
+    parser.add_argument('--seed', type=int, default=0, help="fault injection seed (default: 0)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.image_bytes = args.image_kb * 1024
+    faults = Faults(args.not_found, args.throttle, args.server_error, args.slowloris, args.seed)
+    stats = Stats()
+    cdn = make_server(args.port, args, faults, stats)
+    page_port = args.page_port if args.page_port is not None else (args.port + 1 if args.port else 0)
+    pages = make_server(page_port, args, faults, stats)
+    threading.Thread(target=pages.serve_forever, daemon=True).start()
+
+    # First line of output tells a parent process where to find us
+    print(json.dumps({'cdn': f"http://127.0.0.1:{cdn.server_address[1]}",
+                      'pages': f"http://127.0.0.1:{pages.server_address[1]}"}), flush=True)
+    try:
+        cdn.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+Cancellation tokens that reach into requests already in flight.
+
+A CancelToken is callable, so it can be passed anywhere an `is_cancelled`
+callback is expected. Cancelling it also runs the callbacks registered with
+on_cancel(): the HTTP transport uses that to shut down the sockets of requests
+made while the token is bound to the current thread (see bind()), so a blocked
+read returns at once instead of running to its timeout. The async engine
+registers a callback that cancels its tasks on the event loop.
+"""
+import contextlib
+import socket
+import sys
+import threading
+
+
+class CancelToken:
+    """One-shot cancellation flag with cancel callbacks."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = {}
+        self._next_handle = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        return self._event.is_set()
+
+    def is_cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks = list(self._callbacks.values())
+            self._callbacks.clear()
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Cancel callback failed: {e}", file=sys.stderr)
+
+    def wait(self, timeout=None):
+        """Sleep until cancelled or `timeout` passes. Returns True if cancelled."""
+        return self._event.wait(timeout)
+
+    def on_cancel(self, callback):
+        """
+        Run `callback` when the token is cancelled (at once if it already is).
+        Returns a handle for remove().
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._next_handle += 1
+                self._callbacks[self._next_handle] = callback
+                return self._next_handle
+        callback()
+        return None
+
+    def remove(self, handle):
+        with self._lock:
+            self._callbacks.pop(handle, None)
+
+
+_local = threading.local()
+
+
+def current():
+    """The token bound to this thread by bind(), or None."""
+    scopes = getattr(_local, 'scopes', None)
+    return scopes[-1][0] if scopes else None
+
+
+@contextlib.contextmanager
+def bind(token):
+    """
+    Bind `token` to the current thread for the duration of the block.
+
+    Sockets registered with watch_socket() inside the block are shut down if
+    the token is cancelled; the registrations end with the block. `token` may
+    be a plain callable (or None), in which case nothing is watched.
+    """
+    if not isinstance(token, CancelToken):
+        yield
+        return
+    if not hasattr(_local, 'scopes'):
+        _local.scopes = []
+    if _local.scopes and _local.scopes[-1][0] is token:
+        # Nested bind of the same token: the outer block owns the registrations
+        yield
+        return
+    handles = []
+    _local.scopes.append((token, handles))
+    try:
+        yield
+    finally:
+        _local.scopes.pop()
+        for handle in handles:
+            token.remove(handle)
+
+
+def watch_socket(get_sock):
+    """Shut down the socket returned by get_sock() if the bound token is cancelled."""
+    scopes = getattr(_local, 'scopes', None)
+    if not scopes:
+        return
+    token, handles = scopes[-1]
+
+    def abort():
+        sock = get_sock()
+        if sock is None:
+            return
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    handle = token.on_cancel(abort)
+    if handle is not None:
+        handles.append(handle)
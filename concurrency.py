@@ -0,0 +1,182 @@
+"""
+Adaptive concurrency control for the image workers.
+
+AIMDController works like a semaphore whose size changes at runtime: the limit
+grows by one after each healthy round of fetches and is cut in half on
+throttling signals (HTTP 429/5xx, timeouts, connection errors) or when p95
+latency climbs well above the level seen when the job started.
+
+Both the controller and the cross-listing WorkerBudget hand out free slots
+through PrioritySlots, lowest priority value first, so a listing's cover and
+hero shots are fetched before the rest of its photos (and before the tail of
+other listings).
+"""
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+
+INITIAL_WORKERS = 10
+MIN_WORKERS = 2
+MAX_WORKERS = 32
+
+# Recent latencies used for the p95 check
+LATENCY_WINDOW = 50
+# p95 this many times above the baseline counts as congestion
+LATENCY_BACKOFF_FACTOR = 2.5
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class PrioritySlots:
+    """
+    Counting semaphore whose waiters are served lowest `priority` first
+    (first come, first served among equals). `limit` may change at runtime.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._waiting = []
+        self._seq = itertools.count()
+
+    def set_limit(self, limit):
+        with self._cond:
+            self.limit = limit
+            self._cond.notify_all()
+
+    def acquire(self, is_cancelled=lambda: False, priority=0):
+        """Block until a slot is free and no higher-priority waiter is queued. Returns False if cancelled."""
+        with self._cond:
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while self._in_flight >= self.limit or self._waiting[0] != ticket:
+                    if is_cancelled():
+                        return False
+                    self._cond.wait(0.1)
+                self._in_flight += 1
+                return True
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                # The next waiter in line may be able to go now
+                self._cond.notify_all()
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+
+class AIMDController:
+    """Additive-increase / multiplicative-decrease limit on in-flight fetches."""
+
+    def __init__(self, initial=INITIAL_WORKERS, minimum=MIN_WORKERS, maximum=MAX_WORKERS,
+                 decrease_factor=0.5, on_change=None):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = max(minimum, min(initial, maximum))
+        self.decrease_factor = decrease_factor
+        self.on_change = on_change
+        self.reason = "initial"
+
+        self._cond = threading.Condition()
+        self._slots = PrioritySlots(self.limit)
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._baseline_p95 = None
+        self._successes_since_change = 0
+        self._last_decrease = 0.0
+
+    # --- slot handling ---
+
+    def acquire(self, is_cancelled=lambda: False, priority=0):
+        """Block until a slot is free (lowest priority value first). Returns False if cancelled."""
+        return self._slots.acquire(is_cancelled, priority)
+
+    def release(self):
+        self._slots.release()
+
+    # --- feedback ---
+
+    def record(self, latency, status=None, error=None):
+        """
+        Feed back the outcome of one HTTP request.
+
+        `status` is the HTTP status code (None if no response); `error` is a
+        short label such as 'timeout' or 'connection' for failed requests.
+        """
+        if error or (status is not None and (status == 429 or status >= 500)):
+            label = error or f"HTTP {status}"
+            self._decrease(f"backing off: {label}")
+            return
+
+        with self._cond:
+            if status == 200:
+                self._latencies.append(latency)
+            if self._baseline_p95 is None and len(self._latencies) >= 10:
+                self._baseline_p95 = percentile(self._latencies, 95)
+            self._successes_since_change += 1
+            round_done = self._successes_since_change >= self.limit
+            p95 = percentile(self._latencies, 95)
+
+        if not round_done:
+            return
+        if self._baseline_p95 and p95 > self._baseline_p95 * LATENCY_BACKOFF_FACTOR:
+            self._decrease(f"backing off: p95 {p95:.1f}s")
+        else:
+            self._increase("healthy")
+
+    def _increase(self, reason):
+        with self._cond:
+            self._successes_since_change = 0
+            if self.limit >= self.maximum:
+                return
+            self.limit += 1
+            self.reason = reason
+            self._slots.set_limit(self.limit)
+        self._notify()
+
+    def _decrease(self, reason):
+        now = time.monotonic()
+        with self._cond:
+            # Only react once per burst: in-flight requests report the same congestion
+            if now - self._last_decrease < 1.0:
+                return
+            self._last_decrease = now
+            self._successes_since_change = 0
+            new_limit = max(self.minimum, int(self.limit * self.decrease_factor))
+            if new_limit == self.limit:
+                return
+            self.limit = new_limit
+            self.reason = reason
+            self._slots.set_limit(self.limit)
+            # Latency is judged against a fresh baseline at the new level
+            self._latencies.clear()
+            self._baseline_p95 = None
+        self._notify()
+
+    def _notify(self):
+        if self.on_change:
+            self.on_change(self.limit, self.reason)
+
+
+class WorkerBudget(PrioritySlots):
+    """
+    Global cap on image fetches in flight, shared by every running listing.
+
+    Each listing still has its own AIMDController; a fetch must hold a slot
+    from both, so N parallel listings can't multiply the load on the CDN.
+    """
+
+    def __init__(self, size):
+        super().__init__(size)
+        self.size = size
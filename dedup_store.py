@@ -0,0 +1,261 @@
+"""
+Content-addressed image store for the download library.
+
+Every downloaded image is hashed (SHA-256) while it streams in and stored once
+under <library>/.blobs/<first two hex chars>/<digest>. Property folders get a
+hardlink to the blob, so the same photo pulled for a relisted home, from both
+Redfin and Zillow, or under a renamed address only takes disk space once.
+On filesystems without hardlinks (FAT/exFAT, many network shares) the store
+disables itself and images are saved as plain files, never as a blob plus a
+copy; a single link that fails (e.g. a property folder on another volume)
+also just leaves the one file in place.
+
+Run as a script for a library-wide duplicate report:
+
+    python dedup_store.py House_Images            # report only
+    python dedup_store.py House_Images --apply    # also hardlink existing duplicates
+    python dedup_store.py House_Images --prune    # drop blobs no folder links to
+"""
+import argparse
+import hashlib
+import os
+import sys
+import threading
+
+STORE_DIRNAME = '.blobs'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+HASH_CHUNK = 1024 * 1024
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def hardlink(src, dst):
+    """Hardlink src to dst, replacing dst. Returns False if the filesystem can't link them."""
+    temp_path = dst + '.link.tmp'
+    try:
+        os.link(src, temp_path)
+    except OSError:
+        return False
+    os.replace(temp_path, dst)
+    return True
+
+
+def links_supported(folder):
+    """True if files in `folder` can be hardlinked and report their link count."""
+    probe = os.path.join(folder, '.link-probe')
+    try:
+        os.makedirs(folder, exist_ok=True)
+        with open(probe, 'wb'):
+            pass
+        try:
+            os.link(probe, probe + '.link')
+            return os.stat(probe).st_nlink == 2
+        finally:
+            for path in (probe, probe + '.link'):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+    except OSError:
+        return False
+
+
+class DedupStore:
+    """Blob store rooted inside one download library folder."""
+
+    def __init__(self, library_folder):
+        self.library = os.path.abspath(library_folder)
+        self.root = os.path.join(self.library, STORE_DIRNAME)
+        self._lock = threading.Lock()
+        self._enabled = None
+
+    @property
+    def enabled(self):
+        """False when the library's filesystem can't hardlink (checked once)."""
+        if self._enabled is None:
+            self._enabled = links_supported(self.root)
+            if not self._enabled:
+                print(f"Hardlinks are not supported in {self.library}; images are stored without deduplication", file=sys.stderr)
+        return self._enabled
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def adopt(self, temp_path, target_path, digest):
+        """
+        Move a finished download into the store and link it at target_path.
+
+        If an identical blob already exists, the new copy is discarded.
+        Returns True if the bytes were already in the store. Without
+        hardlinks the file is simply moved to target_path.
+        """
+        if not self.enabled:
+            os.replace(temp_path, target_path)
+            return False
+        blob = self.blob_path(digest)
+        with self._lock:
+            existed = os.path.exists(blob)
+            if not existed:
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                os.replace(temp_path, blob)
+            if hardlink(blob, target_path):
+                if existed:
+                    os.remove(temp_path)
+                return existed
+            # Keep the single file where it belongs rather than a blob plus a copy
+            os.replace(temp_path if existed else blob, target_path)
+            return False
+
+    def add_existing(self, path, digest=None):
+        """Put an already downloaded file into the store and relink it (left as is without hardlinks)."""
+        digest = digest or file_digest(path)
+        if not self.enabled:
+            return digest
+        blob = self.blob_path(digest)
+        with self._lock:
+            if not os.path.exists(blob):
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                if not hardlink(path, blob):
+                    return digest
+            if not _same_file(blob, path):
+                hardlink(blob, path)
+        return digest
+
+    def iter_blobs(self):
+        if not os.path.isdir(self.root):
+            return
+        for prefix in os.listdir(self.root):
+            folder = os.path.join(self.root, prefix)
+            if os.path.isdir(folder):
+                for name in os.listdir(folder):
+                    yield os.path.join(folder, name)
+
+    def prune(self):
+        """Delete blobs that no property folder links to any more. Returns (count, bytes)."""
+        count = 0
+        freed = 0
+        # Link counts mean nothing where hardlinks don't work
+        if not self.enabled:
+            return count, freed
+        for blob in self.iter_blobs():
+            # Under the lock: adopt() briefly holds a blob with a single link
+            with self._lock:
+                try:
+                    st = os.stat(blob)
+                    if st.st_nlink > 1:
+                        continue
+                    os.remove(blob)
+                except OSError:
+                    continue
+            count += 1
+            freed += st.st_size
+        return count, freed
+
+
+def _same_file(a, b):
+    try:
+        return os.path.samefile(a, b)
+    except OSError:
+        return False
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def for_library(library_folder):
+    """Return the shared store for a library folder."""
+    key = os.path.abspath(library_folder)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = DedupStore(key)
+            _stores[key] = store
+        return store
+
+
+def iter_library_images(library_folder):
+    """Yield every image path in the library's property folders (blobs excluded)."""
+    for prop in sorted(os.listdir(library_folder)):
+        prop_path = os.path.join(library_folder, prop)
+        if prop.startswith('.') or not os.path.isdir(prop_path):
+            continue
+        for name in sorted(os.listdir(prop_path)):
+            if name.lower().endswith(IMAGE_EXTENSIONS) and not name.startswith('.'):
+                yield os.path.join(prop_path, name)
+
+
+def dedup_report(library_folder, apply=False):
+    """
+    Hash every image in the library and group identical ones.
+
+    Returns a dict with totals and the duplicate groups. Files that already
+    share an inode are not counted as wasted space. With apply=True, every
+    image is moved into the store and relinked, reclaiming the duplicates.
+    """
+    store = for_library(library_folder)
+    groups = {}
+    total_files = 0
+    total_bytes = 0
+    for path in iter_library_images(library_folder):
+        total_files += 1
+        total_bytes += os.path.getsize(path)
+        groups.setdefault(file_digest(path), []).append(path)
+
+    wasted = 0
+    duplicates = []
+    for digest, paths in groups.items():
+        if len(paths) < 2:
+            continue
+        inodes = {(os.stat(p).st_dev, os.stat(p).st_ino) for p in paths}
+        wasted += (len(inodes) - 1) * os.path.getsize(paths[0])
+        duplicates.append({'digest': digest, 'paths': paths, 'copies_on_disk': len(inodes)})
+
+    if apply:
+        for digest, paths in groups.items():
+            for path in paths:
+                store.add_existing(path, digest)
+
+    return {
+        'files': total_files,
+        'bytes': total_bytes,
+        'unique': len(groups),
+        'duplicate_groups': duplicates,
+        'wasted_bytes': wasted,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report (and optionally reclaim) duplicate images in a library.")
+    parser.add_argument('library', nargs='?', default='House_Images', help="library folder (default: House_Images)")
+    parser.add_argument('--apply', action='store_true', help="move images into the blob store and hardlink duplicates")
+    parser.add_argument('--prune', action='store_true', help="delete blobs no longer linked from any folder")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.library):
+        print(f"Error: {args.library} is not a folder", file=sys.stderr)
+        return 1
+
+    report = dedup_report(args.library, apply=args.apply)
+    mb = 1024 * 1024
+    print(f"{report['files']} images, {report['unique']} unique, {report['bytes'] / mb:.1f} MB total")
+    print(f"{len(report['duplicate_groups'])} duplicate groups, {report['wasted_bytes'] / mb:.1f} MB reclaimable")
+    for group in report['duplicate_groups'][:20]:
+        print(f"  {group['digest'][:12]}  x{len(group['paths'])}: " + ', '.join(
+            os.path.relpath(p, args.library) for p in group['paths'][:3]))
+    if args.apply:
+        print("Duplicates relinked into the blob store.")
+    if args.prune:
+        count, freed = for_library(args.library).prune()
+        print(f"Pruned {count} orphaned blobs ({freed / mb:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Typed fields of property_details.json.
+
+The extractors keep price, sqft, beds and baths as the text the listing page
+shows ("$1,250,000", "2,340", "N/A"), and the details panel displays them as
+they are. save_details() also stores normalized copies next to them, so
+sorting and filtering never parse text again:
+
+    schema_version  SCHEMA_VERSION
+    price_cents     integer cents, or null when the listing shows no price
+    sqft_value      integer square feet, or null
+    beds_value      integer bedrooms (a studio is 0), or null
+    baths_value     float bathrooms (2.5 for two full and one half), or null
+    fetched_at      Unix time the listing page was fetched, or null if unknown
+    source          'redfin' or 'zillow'
+
+Files written before the schema existed have no schema_version; typed_fields()
+derives the same values from their display strings when they are read.
+"""
+import re
+import time
+from decimal import Decimal, InvalidOperation
+
+from extractors import site_for_url
+
+# Bump when the typed fields change; older files are re-derived from their display strings.
+# Version 1 is the first schema: files without a schema_version predate it.
+SCHEMA_VERSION = 1
+
+TYPED_FIELDS = ('price_cents', 'sqft_value', 'beds_value', 'baths_value', 'fetched_at', 'source')
+
+# The first number in a display string, with an optional K/M multiplier ("$1.25M")
+NUMBER_RE = re.compile(r'(\d[\d,]*(?:\.\d+)?|\.\d+)\s*([KkMm](?![a-z]))?')
+MULTIPLIERS = {'k': 1000, 'm': 1000000}
+
+
+def _number(text):
+    """The first number in `text` as a Decimal, or None."""
+    if text is None:
+        return None
+    if isinstance(text, (int, float)):
+        return Decimal(str(text))
+    match = NUMBER_RE.search(str(text))
+    if match is None:
+        return None
+    try:
+        value = Decimal(match.group(1).replace(',', ''))
+    except InvalidOperation:
+        return None
+    if match.group(2):
+        value *= MULTIPLIERS[match.group(2).lower()]
+    return value
+
+
+def price_cents(text):
+    """'$1,250,000' -> 125000000; None if there's no price."""
+    value = _number(text)
+    return None if value is None else int(value * 100)
+
+
+def sqft_value(text):
+    """'2,340' or '2,340 sq ft' -> 2340."""
+    value = _number(text)
+    return None if value is None else int(value)
+
+
+def beds_value(text):
+    """'3' -> 3, 'Studio' -> 0."""
+    if isinstance(text, str) and 'studio' in text.lower():
+        return 0
+    value = _number(text)
+    return None if value is None else int(value)
+
+
+def baths_value(text):
+    """'2.5' -> 2.5."""
+    value = _number(text)
+    return None if value is None else float(value)
+
+
+def typed_fields(details):
+    """
+    The typed fields of a details dict: the stored ones if it was written with
+    the current schema, otherwise derived from its display strings.
+    """
+    if details.get('schema_version') == SCHEMA_VERSION:
+        return {field: details.get(field) for field in TYPED_FIELDS}
+    url = details.get('url')
+    return {
+        'price_cents': price_cents(details.get('price')),
+        'sqft_value': sqft_value(details.get('sqft')),
+        'beds_value': beds_value(details.get('beds')),
+        'baths_value': baths_value(details.get('baths')),
+        'fetched_at': details.get('fetched_at'),
+        'source': details.get('source') or (site_for_url(url) if url else None),
+    }
+
+
+def normalize(details, fetched_at=None):
+    """
+    A copy of extracted `details` with the schema version and typed fields
+    added. `fetched_at` defaults to now.
+    """
+    result = {key: value for key, value in details.items()
+              if key not in TYPED_FIELDS and key != 'schema_version'}
+    typed = typed_fields(result)
+    typed['fetched_at'] = int(fetched_at if fetched_at is not None else time.time())
+    result['schema_version'] = SCHEMA_VERSION
+    result.update(typed)
+    return result
@@ -0,0 +1,634 @@
+"""
+Image download engines shared by the GUI and the CLI.
+
+A listing is turned into a list of ImageJob objects (one per photo, each with
+its candidate URLs in preference order). The jobs can then be run either by the
+classic thread pool or, when aiohttp is installed, by the asyncio engine in
+async_engine.py.
+"""
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+import cancellation
+import concurrency
+import dedup_store
+import details_schema
+import extractors
+import format_cache
+import http_transport
+import library_index
+import page_cache
+import profiling
+import retry_policy
+import telemetry
+
+# Responses smaller than this are placeholder/error images, not photos
+MIN_IMAGE_BYTES = 1000
+
+# Image bodies are streamed to disk in chunks of this size
+CHUNK_SIZE = 64 * 1024
+
+ENGINES = ('threads', 'async')
+
+# The first photos of a listing (cover and hero shots) are fetched ahead of the rest
+HERO_PHOTOS = 6
+
+REDFIN_CDN = "https://ssl.cdn-redfin.com/photo"
+ZILLOW_CDN = "https://photos.zillowstatic.com/fp"
+ZILLOW_SIZES = ['cc_ft_1536', 'cc_ft_1344', 'cc_ft_960', 'uncropped_scaled_within_1536_1024']
+
+
+class ImageJob:
+    """
+    One photo to download.
+
+    `candidates` is a list of (filename, url, variant) tuples tried in order;
+    `variant` names the format/size choice (e.g. 'webp', 'cc_ft_1536.jpg') so
+    the negotiation cache can learn which one a listing's CDN serves.
+    """
+
+    def __init__(self, index, folder, candidates):
+        self.index = index
+        self.folder = folder
+        self.candidates = candidates
+        self.listing = os.path.basename(os.path.normpath(folder))
+        self.formats = format_cache.for_library(os.path.dirname(os.path.abspath(folder)))
+        # Set when the last attempt failed: {'reason', 'kind', 'attempts'}
+        self.failure = None
+        # Bytes fetched over the network for this photo (0 if it was already on disk)
+        self.bytes = 0
+        # Seconds spent fetching this photo, retries included (waiting for a slot excluded)
+        self.elapsed = 0.0
+        # Requests made for this photo and the candidate variant that worked
+        self.requests = 0
+        self.variant = None
+        # URL of the listing page the photo came from (telemetry's per-listing rollup)
+        self.listing_url = None
+
+    def to_dict(self):
+        """Serializable form used by the per-property retry list."""
+        data = {'index': self.index, 'candidates': [list(c) for c in self.candidates]}
+        if self.failure:
+            data.update(self.failure)
+        return data
+
+    @classmethod
+    def from_dict(cls, folder, data):
+        return cls(data['index'], folder, [tuple(c) for c in data['candidates']])
+
+    @property
+    def priority(self):
+        """Sort key for fetch order: hero shots first, then by photo number."""
+        return (0 if self.index <= HERO_PHOTOS else 1, self.index)
+
+    def path_for(self, filename):
+        return os.path.join(self.folder, filename)
+
+    def ordered_candidates(self):
+        """
+        Candidates in the order to try them: one with a resumable .part file
+        first, then the variant learned for this listing, then the rest.
+        """
+        ordered = self.formats.order(self.listing, self.candidates)
+        for candidate in ordered:
+            filename, url, _ = candidate
+            if PartFile(self.path_for(filename), url).has_partial():
+                return [candidate] + [c for c in ordered if c is not candidate]
+        return ordered
+
+    def record_success(self, url, variant):
+        self.variant = variant
+        self.formats.record(self.listing, format_cache.host_of(url), variant)
+
+    def needs_probe(self):
+        """True if nothing is known yet about which variant this listing serves."""
+        if len(self.candidates) < 2:
+            return False
+        return not self.formats.knows_listing(self.listing, format_cache.host_of(self.candidates[0][1]))
+
+    def existing_file(self):
+        """Return the path of an already downloaded candidate, if any."""
+        for filename, *_ in self.candidates:
+            path = self.path_for(filename)
+            if os.path.exists(path):
+                return path
+        return None
+
+
+def redfin_jobs(folder, images):
+    """Build jobs for Redfin (cdn_num, photo_id, photo_name) tuples."""
+    jobs = []
+    for idx, (cdn_num, photo_id, photo_name) in enumerate(images, 1):
+        candidates = [
+            (f"{idx:03d}_{photo_name}.{ext}", f"{REDFIN_CDN}/{cdn_num}/bigphoto/{photo_id}/{photo_name}.{ext}", ext)
+            for ext in ('webp', 'jpg')
+        ]
+        jobs.append(ImageJob(idx, folder, candidates))
+    return jobs
+
+
+def zillow_jobs(folder, photo_ids):
+    """Build jobs for Zillow photo ids, largest size first, webp before jpg."""
+    jobs = []
+    for idx, photo_id in enumerate(photo_ids, 1):
+        candidates = []
+        for size in ZILLOW_SIZES:
+            for ext in ('webp', 'jpg'):
+                candidates.append((f"{idx:03d}_{photo_id}.{ext}", f"{ZILLOW_CDN}/{photo_id}-{size}.{ext}", f"{size}.{ext}"))
+        jobs.append(ImageJob(idx, folder, candidates))
+    return jobs
+
+
+def url_jobs(folder, urls):
+    """Build single-candidate jobs from plain image URLs."""
+    jobs = []
+    for idx, url in enumerate(urls, 1):
+        filename = os.path.basename(url.split('?')[0]) or f"image_{idx}.jpg"
+        jobs.append(ImageJob(idx, folder, [(f"{idx:03d}_{filename}", url, 'original')]))
+    return jobs
+
+
+def declared_too_small(headers):
+    """True when Content-Length already tells us the body is a placeholder."""
+    length = headers.get('Content-Length')
+    return bool(length) and length.isdigit() and int(length) <= MIN_IMAGE_BYTES
+
+
+class PartFile:
+    """
+    Resumable download target.
+
+    The body is streamed into a hidden `.NAME.part` file next to the final
+    path, with a `.NAME.part.json` sidecar recording the source URL and its
+    validator (strong ETag or Last-Modified). If a job is cancelled or the app
+    dies, the next run sends `Range`/`If-Range` and only fetches the missing
+    tail. Finished files are moved into place with an atomic rename, so a
+    half-written image never looks finished to the skip check or the gallery.
+
+    The body is hashed as it streams in; finished files go into the library's
+    content-addressed store (dedup_store) and are hardlinked into place.
+    """
+
+    def __init__(self, path, url):
+        self.path = path
+        self.url = url
+        folder, name = os.path.split(path)
+        self.part_path = os.path.join(folder, f".{name}.part")
+        self.meta_path = self.part_path + '.json'
+        self.offset = 0
+        self.size = 0
+        self._hash = None
+        self.validator = self._load_validator()
+        if self.validator and os.path.exists(self.part_path):
+            self.offset = os.path.getsize(self.part_path)
+
+    def _load_validator(self):
+        try:
+            with open(self.meta_path, 'r') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('url') != self.url:
+            return None
+        return meta.get('validator')
+
+    def has_partial(self):
+        return self.offset > 0
+
+    def request_headers(self):
+        """Range headers to resume from what is already on disk."""
+        if not self.offset:
+            return {}
+        return {'Range': f"bytes={self.offset}-", 'If-Range': self.validator}
+
+    def _resumes(self, status, headers):
+        return (status == 206 and self.offset > 0 and
+                headers.get('Content-Range', '').startswith(f"bytes {self.offset}-"))
+
+    def must_restart(self, status, headers):
+        """
+        True if the server rejected our partial (416) or sent a range that
+        doesn't start where it ends; the caller discards it and refetches
+        from byte 0.
+        """
+        if not self.offset:
+            return False
+        return status == 416 or (status == 206 and not self._resumes(status, headers))
+
+    def begin(self, status, headers):
+        """
+        Prepare to receive a response body.
+
+        Returns an open file to stream into, or None if the response should be
+        skipped (error status or a placeholder-sized body).
+        """
+        resumed = self._resumes(status, headers)
+        if status != 200 and not resumed:
+            return None
+        if not resumed:
+            self.offset = 0
+            if declared_too_small(headers):
+                return None
+
+        etag = headers.get('ETag')
+        validator = etag if etag and not etag.startswith('W/') else headers.get('Last-Modified')
+        if validator:
+            with open(self.meta_path, 'w') as f:
+                json.dump({'url': self.url, 'validator': validator}, f)
+        else:
+            self._remove(self.meta_path)
+
+        self.size = self.offset
+        self._hash = hashlib.sha256()
+        if resumed:
+            with open(self.part_path, 'rb') as existing:
+                for block in iter(lambda: existing.read(CHUNK_SIZE), b''):
+                    self._hash.update(block)
+        return open(self.part_path, 'ab' if resumed else 'wb')
+
+    def write(self, f, chunk):
+        f.write(chunk)
+        self._hash.update(chunk)
+        self.size += len(chunk)
+
+    def finish(self):
+        """Move the finished body into place. Returns False (and discards it) if too small."""
+        if self.size <= MIN_IMAGE_BYTES:
+            self.discard()
+            return False
+        library = os.path.dirname(os.path.dirname(os.path.abspath(self.path)))
+        dedup_store.for_library(library).adopt(self.part_path, self.path, self._hash.hexdigest())
+        self._remove(self.meta_path)
+        return True
+
+    def discard(self):
+        self._remove(self.part_path)
+        self._remove(self.meta_path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def stream_to_file(url, path, is_cancelled=lambda: False, record=None):
+    """
+    Download `url` to `path` through a resumable .part file.
+
+    Returns (ok, status). A cancelled or interrupted transfer keeps its .part
+    file so the next attempt can resume it. If `is_cancelled` is a
+    CancelToken, cancelling it aborts the transfer mid-read and raises
+    http_transport.RequestCancelled. Timings and body bytes go into `record`
+    (a telemetry.RequestRecord), which the caller finishes.
+    """
+    part = PartFile(path, url)
+    record = record or telemetry.RequestRecord(url, kind='image')
+    with cancellation.bind(is_cancelled):
+        with http_transport.get(url, stream=True, headers=part.request_headers(),
+                                is_cancelled=is_cancelled, record=record) as response:
+            status = response.status_code
+            if part.must_restart(status, response.headers):
+                # Our partial no longer matches the remote file - start over
+                part.discard()
+                return stream_to_file(url, path, is_cancelled, record)
+            f = part.begin(status, response.headers)
+            if f is None:
+                return False, status
+            with f:
+                try:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        part.write(f, chunk)
+                        record.bytes += len(chunk)
+                        if is_cancelled():
+                            return False, status
+                except requests.RequestException as e:
+                    if is_cancelled():
+                        raise http_transport.RequestCancelled(url) from e
+                    raise
+    with profiling.span('image write', path=path):
+        return part.finish(), status
+
+
+def fetch_job(job, is_cancelled=lambda: False, controller=None, budget=None, policy=None):
+    """
+    Download one job with the blocking transport. Returns True on success.
+
+    When an AIMDController is given, the job holds one of its slots while
+    running and reports successes and congestion signals to it. A shared
+    WorkerBudget, if given, caps fetches across all running listings.
+    Transient failures are retried per `policy` (a retry_policy.RetryPolicy);
+    permanent ones move straight on to the next candidate. On failure the
+    last reason is left in job.failure.
+    """
+    if is_cancelled():
+        return False
+    if job.existing_file():
+        return True
+    if controller and not controller.acquire(is_cancelled, job.priority):
+        return False
+    if budget and not budget.acquire(is_cancelled, job.priority):
+        if controller:
+            controller.release()
+        return False
+
+    started = time.monotonic()
+    try:
+        for filename, img_url, variant in job.ordered_candidates():
+            attempt = 0
+            while True:
+                if is_cancelled():
+                    return False
+                attempt += 1
+                job.requests += 1
+                start = time.monotonic()
+                status = None
+                error = None
+                record = telemetry.RequestRecord(img_url, kind='image', listing=job.listing, variant=variant,
+                                                 attempt=attempt, listing_url=job.listing_url)
+                try:
+                    with profiling.span('image fetch', index=job.index, url=img_url, attempt=attempt):
+                        ok, status = stream_to_file(img_url, job.path_for(filename), is_cancelled, record)
+                    if ok:
+                        telemetry.recorder.finish(record)
+                        if controller:
+                            controller.record(time.monotonic() - start, status)
+                        job.failure = None
+                        job.bytes = os.path.getsize(job.path_for(filename))
+                        job.record_success(img_url, variant)
+                        return True
+                    # A full 200 body that is too small is a placeholder, not a glitch
+                    kind = retry_policy.classify_status(status)
+                    reason = f"HTTP {status}" if status != 200 else "placeholder image"
+                    if kind == retry_policy.TRANSIENT:
+                        error = reason
+                    telemetry.recorder.finish(record, error=reason)
+                except http_transport.RequestCancelled:
+                    return False
+                except Exception as e:
+                    kind, reason = retry_policy.classify_exception(e)
+                    telemetry.recorder.finish(record, error=reason if kind == retry_policy.TRANSIENT
+                                              else type(e).__name__)
+                    if kind == retry_policy.TRANSIENT:
+                        error = reason
+                    else:
+                        print(f"Image {job.index}: {img_url} failed: {e}", file=sys.stderr)
+                # Only congestion (429/5xx, timeouts, dropped connections) steers the
+                # limit; a 404 or a placeholder says nothing about server load
+                if controller and kind == retry_policy.TRANSIENT:
+                    controller.record(time.monotonic() - start, status, error)
+                if is_cancelled():
+                    return False
+                job.failure = {'reason': reason, 'kind': kind, 'attempts': attempt, 'url': img_url}
+                if not (policy and policy.should_retry(kind, attempt)):
+                    break
+                if not policy.sleep(attempt, is_cancelled):
+                    return False
+        return False
+    finally:
+        job.elapsed = time.monotonic() - started
+        if budget:
+            budget.release()
+        if controller:
+            controller.release()
+
+
+def run_threaded(jobs, workers=None, is_cancelled=lambda: False, on_progress=None, on_concurrency=None,
+                 budget=None, policy=None, on_image=None):
+    """
+    Run jobs on a thread pool.
+
+    The number of concurrent fetches is steered by an AIMDController starting
+    at `workers` (default concurrency.INITIAL_WORKERS); on_concurrency(limit,
+    reason) is called whenever it changes. on_progress(completed, total, ok)
+    and on_image(job, ok) are called from this thread after each job.
+    Returns the number of images downloaded (or already present).
+    """
+    downloaded = 0
+    completed = 0
+    total = len(jobs)
+    controller = concurrency.AIMDController(initial=workers or concurrency.INITIAL_WORKERS,
+                                            on_change=on_concurrency)
+    if on_concurrency:
+        on_concurrency(controller.limit, controller.reason)
+    http_transport.configure_pool(controller.maximum)
+
+    # Probe the first photo alone so every other worker starts on the right variant
+    if jobs and jobs[0].needs_probe():
+        ok = fetch_job(jobs[0], is_cancelled, controller, budget, policy)
+        if ok:
+            downloaded += 1
+        completed += 1
+        if on_image:
+            on_image(jobs[0], ok)
+        if on_progress:
+            on_progress(completed, total, ok)
+        jobs = jobs[1:]
+
+    # The pool is sized for the controller's ceiling; the controller decides how many actually fetch
+    with ThreadPoolExecutor(max_workers=controller.maximum) as executor:
+        futures = {executor.submit(fetch_job, job, is_cancelled, controller, budget, policy): job
+                   for job in jobs}
+        for future in as_completed(futures):
+            if is_cancelled():
+                # Cancel remaining futures
+                for f in futures:
+                    f.cancel()
+                break
+
+            ok = future.result()
+            if ok:
+                downloaded += 1
+            completed += 1
+            if on_image:
+                on_image(futures[future], ok)
+            if on_progress:
+                on_progress(completed, total, ok)
+
+    return downloaded
+
+
+def fetch_page(url, engine='threads', is_cancelled=lambda: False, headers=None):
+    """Fetch a listing page with the selected engine; returns (status, headers, text)."""
+    if engine == 'async':
+        import async_engine
+        if async_engine.AVAILABLE:
+            return async_engine.fetch_page(url, is_cancelled=is_cancelled, headers=headers)
+    response = http_transport.fetch_page(url, is_cancelled=is_cancelled, headers=headers)
+    return response.status_code, dict(response.headers), response.text
+
+
+def fetch_listing_html(url, engine='threads', is_cancelled=lambda: False, cache=None):
+    """Fetch a listing page's HTML with the selected engine, through a page_cache.PageCache if given."""
+    with profiling.span('page fetch', url=url):
+        if cache is None:
+            return fetch_page(url, engine, is_cancelled)[2]
+        return cache.fetch(url, lambda headers: fetch_page(url, engine, is_cancelled, headers))
+
+
+def run_jobs(jobs, engine='threads', workers=None, is_cancelled=lambda: False, on_progress=None, on_concurrency=None,
+             budget=None, on_image=None):
+    """
+    Run jobs with the selected engine ('threads' or 'async').
+
+    `budget` (a concurrency.WorkerBudget) only applies to the threaded engine;
+    the async engine's per-host semaphores are already shared by every listing.
+    Images that still fail after retrying are written to the property's
+    retry list (retry_policy.RETRY_FILENAME); a clean run clears it.
+    """
+    policy = retry_policy.RetryPolicy.for_jobs(len(jobs))
+    jobs = sorted(jobs, key=lambda job: job.priority)
+
+    def image_done(job, ok):
+        telemetry.recorder.job_done(job, ok)
+        if on_image:
+            on_image(job, ok)
+
+    try:
+        if engine == 'async':
+            import async_engine
+            if async_engine.AVAILABLE:
+                return async_engine.run_jobs(jobs, is_cancelled=is_cancelled, on_progress=on_progress, policy=policy,
+                                             on_image=image_done)
+            print("aiohttp is not installed - falling back to the threaded engine", file=sys.stderr)
+        return run_threaded(jobs, workers=workers, is_cancelled=is_cancelled, on_progress=on_progress,
+                            on_concurrency=on_concurrency, budget=budget, policy=policy, on_image=image_done)
+    finally:
+        if jobs:
+            jobs[0].formats.save()
+            record_failures(jobs, complete=not is_cancelled())
+
+
+def record_failures(jobs, complete=True):
+    """
+    Update the retry list of the jobs' property folder.
+
+    After a cancelled run (`complete=False`) earlier entries for jobs that
+    never ran are kept, so stopping early doesn't forget old failures.
+    """
+    folder = jobs[0].folder
+    failed = [job for job in jobs if job.failure and not job.existing_file()]
+    if not complete:
+        attempted = {job.index for job in jobs if job.failure or job.existing_file()}
+        earlier = [ImageJob.from_dict(folder, data) for data in retry_policy.load_retry_list(folder)
+                   if data['index'] not in attempted]
+        failed += [job for job in earlier if not job.existing_file()]
+    try:
+        retry_policy.write_retry_list(folder, failed)
+    except OSError as e:
+        print(f"Could not update retry list in {folder}: {e}", file=sys.stderr)
+
+
+def retry_failed(property_folder, engine='threads', is_cancelled=lambda: False, on_progress=None,
+                 on_concurrency=None, budget=None, on_image=None):
+    """
+    Re-download the images listed in a property's retry list without
+    refetching the listing page. Returns (downloaded, total).
+    """
+    jobs = [ImageJob.from_dict(property_folder, data) for data in retry_policy.load_retry_list(property_folder)]
+    if not jobs:
+        return 0, 0
+    url = library_index.read_details(property_folder).get('url')
+    for job in jobs:
+        job.listing_url = url
+    library_folder, name = os.path.split(os.path.abspath(property_folder))
+    try:
+        downloaded = run_jobs(jobs, engine=engine, is_cancelled=is_cancelled, on_progress=on_progress,
+                              on_concurrency=on_concurrency, budget=budget, on_image=on_image)
+    finally:
+        library_index.for_library(library_folder).update_property(name)
+        if url:
+            telemetry.recorder.listing_done(url, name)
+    return downloaded, len(jobs)
+
+
+class ListingResult:
+    """Outcome of downloading one listing."""
+
+    def __init__(self, url, site, address, folder, downloaded, total):
+        self.url = url
+        self.site = site
+        self.address = address
+        self.folder = folder
+        self.downloaded = downloaded
+        self.total = total
+
+
+def download_listing(url, output_folder, engine='threads', is_cancelled=lambda: False, on_progress=None,
+                     on_concurrency=None, budget=None, on_image=None):
+    """
+    Fetch a Redfin or Zillow listing, save its details and download every photo.
+
+    Raises if the page can't be fetched or has no photos. Returns a ListingResult.
+    """
+    listing = None
+    try:
+        html = fetch_listing_html(url, engine, is_cancelled, page_cache.for_library(output_folder))
+        with profiling.span('parse', url=url, bytes=len(html)):
+            listing = extractors.extract_listing(html, url)
+
+        property_folder = os.path.join(output_folder, listing.address)
+        if not os.path.exists(property_folder):
+            os.makedirs(property_folder)
+        with profiling.span('details', address=listing.address):
+            extractors.save_details(property_folder, details_schema.normalize(listing.details))
+
+        if not listing.images:
+            site_name = "Zillow page" if listing.site == 'zillow' else "page"
+            raise Exception(f"No images found on this {site_name}")
+
+        if listing.site == 'zillow':
+            image_jobs = zillow_jobs(property_folder, listing.images)
+        else:
+            image_jobs = redfin_jobs(property_folder, listing.images)
+        for job in image_jobs:
+            job.listing_url = url
+
+        try:
+            downloaded = run_jobs(image_jobs, engine=engine, is_cancelled=is_cancelled, on_progress=on_progress,
+                                  on_concurrency=on_concurrency, budget=budget, on_image=on_image)
+        finally:
+            library_index.for_library(output_folder).update_property(listing.address)
+        return ListingResult(url, listing.site, listing.address, property_folder, downloaded, len(image_jobs))
+    finally:
+        # Exported even when the page fetch or parse failed
+        telemetry.recorder.listing_done(url, listing.address if listing else None)
+
+
+def reextract_library(library_folder, on_progress=None):
+    """
+    Rebuild every property_details.json in a library from the cached listing
+    pages, without any network access. Returns (updated, missing), where
+    missing counts properties whose page isn't in the cache.
+    """
+    cache = page_cache.for_library(library_folder)
+    index = library_index.for_library(library_folder)
+    folders = [os.path.join(library_folder, d) for d in sorted(os.listdir(library_folder))
+               if not d.startswith('.') and os.path.isfile(os.path.join(library_folder, d, extractors.DETAILS_FILENAME))]
+    updated = missing = 0
+    for number, folder in enumerate(folders, 1):
+        try:
+            with open(os.path.join(folder, extractors.DETAILS_FILENAME), 'r') as f:
+                url = json.load(f).get('url')
+            cached = cache.lookup(url) if url else None
+            if cached is None:
+                missing += 1
+            else:
+                listing = extractors.extract_listing(cached.html, url)
+                extractors.save_details(folder, details_schema.normalize(listing.details, cached.fetched))
+                index.update_property(os.path.basename(folder))
+                updated += 1
+        except Exception as e:
+            print(f"Could not re-extract {folder}: {e}", file=sys.stderr)
+            missing += 1
+        if on_progress:
+            on_progress(number, len(folders))
+    cache.flush()
+    return updated, missing
@@ -0,0 +1,275 @@
+"""
+Persistent multi-listing download queue and scheduler.
+
+Listing URLs are queued in a JSON file inside the library folder so they
+survive restarts. QueueScheduler runs up to `max_parallel` listings at once;
+all of them share one WorkerBudget so the total number of image fetches in
+flight stays bounded no matter how many listings are running.
+"""
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+
+import cancellation
+import concurrency
+
+QUEUE_FILENAME = '.download_queue.json'
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED = (DONE, FAILED, CANCELLED)
+
+DEFAULT_PARALLEL_LISTINGS = 3
+DEFAULT_IMAGE_BUDGET = 24
+
+
+def parse_urls(text):
+    """Split pasted text (one or many URLs, any whitespace) into listing URLs."""
+    urls = []
+    for token in text.split():
+        token = token.strip().strip(',;')
+        if token.startswith('http') and ('redfin.com' in token or 'zillow.com' in token):
+            urls.append(token)
+    return urls
+
+
+class QueueJob:
+    """One listing in the queue."""
+
+    FIELDS = ('id', 'url', 'status', 'address', 'downloaded', 'completed', 'total', 'message', 'added')
+
+    def __init__(self, url, id=None, status=QUEUED, address='', downloaded=0, completed=0, total=0,
+                 message='', added=None):
+        self.id = id or uuid.uuid4().hex[:12]
+        self.url = url
+        self.status = status
+        self.address = address
+        self.downloaded = downloaded
+        self.completed = completed
+        self.total = total
+        self.message = message
+        self.added = added or time.time()
+
+        # Runtime only - set by the scheduler
+        self.token = cancellation.CancelToken()
+        self.budget = None
+        self.on_progress = None
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{k: v for k, v in data.items() if k in cls.FIELDS})
+
+    def is_cancelled(self):
+        return self.token.is_cancelled()
+
+    def report_progress(self, completed, total):
+        self.completed = completed
+        self.total = total
+        if self.on_progress:
+            self.on_progress(self)
+
+
+class DownloadQueue:
+    """Thread-safe ordered list of QueueJobs persisted to disk."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._jobs = []
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            self._jobs = [QueueJob.from_dict(d) for d in data.get('jobs', [])]
+        except Exception as e:
+            print(f"Could not load download queue: {e}", file=sys.stderr)
+            return
+        # Anything that was running when the app stopped goes back in line
+        for job in self._jobs:
+            if job.status == RUNNING:
+                job.status = QUEUED
+
+    def save(self):
+        # Serialise writers so concurrent saves can't interleave on the temp file
+        with self._save_lock:
+            with self._lock:
+                data = {'jobs': [job.to_dict() for job in self._jobs]}
+            folder = os.path.dirname(self.path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+            temp_path = self.path + '.tmp'
+            try:
+                with open(temp_path, 'w') as f:
+                    json.dump(data, f, indent=2)
+                os.replace(temp_path, self.path)
+            except OSError as e:
+                print(f"Could not save download queue: {e}", file=sys.stderr)
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs)
+
+    def get(self, job_id):
+        with self._lock:
+            for job in self._jobs:
+                if job.id == job_id:
+                    return job
+        return None
+
+    def add_urls(self, urls):
+        """Queue URLs that aren't already waiting or running. Returns the new jobs."""
+        added = []
+        with self._lock:
+            pending = {job.url for job in self._jobs if job.status in (QUEUED, RUNNING)}
+            for url in urls:
+                if url in pending:
+                    continue
+                pending.add(url)
+                job = QueueJob(url)
+                self._jobs.append(job)
+                added.append(job)
+        self.save()
+        return added
+
+    def next_queued(self):
+        with self._lock:
+            return next((job for job in self._jobs if job.status == QUEUED), None)
+
+    def counts(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs:
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return counts
+
+    def requeue(self, statuses=(FAILED, CANCELLED)):
+        """Put failed/cancelled jobs back in line."""
+        with self._lock:
+            for job in self._jobs:
+                if job.status in statuses:
+                    job.status = QUEUED
+                    job.message = ''
+        self.save()
+
+    def clear_finished(self):
+        with self._lock:
+            self._jobs = [job for job in self._jobs if job.status not in FINISHED]
+        self.save()
+
+
+class QueueScheduler:
+    """
+    Runs queued listings on background threads.
+
+    run_listing(job) does the actual work and returns (address, downloaded);
+    it should pass job.token down as the engine's `is_cancelled` (so stopping
+    aborts in-flight requests), call job.report_progress() and pass
+    job.budget down to the image engine. on_update(job) fires on every
+    status change and on_idle() once the queue drains; progress changes go
+    to on_progress(job) if given (so a GUI can coalesce them), otherwise to
+    on_update. All are called from worker threads.
+    """
+
+    def __init__(self, queue, run_listing, max_parallel=DEFAULT_PARALLEL_LISTINGS,
+                 image_budget=DEFAULT_IMAGE_BUDGET, on_update=None, on_idle=None, on_progress=None):
+        self.queue = queue
+        self.run_listing = run_listing
+        self.max_parallel = max_parallel
+        self.budget = concurrency.WorkerBudget(image_budget)
+        self.on_update = on_update
+        self.on_idle = on_idle
+        self.on_progress = on_progress
+        self._cond = threading.Condition()
+        self._active = {}
+        self._running = False
+        self._dispatcher = None
+
+    @property
+    def running(self):
+        return self._running
+
+    def active_count(self):
+        with self._cond:
+            return len(self._active)
+
+    def start(self):
+        with self._cond:
+            self._running = True
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+                self._dispatcher.start()
+            else:
+                self._cond.notify_all()
+
+    def stop(self):
+        """Cancel running listings and stop dispatching; queued jobs stay queued."""
+        with self._cond:
+            self._running = False
+            active = list(self._active.values())
+            self._cond.notify_all()
+        for job in active:
+            job.token.cancel()
+
+    def _dispatch(self):
+        with self._cond:
+            while True:
+                if self._running and len(self._active) < self.max_parallel:
+                    job = self.queue.next_queued()
+                    if job is not None:
+                        self._launch(job)
+                        continue
+                # Exit only once nothing is running and nothing more will be started
+                if not self._active and (not self._running or self.queue.next_queued() is None):
+                    self._running = False
+                    self._dispatcher = None
+                    break
+                self._cond.wait()
+        self.queue.save()
+        if self.on_idle:
+            self.on_idle()
+
+    def _launch(self, job):
+        job.status = RUNNING
+        job.token = cancellation.CancelToken()
+        job.message = ''
+        job.budget = self.budget
+        job.on_progress = self.on_progress or self._notify
+        self._active[job.id] = job
+        self._notify(job)
+        threading.Thread(target=self._run, args=(job,), daemon=True).start()
+
+    def _run(self, job):
+        try:
+            address, downloaded = self.run_listing(job)
+            job.address = address
+            job.downloaded = downloaded
+            job.status = CANCELLED if job.is_cancelled() else DONE
+        except Exception as e:
+            job.status = CANCELLED if job.is_cancelled() else FAILED
+            job.message = str(e)
+        finally:
+            job.budget = None
+            job.on_progress = None
+            self.queue.save()
+            self._notify(job)
+            with self._cond:
+                self._active.pop(job.id, None)
+                self._cond.notify_all()
+
+    def _notify(self, job):
+        if self.on_update:
+            self.on_update(job)
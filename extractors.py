@@ -0,0 +1,742 @@
+"""
+Listing page extractors shared by the GUI and the CLI.
+
+Each extractor takes the raw HTML of a listing page and returns a Listing with
+the folder-safe address, the property details saved to property_details.json
+and the photo identifiers the download engine turns into ImageJobs.
+
+The Redfin extractor reads the page in a single streaming pass (RedfinScanner)
+instead of building a BeautifulSoup tree and searching it over and over. The
+scanner is driven by lxml's C parser when lxml is installed and by the
+standard library's html.parser otherwise; extract_redfin_soup() is the
+original tree-based version, kept as the reference for benchmarks and as a
+fallback.
+
+extract_zillow() reads the property straight out of the page's __NEXT_DATA__
+JSON, found by string offset rather than through a parsed tree, and only falls
+back to extract_zillow_soup() for whatever that JSON does not provide.
+"""
+import html as html_lib
+import json
+import os
+import re
+import sys
+from html.parser import HTMLParser
+
+from bs4 import BeautifulSoup
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DETAILS_FILENAME = 'property_details.json'
+
+# Streaming parser used by extract_redfin(): 'lxml' or 'html.parser'
+PARSER_BACKENDS = ('lxml', 'html.parser') if etree is not None else ('html.parser',)
+DEFAULT_BACKEND = PARSER_BACKENDS[0]
+
+REDFIN_PHOTO_RE = re.compile(
+    r'ssl\.cdn-redfin\.com/photo/(\d+)/(?:bigphoto|mbphoto|mbphotov3)/(\d+)/([A-Z0-9]+_\d+(?:_[A-Z0-9]+)?)\.')
+REDFIN_JSON_PHOTO_RE = re.compile(r'"url":"https://ssl\.cdn-redfin\.com/photo/(\d+)/bigphoto/(\d+)/([^"]+?)\.')
+
+ZILLOW_NEXT_DATA_MARKER = 'id="__NEXT_DATA__"'
+ZILLOW_PHOTO_ID_RE = re.compile(r'photos\.zillowstatic\.com/fp/([a-f0-9]+)-')
+# Property keys holding the listing's own photo list, most complete first
+ZILLOW_PHOTO_KEYS = ('responsivePhotos', 'originalPhotos', 'photos')
+TITLE_RE = re.compile(r'<title[^>]*>(.*?)</title>', re.IGNORECASE | re.DOTALL)
+
+
+class Listing:
+    """Everything pulled out of one listing page."""
+
+    def __init__(self, site, address, details, images):
+        self.site = site
+        self.address = address
+        self.details = details
+        self.images = images
+
+
+def clean_address(address):
+    """Clean up an address for use as a folder name (remove invalid characters)."""
+    address = re.sub(r'[<>:"/\\|?*]', '', address)  # Remove invalid filename chars
+    return address.replace(',', '').strip()  # Remove commas
+
+
+def site_for_url(url):
+    """Return 'zillow' or 'redfin' for a listing URL (None if unsupported)."""
+    if "zillow.com" in url:
+        return 'zillow'
+    if "redfin.com" in url:
+        return 'redfin'
+    return None
+
+
+def extract_listing(html, url):
+    """Run the extractor matching the URL's site."""
+    if site_for_url(url) == 'zillow':
+        return extract_zillow(html, url)
+    return extract_redfin(html, url)
+
+
+def save_details(property_folder, details):
+    """Save details to the property's JSON file."""
+    details_file = os.path.join(property_folder, DETAILS_FILENAME)
+    with open(details_file, 'w') as f:
+        json.dump(details, f, indent=2)
+
+
+class _Capture:
+    """Text collected from one element while it is open."""
+
+    __slots__ = ('parts',)
+
+    def __init__(self):
+        self.parts = []
+
+    def text(self):
+        return ''.join(self.parts)
+
+    def stripped(self):
+        """Same as BeautifulSoup's get_text(strip=True)."""
+        return ''.join(part.strip() for part in self.parts if part.strip())
+
+
+class RedfinScanner:
+    """
+    Collects everything extract_redfin() needs in one pass over the page.
+
+    It receives start/end/data events either from html.parser (feed()) or as
+    an lxml parser target, and mirrors the searches the tree-based extractor
+    makes: the first element matching each selector, every stat-block, and the
+    text of every <span> (for the keyword fallback).
+    """
+
+    VOID_TAGS = frozenset(('area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link',
+                           'menuitem', 'meta', 'param', 'source', 'track', 'wbr', 'basefont', 'bgsound',
+                           'command', 'frame', 'image', 'isindex', 'nextid', 'spacer'))
+    SKIP_TEXT_TAGS = frozenset(('script', 'style'))
+    TEST_IDS = frozenset(('av-price', 'abp-price', 'abp-beds', 'av-beds', 'abp-baths', 'av-baths',
+                          'abp-sqFt', 'av-sqFt'))
+
+    def __init__(self):
+        self.first = {}         # selector name -> _Capture of the first matching element
+        self.order = {}         # selector name -> position of that element in the document
+        self.stat_blocks = []   # [value _Capture or None, label _Capture or None] per div.stat-block
+        self.spans = []         # _Capture per <span>, in document order
+        self._stack = []        # (tag, captures opened by this element)
+        self._active = []       # captures of all open elements
+        self._open_blocks = []  # stat-block entries currently open
+        self._count = 0
+        self._in_text = False   # True while consecutive data events make up one string
+
+    # --- event handlers ---
+
+    def start(self, tag, attrs):
+        tag = tag.lower()
+        self._in_text = False
+        if tag in self.VOID_TAGS:
+            return
+        self._count += 1
+        captures = []
+        classes = (attrs.get('class') or '').split()
+        test_id = attrs.get('data-rf-test-id')
+
+        if tag == 'span':
+            captures.append(self._new_capture(self.spans))
+        if tag == 'title':
+            self._first('title', captures)
+        elif tag == 'h1' and 'full-address' in classes:
+            self._first('full_address', captures)
+
+        if tag in ('div', 'span'):
+            if 'statsValue' in classes:
+                if tag == 'div':
+                    self._first('div.statsValue', captures)
+                self._fill_blocks(0, captures)
+            if 'statsLabel' in classes:
+                self._fill_blocks(1, captures)
+            if test_id in self.TEST_IDS:
+                self._first(f"{tag}[{test_id}]", captures)
+            if tag == 'div':
+                if 'stat-block' in classes:
+                    block = [None, None]
+                    self.stat_blocks.append(block)
+                    self._open_blocks.append(block)
+                    captures.append(block)
+                if 'remarks' in classes:
+                    self._first('div.remarks', captures)
+                if attrs.get('id') == 'marketing-remarks':
+                    self._first('div#marketing-remarks', captures)
+        elif tag == 'p' and 'property-description' in classes:
+            self._first('p.property-description', captures)
+
+        self._stack.append((tag, captures))
+        self._active.extend(c for c in captures if isinstance(c, _Capture))
+
+    def end(self, tag):
+        self._in_text = False
+        tag = tag.lower()
+        # Like BeautifulSoup: close up to the most recent matching element, ignore stray end tags
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i][0] == tag:
+                break
+        else:
+            return
+        while len(self._stack) > i:
+            _, captures = self._stack.pop()
+            for capture in captures:
+                if isinstance(capture, _Capture):
+                    self._active.remove(capture)
+                else:
+                    self._open_blocks.remove(capture)
+
+    def data(self, text):
+        if self._active and not (self._stack and self._stack[-1][0] in self.SKIP_TEXT_TAGS):
+            # Parsers may split one text node (e.g. around entities); keep it one string like bs4 does
+            for capture in self._active:
+                if self._in_text and capture.parts:
+                    capture.parts[-1] += text
+                else:
+                    capture.parts.append(text)
+        self._in_text = True
+
+    def comment(self, text):
+        # A comment separates text nodes even though no element starts or ends
+        self._in_text = False
+
+    def close(self):
+        return self
+
+    # --- helpers ---
+
+    @staticmethod
+    def _new_capture(collection):
+        capture = _Capture()
+        collection.append(capture)
+        return capture
+
+    def _first(self, name, captures):
+        if name not in self.first:
+            capture = _Capture()
+            self.first[name] = capture
+            self.order[name] = self._count
+            captures.append(capture)
+
+    def _fill_blocks(self, slot, captures):
+        for block in self._open_blocks:
+            if block[slot] is None:
+                block[slot] = _Capture()
+                captures.append(block[slot])
+
+    def text(self, *names, strip=True):
+        """Text of the first element found for the first matching selector name (None if none)."""
+        for name in names:
+            capture = self.first.get(name)
+            if capture is not None:
+                return capture.stripped() if strip else capture.text()
+        return None
+
+
+class _StdlibDriver(HTMLParser):
+    """Feeds html.parser events into a RedfinScanner."""
+
+    def __init__(self, scanner):
+        super().__init__(convert_charrefs=True)
+        self.scanner = scanner
+
+    def handle_starttag(self, tag, attrs):
+        self.scanner.start(tag, dict(attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        self.scanner.start(tag, dict(attrs))
+        self.scanner.end(tag)
+
+    def handle_endtag(self, tag):
+        self.scanner.end(tag)
+
+    def handle_data(self, data):
+        self.scanner.data(data)
+
+    def handle_comment(self, data):
+        self.scanner.comment(data)
+
+
+def scan_redfin(html, backend=None):
+    """Run one streaming pass over a Redfin page and return the RedfinScanner."""
+    backend = backend or DEFAULT_BACKEND
+    scanner = RedfinScanner()
+    if backend == 'lxml':
+        if etree is None:
+            raise ValueError("The lxml backend requires lxml (pip install lxml)")
+        parser = etree.HTMLParser(target=scanner)
+        parser.feed(html)
+        parser.close()
+    elif backend == 'html.parser':
+        driver = _StdlibDriver(scanner)
+        driver.feed(html)
+        driver.close()
+    else:
+        raise ValueError(f"Unknown parser backend: {backend}")
+    return scanner
+
+
+def redfin_photos(html):
+    """Return unique (cdn_num, photo_id, photo_name) tuples found in a Redfin page."""
+    images = []
+    seen = set()
+    # Pattern 1: Standard CDN pattern with full photo IDs
+    for cdn_num, photo_id, photo_name in REDFIN_PHOTO_RE.findall(html):
+        key = f"{photo_id}/{photo_name}"
+        if key not in seen:
+            seen.add(key)
+            images.append((cdn_num, photo_id, photo_name))
+    # Pattern 2: Look for image data in JSON/JavaScript
+    if not images:
+        for cdn_num, photo_id, photo_name in REDFIN_JSON_PHOTO_RE.findall(html):
+            key = f"{photo_id}/{photo_name}"
+            if key not in seen:
+                seen.add(key)
+                images.append((cdn_num, photo_id, photo_name))
+    return images
+
+
+def extract_redfin(html, url, backend=None):
+    """Extract address, details and (cdn_num, photo_id, photo_name) photos from a Redfin page."""
+    try:
+        page = scan_redfin(html, backend)
+    except Exception as e:
+        print(f"Streaming Redfin parse failed ({e}), falling back to BeautifulSoup", file=sys.stderr)
+        return extract_redfin_soup(html, url)
+
+    # Extract address
+    address = "property"
+    title_text = page.text('title', strip=False)
+    if title_text and '|' in title_text:
+        address = title_text.split('|')[0].strip()
+    if address == "property":
+        full_address = page.text('full_address')
+        if full_address is not None:
+            address = full_address
+    address = clean_address(address)
+
+    details = {
+        'address': address,
+        'url': url,
+        'price': 'N/A',
+        'beds': 'N/A',
+        'baths': 'N/A',
+        'sqft': 'N/A',
+        'description': 'No description available'
+    }
+
+    # Price - multiple possible patterns for Redfin
+    price = page.text('div.statsValue', 'span[av-price]', 'div[abp-price]')
+    if price is not None:
+        details['price'] = price
+
+    # Pattern 1: stat-block
+    for value, label in page.stat_blocks:
+        if value is not None and label is not None:
+            label_text = label.stripped().lower()
+            if 'bed' in label_text: details['beds'] = value.stripped()
+            elif 'bath' in label_text: details['baths'] = value.stripped()
+            elif 'sq' in label_text: details['sqft'] = value.stripped()
+
+    # Pattern 2: data-rf-test-id (div before span, abp before av - as the tree search did)
+    for field, test_ids in (('beds', ('abp-beds', 'av-beds')), ('baths', ('abp-baths', 'av-baths')),
+                            ('sqft', ('abp-sqFt', 'av-sqFt'))):
+        if details[field] == 'N/A':
+            text = _first_in_order(page, test_ids)
+            if text:
+                details[field] = text.split()[0]
+
+    # Pattern 3: Generic span search for keywords if still N/A
+    if details['beds'] == 'N/A' or details['baths'] == 'N/A':
+        for span in page.spans:
+            text = span.text().lower()
+            if 'bed' in text and ' ' in text and details['beds'] == 'N/A':
+                val = text.split()[0]
+                if val.isdigit(): details['beds'] = val
+            elif 'bath' in text and ' ' in text and details['baths'] == 'N/A':
+                val = text.split()[0]
+                if val.isdigit(): details['baths'] = val
+            elif 'sq' in text and 'ft' in text and details['sqft'] == 'N/A':
+                val = text.split()[0].replace(',', '')
+                if val.isdigit(): details['sqft'] = val
+
+    description = page.text('div.remarks', 'div#marketing-remarks', 'p.property-description')
+    if description is not None:
+        details['description'] = description[:500]
+
+    return Listing('redfin', address, details, redfin_photos(html))
+
+
+def _first_in_order(page, test_ids):
+    """
+    soup.find(['div', 'span'], {...}) returns whichever element comes first in
+    the document; the scanner records div and span matches separately, so pick
+    the earlier of the two by capture order.
+    """
+    for test_id in test_ids:
+        found = [name for name in (f"div[{test_id}]", f"span[{test_id}]") if name in page.first]
+        if found:
+            return page.first[min(found, key=page.order.get)].stripped()
+    return None
+
+
+def extract_redfin_soup(html, url):
+    """Tree-based Redfin extractor (the original implementation); same results as extract_redfin()."""
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    # Extract address
+    address = "property"
+    title_tag = soup.find('title')
+    if title_tag:
+        title_text = title_tag.get_text()
+        if '|' in title_text:
+            address = title_text.split('|')[0].strip()
+    
+    if address == "property":
+        address_tag = soup.find('h1', class_='full-address')
+        if address_tag:
+            address = address_tag.get_text(strip=True)
+    
+    address = clean_address(address)
+    
+    # Extract property details
+    details = {
+        'address': address,
+        'url': url,
+        'price': 'N/A',
+        'beds': 'N/A',
+        'baths': 'N/A',
+        'sqft': 'N/A',
+        'description': 'No description available'
+    }
+    
+    try:
+        # Extract price - multiple possible patterns for Redfin
+        price_tag = soup.find('div', class_='statsValue') or \
+                    soup.find('span', {'data-rf-test-id': 'av-price'}) or \
+                    soup.find('div', {'data-rf-test-id': 'abp-price'})
+        if price_tag:
+            details['price'] = price_tag.get_text(strip=True)
+        
+        # Extract beds/baths/sqft from stats - multiple Redfin patterns
+        # Pattern 1: stat-block
+        stats_divs = soup.find_all('div', class_='stat-block')
+        for stat in stats_divs:
+            span = stat.find(['span', 'div'], class_='statsValue')
+            label = stat.find(['span', 'div'], class_='statsLabel')
+            if span and label:
+                value = span.get_text(strip=True)
+                label_text = label.get_text(strip=True).lower()
+                if 'bed' in label_text: details['beds'] = value
+                elif 'bath' in label_text: details['baths'] = value
+                elif 'sq' in label_text: details['sqft'] = value
+        
+        # Pattern 2: data-rf-test-id
+        if details['beds'] == 'N/A':
+            beds_tag = soup.find(['div', 'span'], {'data-rf-test-id': 'abp-beds'}) or \
+                       soup.find(['div', 'span'], {'data-rf-test-id': 'av-beds'})
+            if beds_tag: details['beds'] = beds_tag.get_text(strip=True).split()[0]
+        
+        if details['baths'] == 'N/A':
+            baths_tag = soup.find(['div', 'span'], {'data-rf-test-id': 'abp-baths'}) or \
+                        soup.find(['div', 'span'], {'data-rf-test-id': 'av-baths'})
+            if baths_tag: details['baths'] = baths_tag.get_text(strip=True).split()[0]
+        
+        if details['sqft'] == 'N/A':
+            sqft_tag = soup.find(['div', 'span'], {'data-rf-test-id': 'abp-sqFt'}) or \
+                       soup.find(['div', 'span'], {'data-rf-test-id': 'av-sqFt'})
+            if sqft_tag: details['sqft'] = sqft_tag.get_text(strip=True).split()[0]
+
+        # Pattern 3: Generic span search for keywords if still N/A
+        if details['beds'] == 'N/A' or details['baths'] == 'N/A':
+            for span in soup.find_all('span'):
+                text = span.get_text().lower()
+                if 'bed' in text and ' ' in text and details['beds'] == 'N/A':
+                    val = text.split()[0]
+                    if val.isdigit(): details['beds'] = val
+                elif 'bath' in text and ' ' in text and details['baths'] == 'N/A':
+                    val = text.split()[0]
+                    if val.isdigit(): details['baths'] = val
+                elif 'sq' in text and 'ft' in text and details['sqft'] == 'N/A':
+                    val = text.split()[0].replace(',', '')
+                    if val.isdigit(): details['sqft'] = val
+        
+        # Extract description
+        desc_tag = soup.find('div', class_='remarks') or \
+                   soup.find('div', {'id': 'marketing-remarks'}) or \
+                   soup.find('p', class_='property-description')
+        if desc_tag:
+            details['description'] = desc_tag.get_text(strip=True)[:500]
+    except Exception as e:
+        print(f"Error extracting Redfin property details: {e}", file=sys.stderr)
+    
+    return Listing('redfin', address, details, redfin_photos(html))
+
+
+def loads(text):
+    """Decode JSON with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def page_title(html):
+    """Text of the page's <title> element, or None."""
+    match = TITLE_RE.search(html)
+    return html_lib.unescape(match.group(1)) if match else None
+
+
+def zillow_next_data(html):
+    """Return the raw JSON text of the __NEXT_DATA__ script, or None."""
+    marker = html.find(ZILLOW_NEXT_DATA_MARKER)
+    if marker == -1:
+        return None
+    start = html.find('>', marker)
+    end = html.find('</script>', start)
+    if start == -1 or end == -1:
+        return None
+    return html[start + 1:end]
+
+
+def zillow_property(html):
+    """Return the property dict from the page's __NEXT_DATA__, or None if it isn't there."""
+    raw = zillow_next_data(html)
+    if not raw:
+        return None
+    data = loads(raw)
+    gdp = data.get('props', {}).get('pageProps', {}).get('componentProps', {}).get('gdpClientCache')
+    if isinstance(gdp, str):
+        # gdpClientCache is itself JSON encoded as a string
+        gdp = loads(gdp)
+    if not isinstance(gdp, dict):
+        return None
+    best = None
+    for key, entry in gdp.items():
+        prop = entry.get('property') if isinstance(entry, dict) else None
+        if not prop:
+            continue
+        if 'PriorityQuery' in key:
+            return prop
+        if best is None:
+            best = prop
+    return best
+
+
+def _photo_urls(value):
+    """Yield every string nested inside a photo entry."""
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _photo_urls(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _photo_urls(item)
+
+
+def zillow_photo_ids(prop):
+    """Photo ids of the listing, in gallery order, from its property dict."""
+    for key in ZILLOW_PHOTO_KEYS:
+        photos = prop.get(key)
+        if not isinstance(photos, list):
+            continue
+        images = []
+        seen = set()
+        for photo in photos:
+            for url in _photo_urls(photo):
+                match = ZILLOW_PHOTO_ID_RE.search(url)
+                if match and match.group(1) not in seen:
+                    seen.add(match.group(1))
+                    images.append(match.group(1))
+                    break
+        if images:
+            return images
+    return []
+
+
+def _grouped(value, prefix=''):
+    """A JSON number with thousands separators; anything else (e.g. "Contact agent") as it is."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f"{prefix}{value:,}"
+    return str(value)
+
+
+def extract_zillow(html, url):
+    """Extract address, details and photo ids from a Zillow page."""
+    address = "property"
+    title_text = page_title(html)
+    if title_text and '|' in title_text:
+        address = title_text.split('|')[0].strip()
+    address = clean_address(address)
+
+    details = {
+        'address': address,
+        'url': url,
+        'price': 'N/A',
+        'beds': 'N/A',
+        'baths': 'N/A',
+        'sqft': 'N/A',
+        'description': 'No description available'
+    }
+    images = []
+
+    try:
+        prop = zillow_property(html)
+    except Exception as e:
+        print(f"Zillow JSON parsing error: {e}", file=sys.stderr)
+        prop = None
+    if prop is None:
+        # No usable __NEXT_DATA__: fall back to the HTML heuristics
+        return extract_zillow_soup(html, url)
+
+    if prop.get('price') is not None:
+        details['price'] = _grouped(prop['price'], '$')
+    if prop.get('bedrooms') is not None:
+        details['beds'] = str(prop['bedrooms'])
+    if prop.get('bathrooms') is not None:
+        details['baths'] = str(prop['bathrooms'])
+    if prop.get('livingArea') is not None:
+        details['sqft'] = _grouped(prop['livingArea'])
+    if prop.get('description') is not None:
+        details['description'] = prop['description']
+    return Listing('zillow', address, details, zillow_photo_ids(prop))
+
+
+def extract_zillow_soup(html, url):
+    """Original tree-based Zillow extractor (reference for benchmarks and fallback)."""
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    # Extract address from Zillow
+    address = "property"
+    title_tag = soup.find('title')
+    if title_tag:
+        title_text = title_tag.get_text()
+        if '|' in title_text:
+            address = title_text.split('|')[0].strip()
+    
+    address = clean_address(address)
+    
+    # Extract Zillow property details
+    details = {
+        'address': address,
+        'url': url,
+        'price': 'N/A',
+        'beds': 'N/A',
+        'baths': 'N/A',
+        'sqft': 'N/A',
+        'description': 'No description available'
+    }
+    
+    try:
+        # Attempt to find Zillow's JSON data in script tags (much more reliable)
+        from_json = False
+        script_tag = soup.find('script', id='__NEXT_DATA__')
+        if script_tag:
+            data = json.loads(script_tag.string)
+            try:
+                # Navigate the complex Zillow JSON structure
+                # CRITICAL: gdpClientCache is often a STRING of JSON, not a dict
+                gdp_raw = data.get('props', {}).get('pageProps', {}).get('componentProps', {}).get('gdpClientCache', '{}')
+                
+                gdp_data = {}
+                if isinstance(gdp_raw, str):
+                    gdp_data = json.loads(gdp_raw)
+                else:
+                    gdp_data = gdp_raw
+                
+                # Find the key that contains property data (e.g., "ForSalePriorityQuery...")
+                cache_key = next((k for k in gdp_data.keys() if 'PriorityQuery' in k), None)
+                
+                if cache_key:
+                    prop = gdp_data[cache_key].get('property', {})
+                    from_json = True
+                    
+                    if prop.get('price') is not None:
+                        details['price'] = _grouped(prop['price'], '$')
+                    if prop.get('bedrooms') is not None:
+                        details['beds'] = str(prop.get('bedrooms'))
+                    if prop.get('bathrooms') is not None:
+                        details['baths'] = str(prop.get('bathrooms'))
+                    if prop.get('livingArea') is not None:
+                        details['sqft'] = _grouped(prop['livingArea'])
+                    if prop.get('description') is not None:
+                        details['description'] = prop.get('description')
+            except Exception as e:
+                print(f"Zillow JSON parsing error: {e}", file=sys.stderr)
+
+        # Fall back to HTML parsing only if the JSON was missing or unparseable
+        if not from_json:
+            if details['price'] == 'N/A':
+                price_tag = soup.find(['span', 'div'], {'data-testid': 'price'})
+                if price_tag: details['price'] = price_tag.get_text(strip=True)
+        
+            # Improved HTML stats fallback (Zillow uses same test-id for all 3 stats)
+            if details['beds'] == 'N/A' or details['baths'] == 'N/A' or details['sqft'] == 'N/A':
+                stat_containers = soup.find_all(['div', 'span'], {'data-testid': 'bed-bath-sqft-fact-container'})
+                for container in stat_containers:
+                    text = container.get_text(separator=' ').lower()
+                    # Extract the first number found in this specific container
+                    num_match = re.search(r'([\d,]+)', text)
+                    if num_match:
+                        val = num_match.group(1)
+                        if 'bed' in text and details['beds'] == 'N/A': details['beds'] = val
+                        elif 'bath' in text and details['baths'] == 'N/A': details['baths'] = val
+                        elif 'sq' in text and details['sqft'] == 'N/A': details['sqft'] = val
+
+            # Final fallback for stats string like "3 bd 2 ba 1,752 sqft"
+            if details['beds'] == 'N/A' or details['sqft'] == 'N/A':
+                stats_container = soup.find('div', {'data-testid': 'bed-bath-sqft-facts'}) or \
+                                  soup.find('p', class_='ds-bed-bath-living-area')
+                if stats_container:
+                    stats_text = stats_container.get_text(separator=' ').lower()
+                    beds_match = re.search(r'(\d+)\s*(?:bd|bed)', stats_text)
+                    baths_match = re.search(r'(\d+)\s*(?:ba|bath)', stats_text)
+                    sqft_match = re.search(r'([\d,]+)\s*sqft', stats_text)
+                    if beds_match and details['beds'] == 'N/A': details['beds'] = beds_match.group(1)
+                    if baths_match and details['baths'] == 'N/A': details['baths'] = baths_match.group(1)
+                    if sqft_match and details['sqft'] == 'N/A': details['sqft'] = sqft_match.group(1)
+
+            if details['description'] == 'No description available':
+                desc_tag = soup.find('p', {'data-testid': 'main-content'}) or \
+                           soup.find('div', {'data-testid': 'description'})
+                if desc_tag: details['description'] = desc_tag.get_text(strip=True)
+
+    except Exception as e:
+        print(f"Error extracting Zillow property details: {e}", file=sys.stderr)
+        
+    # Extract Zillow images
+    images = []
+    zillow_pattern = r'https://photos\.zillowstatic\.com/fp/([a-f0-9]+)-(?:cc_ft_\d+|uncropped_scaled_within_\d+_\d+)'
+    matches = re.findall(zillow_pattern, html)
+    
+    if matches:
+        seen = set()
+        for photo_id in matches:
+            if photo_id not in seen:
+                seen.add(photo_id)
+                images.append(photo_id)
+    
+    if not images:
+        json_pattern = r'"hiResImageLink":"(https://photos\.zillowstatic\.com/fp/[^"]+)"'
+        json_matches = re.findall(json_pattern, html)
+        if json_matches:
+            seen = set()
+            for img_url in json_matches:
+                photo_id_match = re.search(r'/fp/([a-f0-9]+)-', img_url)
+                if photo_id_match:
+                    photo_id = photo_id_match.group(1)
+                    if photo_id not in seen:
+                        seen.add(photo_id)
+                        images.append(photo_id)
+    
+    return Listing('zillow', address, details, images)
@@ -0,0 +1,121 @@
+"""
+Format/size negotiation cache for the photo CDNs.
+
+Remembers which candidate variant (e.g. 'webp' on Redfin, 'cc_ft_1536.webp' on
+Zillow) actually worked, per listing and per CDN host, so the rest of a listing
+goes straight to the right URL instead of walking the whole fallback list for
+every photo. Entries are persisted to a small JSON file with a TTL.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+CACHE_FILENAME = '.format_cache.json'
+
+# How long a learned answer stays valid
+LISTING_TTL = 7 * 24 * 3600
+HOST_TTL = 24 * 3600
+
+
+def host_of(url):
+    return urlparse(url).netloc.lower()
+
+
+class FormatCache:
+    """Thread-safe variant cache backed by a JSON file."""
+
+    def __init__(self, path, listing_ttl=LISTING_TTL, host_ttl=HOST_TTL):
+        self.path = path
+        self.listing_ttl = listing_ttl
+        self.host_ttl = host_ttl
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._data = {'listings': {}, 'hosts': {}}
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            self._data['listings'] = data.get('listings', {})
+            self._data['hosts'] = data.get('hosts', {})
+        except Exception as e:
+            print(f"Ignoring unreadable format cache {self.path}: {e}", file=sys.stderr)
+
+    def save(self):
+        """Write the cache back to disk if anything changed (expired entries are dropped)."""
+        with self._lock:
+            if not self._dirty:
+                return
+            now = time.time()
+            data = {
+                'listings': {k: v for k, v in self._data['listings'].items() if now - v['ts'] < self.listing_ttl},
+                'hosts': {k: v for k, v in self._data['hosts'].items() if now - v['ts'] < self.host_ttl},
+            }
+            self._dirty = False
+        temp_path = self.path + '.tmp'
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump(data, f, indent=2)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Could not save format cache: {e}", file=sys.stderr)
+
+    def _fresh(self, entry, ttl):
+        return entry is not None and time.time() - entry['ts'] < ttl
+
+    def preferred(self, listing, host):
+        """Return the variant known to work for this listing (or, failing that, this CDN)."""
+        with self._lock:
+            entry = self._data['listings'].get(f"{listing}|{host}")
+            if self._fresh(entry, self.listing_ttl):
+                return entry['variant']
+            entry = self._data['hosts'].get(host)
+            if self._fresh(entry, self.host_ttl):
+                return entry['variant']
+        return None
+
+    def knows_listing(self, listing, host):
+        with self._lock:
+            return self._fresh(self._data['listings'].get(f"{listing}|{host}"), self.listing_ttl)
+
+    def record(self, listing, host, variant):
+        """Remember that `variant` worked for this listing and CDN."""
+        entry = {'variant': variant, 'ts': time.time()}
+        with self._lock:
+            key = f"{listing}|{host}"
+            old = self._data['listings'].get(key)
+            if old is None or old['variant'] != variant or not self._fresh(old, self.listing_ttl / 2):
+                self._data['listings'][key] = entry
+                self._data['hosts'][host] = entry
+                self._dirty = True
+
+    def order(self, listing, candidates):
+        """Return candidates with the learned variant moved to the front."""
+        if not candidates:
+            return candidates
+        variant = self.preferred(listing, host_of(candidates[0][1]))
+        if variant is None:
+            return candidates
+        first = [c for c in candidates if c[2] == variant]
+        return first + [c for c in candidates if c[2] != variant]
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def for_library(library_folder):
+    """Return the shared cache stored in the root of a download library."""
+    path = os.path.abspath(os.path.join(library_folder, CACHE_FILENAME))
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = FormatCache(path)
+            _caches[path] = cache
+        return cache
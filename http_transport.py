@@ -0,0 +1,243 @@
+"""
+Shared HTTP transport for the GUI, the CLI and the updater.
+
+Every fetch goes through a keep-alive requests.Session kept per host, so the
+listing page, the photo CDN and the GitHub API each reuse their TCP/TLS
+connections instead of doing a fresh handshake for every image. Requests also
+wait on the host's token bucket (rate_limit) before going out.
+
+Passing a cancellation.CancelToken as `is_cancelled` makes a request abortable
+while it is in flight: its socket is shut down as soon as the token is
+cancelled and the call raises RequestCancelled.
+
+Every request is timed into a telemetry.RequestRecord; new connections report
+their DNS, connect and TLS time to it.
+"""
+import socket
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+import cancellation
+import rate_limit
+import telemetry
+
+# Set headers to mimic a browser
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+DEFAULT_HEADERS = {
+    'User-Agent': USER_AGENT,
+    'Accept-Encoding': 'gzip, deflate',
+}
+
+# (connect, read) timeouts in seconds
+PAGE_TIMEOUT = (10, 30)
+IMAGE_TIMEOUT = (5, 10)
+API_TIMEOUT = 10
+
+# Default number of image workers; pools are sized to match
+DEFAULT_POOL_SIZE = 10
+
+
+class RequestCancelled(Exception):
+    """Raised when a request is abandoned because its job was cancelled."""
+
+
+def _watched_request(conn, request, *args, **kwargs):
+    # Watch the connection while it connects and sends, then the socket itself:
+    # http.client drops conn.sock once a Connection: close response takes it over.
+    cancellation.watch_socket(lambda: conn.sock)
+    result = request(*args, **kwargs)
+    sock = conn.sock
+    cancellation.watch_socket(lambda: sock)
+    return result
+
+
+def _timed_new_conn(conn, new_conn):
+    """
+    Open a connection, reporting DNS and TCP connect time to the current
+    telemetry record. The name is resolved here (and each address tried in
+    turn) so the two phases can be told apart.
+    """
+    record = telemetry.current()
+    if record is None:
+        return new_conn()
+    started = time.perf_counter()
+    try:
+        addresses = socket.getaddrinfo(conn._dns_host, conn.port, 0, socket.SOCK_STREAM)
+    except OSError:
+        # Let urllib3 resolve (and raise its own error)
+        return new_conn()
+    dns = time.perf_counter() - started
+    host = conn._dns_host
+    last_error = None
+    try:
+        for address in dict.fromkeys(info[4][0] for info in addresses):
+            conn._dns_host = address
+            try:
+                sock = new_conn()
+            except Exception as e:
+                last_error = e
+                continue
+            record.connection_opened(dns, time.perf_counter() - started - dns)
+            return sock
+    finally:
+        conn._dns_host = host
+    raise last_error
+
+
+class _WatchedHTTPConnection(HTTPConnection):
+    """
+    Connection whose socket is shut down if the thread's bound CancelToken is
+    cancelled, and which times new connections for telemetry.
+    """
+
+    def request(self, *args, **kwargs):
+        return _watched_request(self, super().request, *args, **kwargs)
+
+    def _new_conn(self):
+        return _timed_new_conn(self, super()._new_conn)
+
+
+class _WatchedHTTPSConnection(HTTPSConnection):
+    def request(self, *args, **kwargs):
+        return _watched_request(self, super().request, *args, **kwargs)
+
+    def _new_conn(self):
+        return _timed_new_conn(self, super()._new_conn)
+
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        record = telemetry.current()
+        if record is not None and not record.reused:
+            record.tls = max(0.0, time.perf_counter() - started - record.dns - record.connect)
+
+
+class _WatchedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _WatchedHTTPConnection
+
+
+class _WatchedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _WatchedHTTPSConnection
+
+
+class CancellableAdapter(HTTPAdapter):
+    """HTTPAdapter whose connections can be aborted through cancellation.bind()."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _WatchedHTTPConnectionPool,
+            'https': _WatchedHTTPSConnectionPool,
+        }
+
+
+_sessions = {}
+_pool_size = DEFAULT_POOL_SIZE
+_lock = threading.Lock()
+
+
+def _host_key(url):
+    """Return the scheme://host part of a URL used to key sessions."""
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}".lower()
+
+
+def _build_session(pool_size):
+    """Create a Session with connection pools sized for the worker count."""
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    adapter = CancellableAdapter(pool_connections=4, pool_maxsize=pool_size, pool_block=False)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def configure_pool(size):
+    """
+    Size the per-host connection pools for `size` concurrent workers.
+
+    Existing sessions are replaced only when the pool needs to grow, so
+    callers can invoke this before every job without dropping live connections.
+    """
+    global _pool_size
+    size = max(1, int(size))
+    with _lock:
+        if size <= _pool_size:
+            return
+        _pool_size = size
+        old = list(_sessions.values())
+        _sessions.clear()
+    for session in old:
+        session.close()
+
+
+def get_session(url):
+    """Return the shared keep-alive Session for the host of `url`."""
+    key = _host_key(url)
+    with _lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _build_session(_pool_size)
+            _sessions[key] = session
+        return session
+
+
+def get(url, timeout=IMAGE_TIMEOUT, is_cancelled=lambda: False, record=None, kind='request', **kwargs):
+    """
+    GET `url` through the pooled session for its host, respecting its rate limit.
+
+    With stream=True only the headers are covered by a CancelToken here; wrap
+    the body reads in cancellation.bind() as well (see download_engine.stream_to_file).
+
+    The request is timed into `record` (a telemetry.RequestRecord); the caller
+    then counts the body bytes and hands it to telemetry.recorder.finish().
+    Without a record one (of the given `kind`) is made and finished here, once
+    the body is read (or, with stream=True, once the headers are in).
+    """
+    owned = record is None
+    if owned:
+        record = telemetry.RequestRecord(url, kind=kind)
+    if not rate_limit.bucket_for(url).acquire(is_cancelled):
+        raise RequestCancelled(url)
+    record.begin()
+    with cancellation.bind(is_cancelled), telemetry.active(record):
+        try:
+            response = get_session(url).get(url, timeout=timeout, **kwargs)
+        except requests.RequestException as e:
+            if is_cancelled():
+                raise RequestCancelled(url) from e
+            if owned:
+                telemetry.recorder.finish(record, error=type(e).__name__)
+            raise
+    if is_cancelled():
+        response.close()
+        raise RequestCancelled(url)
+    record.headers_received(response.status_code, response.elapsed.total_seconds())
+    if owned:
+        if not kwargs.get('stream'):
+            record.bytes = len(response.content)
+        telemetry.recorder.finish(record)
+    rate_limit.observe_response(url, response.status_code, response.headers)
+    return response
+
+
+def fetch_page(url, **kwargs):
+    """Fetch a listing page and raise on HTTP errors."""
+    response = get(url, timeout=PAGE_TIMEOUT, kind='page', **kwargs)
+    response.raise_for_status()
+    return response
+
+
+def close_all():
+    """Close every pooled session (used on shutdown)."""
+    with _lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.close()
@@ -0,0 +1,468 @@
+"""
+Persistent SQLite index of a download library.
+
+<library>/.library.sqlite3 holds one row per property folder (image count and
+the parsed property_details.json) and one per image (size, mtime and pixel
+dimensions). With it the explorer can list thousands of properties without
+globbing every folder and parsing every details file.
+
+The index is reconciled with the filesystem by modification time. A folder
+is rescanned only when its own mtime changed (files added, removed or
+renamed in it) or its details file's mtime changed. Image dimensions are
+read from the file headers when a single property is updated or asked for,
+never during a library-wide reconcile, so the first scan of a large
+library stays fast. Downloads,
+re-extraction and deletes also update the index directly (update_property /
+remove_property). The database is only a cache: deleting it costs one full
+scan.
+
+Each property row also stores the typed fields of details_schema (price in
+cents, square feet, beds, baths, fetch time, source site). SortIndex sorts
+the explorer's columns on those numbers once, in memory, and keeps the
+orders up to date as single properties change.
+"""
+import bisect
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+import details_schema
+from dedup_store import IMAGE_EXTENSIONS
+from extractors import DETAILS_FILENAME
+
+INDEX_FILENAME = '.library.sqlite3'
+
+# Bump when the tables or what gets indexed change; an index with another version is rebuilt
+SCHEMA_VERSION = 3
+
+SCHEMA = """
+CREATE TABLE properties (
+    name TEXT PRIMARY KEY,
+    folder_mtime INTEGER NOT NULL,
+    details_mtime INTEGER,
+    image_count INTEGER NOT NULL,
+    price TEXT,
+    sqft TEXT,
+    beds TEXT,
+    baths TEXT,
+    url TEXT,
+    details TEXT,
+    price_cents INTEGER,
+    sqft_value INTEGER,
+    beds_value INTEGER,
+    baths_value REAL,
+    fetched_at INTEGER,
+    source TEXT
+);
+CREATE TABLE images (
+    property TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    PRIMARY KEY (property, name)
+);
+"""
+
+# Folders rescanned per transaction during a reconcile
+COMMIT_EVERY = 200
+
+# properties columns that make up a PropertyRow
+ROW_COLUMNS = ('name, image_count, price, sqft, beds, baths, url, '
+               'price_cents, sqft_value, beds_value, baths_value, fetched_at, source')
+
+# Explorer columns and the PropertyRow attribute each one sorts by (None: the default name order)
+SORT_FIELDS = {None: 'name', '#0': 'name', 'price': 'price_cents', 'sqft': 'sqft_value',
+               'beds': 'beds_value', 'baths': 'baths_value'}
+
+
+def _mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def is_image_name(name):
+    """True for a visible image file name, whatever the case of its extension (.JPG, .WebP...)."""
+    return name.lower().endswith(IMAGE_EXTENSIONS) and not name.startswith('.')
+
+
+def image_size(path):
+    """(width, height) from the image header; (0, 0) if it can't be read."""
+    if Image is None:
+        return 0, 0
+    try:
+        with Image.open(path) as img:
+            return img.size
+    except Exception:
+        return 0, 0
+
+
+def read_details(folder):
+    """The folder's parsed property_details.json, or {}."""
+    try:
+        with open(os.path.join(folder, DETAILS_FILENAME), 'r') as f:
+            details = json.load(f)
+        return details if isinstance(details, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+class PropertyRow:
+    """One property as listed by the index: display strings plus their typed values."""
+
+    __slots__ = ('name', 'image_count', 'price', 'sqft', 'beds', 'baths', 'url',
+                 'price_cents', 'sqft_value', 'beds_value', 'baths_value', 'fetched_at', 'source')
+
+    def __init__(self, name, image_count, price, sqft, beds, baths, url,
+                 price_cents=None, sqft_value=None, beds_value=None, baths_value=None, fetched_at=None, source=None):
+        self.name = name
+        self.image_count = image_count
+        self.price = price
+        self.sqft = sqft
+        self.beds = beds
+        self.baths = baths
+        self.url = url
+        self.price_cents = price_cents
+        self.sqft_value = sqft_value
+        self.beds_value = beds_value
+        self.baths_value = baths_value
+        self.fetched_at = fetched_at
+        self.source = source
+
+
+class LibraryIndex:
+    """Thread-safe index of one library folder."""
+
+    def __init__(self, root, path=None):
+        self.root = root
+        self.path = path or os.path.join(root, INDEX_FILENAME)
+        self._lock = threading.Lock()
+        self._db = self._open()
+
+    def _open(self):
+        os.makedirs(self.root, exist_ok=True)
+        try:
+            return self._connect()
+        except sqlite3.DatabaseError as e:
+            print(f"Rebuilding unreadable library index {self.path}: {e}", file=sys.stderr)
+            for suffix in ('', '-wal', '-shm'):
+                try:
+                    os.remove(self.path + suffix)
+                except OSError:
+                    pass
+            return self._connect()
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        if db.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+            with db:
+                db.execute('DROP TABLE IF EXISTS images')
+                db.execute('DROP TABLE IF EXISTS properties')
+                for statement in SCHEMA.split(';'):
+                    if statement.strip():
+                        db.execute(statement)
+                db.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        return db
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # --- keeping it in sync ---
+
+    def _disk_mtimes(self, name):
+        folder = os.path.join(self.root, name)
+        return _mtime_ns(folder), _mtime_ns(os.path.join(folder, DETAILS_FILENAME))
+
+    def reconcile(self):
+        """
+        Bring the index up to date with the library folder.
+
+        Costs one directory listing plus two stats per property; only folders
+        whose mtimes changed are rescanned. Returns the names of the
+        properties that were (rescanned, removed).
+        """
+        on_disk = {}
+        try:
+            with os.scandir(self.root) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.') or not entry.is_dir():
+                        continue
+                    on_disk[entry.name] = (entry.stat().st_mtime_ns,
+                                           _mtime_ns(os.path.join(entry.path, DETAILS_FILENAME)))
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            known = {name: (folder_mtime, details_mtime) for name, folder_mtime, details_mtime
+                     in self._db.execute('SELECT name, folder_mtime, details_mtime FROM properties')}
+        removed = [name for name in known if name not in on_disk]
+        changed = [name for name, mtimes in on_disk.items() if known.get(name) != mtimes]
+
+        with self._lock:
+            with self._db:
+                for name in removed:
+                    self._delete(name)
+        for start in range(0, len(changed), COMMIT_EVERY):
+            scans = [self._scan(name, on_disk[name], measure=False) for name in changed[start:start + COMMIT_EVERY]]
+            with self._lock:
+                with self._db:
+                    for name, scan in zip(changed[start:start + COMMIT_EVERY], scans):
+                        self._store(name, scan)
+        return changed, removed
+
+    def _known_images(self, name):
+        with self._lock:
+            return {row[0]: row[1:] for row in self._db.execute(
+                'SELECT name, size, mtime, width, height FROM images WHERE property = ?', (name,))}
+
+    def _scan(self, name, mtimes, measure=True):
+        """
+        Read one folder from disk; None if it no longer exists. New or changed
+        images get their dimensions read only if `measure` is set.
+        """
+        folder = os.path.join(self.root, name)
+        known = self._known_images(name)
+        images = []
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if not is_image_name(entry.name) or not entry.is_file():
+                        continue
+                    st = entry.stat()
+                    old = known.get(entry.name)
+                    if old and old[0] == st.st_size and old[1] == st.st_mtime_ns and old[2] is not None:
+                        width, height = old[2], old[3]
+                    elif measure:
+                        width, height = image_size(entry.path)
+                    else:
+                        width, height = None, None
+                    images.append((name, entry.name, st.st_size, st.st_mtime_ns, width, height))
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        return mtimes, images, read_details(folder)
+
+    def _store(self, name, scan):
+        # Called with the lock held, inside a transaction
+        self._delete(name)
+        if scan is None:
+            return
+        (folder_mtime, details_mtime), images, details = scan
+        typed = details_schema.typed_fields(details)
+        self._db.executemany('INSERT INTO images VALUES (?, ?, ?, ?, ?, ?)', images)
+        self._db.execute('INSERT INTO properties VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                         (name, folder_mtime, details_mtime, len(images), _text(details.get('price')),
+                          _text(details.get('sqft')), _text(details.get('beds')), _text(details.get('baths')),
+                          details.get('url'), json.dumps(details) if details else None,
+                          *(typed[field] for field in details_schema.TYPED_FIELDS)))
+
+    def _delete(self, name):
+        self._db.execute('DELETE FROM images WHERE property = ?', (name,))
+        self._db.execute('DELETE FROM properties WHERE name = ?', (name,))
+
+    def update_property(self, name):
+        """Rescan one property folder now (after a download, re-extract or retry)."""
+        try:
+            scan = self._scan(name, self._disk_mtimes(name))
+            with self._lock:
+                with self._db:
+                    self._store(name, scan)
+        except sqlite3.Error as e:
+            print(f"Could not update the library index for {name}: {e}", file=sys.stderr)
+
+    def remove_property(self, name):
+        try:
+            with self._lock:
+                with self._db:
+                    self._delete(name)
+        except sqlite3.Error as e:
+            print(f"Could not update the library index for {name}: {e}", file=sys.stderr)
+
+    def _check(self, name):
+        """Rescan `name` if its folder or details changed on disk since it was indexed."""
+        with self._lock:
+            row = self._db.execute('SELECT folder_mtime, details_mtime FROM properties WHERE name = ?',
+                                   (name,)).fetchone()
+        if row is None or tuple(row) != self._disk_mtimes(name):
+            self.update_property(name)
+
+    # --- queries ---
+
+    def properties(self):
+        """Every indexed property as a PropertyRow, newest name first (the explorer's order)."""
+        with self._lock:
+            rows = self._db.execute(f'SELECT {ROW_COLUMNS} FROM properties ORDER BY name DESC').fetchall()
+        return [PropertyRow(*row) for row in rows]
+
+    def names(self):
+        """Every indexed property name, newest first (the explorer's default order)."""
+        with self._lock:
+            return [row[0] for row in self._db.execute('SELECT name FROM properties ORDER BY name DESC')]
+
+    def rows(self, names):
+        """{name: PropertyRow} for the given property names (missing ones are left out)."""
+        found = {}
+        names = list(names)
+        for start in range(0, len(names), 500):
+            chunk = names[start:start + 500]
+            with self._lock:
+                rows = self._db.execute(f'SELECT {ROW_COLUMNS} FROM properties '
+                                        f'WHERE name IN ({",".join("?" * len(chunk))})', chunk).fetchall()
+            found.update((row[0], PropertyRow(*row)) for row in rows)
+        return found
+
+    def property(self, name):
+        """The PropertyRow for one property, or None if it isn't indexed."""
+        with self._lock:
+            row = self._db.execute(f'SELECT {ROW_COLUMNS} FROM properties WHERE name = ?', (name,)).fetchone()
+        return PropertyRow(*row) if row else None
+
+    def images(self, name):
+        """Sorted image paths of one property, rescanning it first if it changed on disk."""
+        self._check(name)
+        with self._lock:
+            rows = self._db.execute('SELECT name FROM images WHERE property = ? ORDER BY name', (name,)).fetchall()
+        folder = os.path.join(self.root, name)
+        return [os.path.join(folder, row[0]) for row in rows]
+
+    def image_info(self, name):
+        """{filename: (size, mtime_ns, width, height)} for one property, measuring any unmeasured images."""
+        self._check(name)
+        info = self._known_images(name)
+        if any(width is None for _, _, width, _ in info.values()):
+            self.update_property(name)
+            info = self._known_images(name)
+        return info
+
+    def details(self, name):
+        """The parsed property_details.json of one property ({} if it has none)."""
+        self._check(name)
+        with self._lock:
+            row = self._db.execute('SELECT details FROM properties WHERE name = ?', (name,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else {}
+
+
+def _text(value):
+    return None if value is None else str(value)
+
+
+class SortIndex:
+    """
+    Property names pre-sorted by the typed value of each explorer column.
+
+    A column is sorted the first time it is asked for (O(n log n)); after
+    that order() returns a cached list and range() is a bisect. update() and
+    remove() keep the sorted columns current one property at a time.
+    Properties without a value (e.g. no price) come last in both directions.
+    Not thread-safe: the GUI only uses it from the Tk thread.
+    """
+
+    def __init__(self, rows=()):
+        self._rows = {row.name: row for row in rows}
+        # column -> ([(value, name)] sorted, [names without a value] sorted)
+        self._columns = {}
+        # (column, reverse) -> list of names
+        self._orders = {}
+
+    def _value(self, col, row):
+        value = getattr(row, SORT_FIELDS[col])
+        return value.lower() if col == '#0' else value
+
+    def _column(self, col):
+        column = self._columns.get(col)
+        if column is None:
+            pairs, missing = [], []
+            for name, row in self._rows.items():
+                value = self._value(col, row)
+                if value is None:
+                    missing.append(name)
+                else:
+                    pairs.append((value, name))
+            pairs.sort()
+            missing.sort()
+            column = self._columns[col] = (pairs, missing)
+        return column
+
+    def __contains__(self, name):
+        return name in self._rows
+
+    def __len__(self):
+        return len(self._rows)
+
+    def update(self, row):
+        """Add a property, or re-sort it after its values changed."""
+        if row.name in self._rows:
+            self.remove(row.name)
+        self._rows[row.name] = row
+        for col, (pairs, missing) in self._columns.items():
+            value = self._value(col, row)
+            if value is None:
+                bisect.insort(missing, row.name)
+            else:
+                bisect.insort(pairs, (value, row.name))
+        self._orders.clear()
+
+    def remove(self, name):
+        row = self._rows.pop(name, None)
+        if row is None:
+            return
+        for col, (pairs, missing) in self._columns.items():
+            value = self._value(col, row)
+            if value is None:
+                missing.remove(name)
+            else:
+                del pairs[bisect.bisect_left(pairs, (value, name))]
+        self._orders.clear()
+
+    def order(self, col, reverse=False):
+        """Every property name sorted by `col` (an explorer column, or None for the name)."""
+        key = (col, reverse)
+        names = self._orders.get(key)
+        if names is None:
+            pairs, missing = self._column(col)
+            names = [name for _, name in (reversed(pairs) if reverse else pairs)] + missing
+            self._orders[key] = names
+        return names
+
+    def position(self, col, reverse, name):
+        """Where `name` sits in order(col, reverse)."""
+        pairs, missing = self._column(col)
+        value = self._value(col, self._rows[name])
+        if value is None:
+            return len(pairs) + bisect.bisect_left(missing, name)
+        at = bisect.bisect_left(pairs, (value, name))
+        return len(pairs) - 1 - at if reverse else at
+
+    def range(self, col, low=None, high=None):
+        """Names whose `col` value is within [low, high] (either end open if None), ascending."""
+        pairs, _ = self._column(col)
+        start = 0 if low is None else bisect.bisect_left(pairs, (low,))
+        # (high, the largest code point) sorts after every (high, name)
+        end = len(pairs) if high is None else bisect.bisect_left(pairs, (high, chr(0x10ffff)))
+        return [name for _, name in pairs[start:end]]
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def for_library(library_folder):
+    """Return the shared index of a library folder."""
+    key = os.path.abspath(library_folder)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = LibraryIndex(key)
+            _indexes[key] = index
+        return index
@@ -0,0 +1,145 @@
+"""
+Watch a download library for changes and report which properties changed.
+
+Changes are picked up whoever makes them: this app, the batch CLI, or a user
+in a file manager. With the watchdog package installed, the library is
+watched through the OS notification API (inotify on Linux, FSEvents on
+macOS, ReadDirectoryChangesW on Windows). Without it, or if the OS refuses
+(e.g. the inotify watch limit), the watcher re-runs the library index's
+mtime reconcile every POLL_INTERVAL seconds. Either way a burst of events is
+coalesced for DEBOUNCE seconds and the affected properties are re-indexed.
+Then on_change(updated, removed) is called from the watcher thread with
+sets of property names.
+"""
+import os
+import sys
+import threading
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+import library_index
+from extractors import DETAILS_FILENAME
+
+# Seconds to let a burst of events settle before re-indexing
+DEBOUNCE = 0.5
+# Seconds between library scans when native file watching is unavailable
+POLL_INTERVAL = 5.0
+
+# Event types that don't change anything on disk
+IGNORED_EVENTS = ('opened', 'closed_no_write')
+
+
+class _Handler(FileSystemEventHandler):
+    """Forwards watchdog events to a LibraryWatcher."""
+
+    def __init__(self, watcher):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.event_type in IGNORED_EVENTS:
+            return
+        self.watcher.touched(event.src_path, event.is_directory)
+        dest_path = getattr(event, 'dest_path', '')
+        if dest_path:
+            self.watcher.touched(dest_path, event.is_directory)
+
+
+class LibraryWatcher:
+    """Background watcher of one library folder."""
+
+    def __init__(self, library_folder, on_change, poll_interval=POLL_INTERVAL):
+        self.root = os.path.abspath(library_folder)
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.index = library_index.for_library(library_folder)
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._observer = None
+        self._thread = None
+
+    @property
+    def native(self):
+        """True when the OS notifies us of changes, False when polling."""
+        return self._observer is not None
+
+    def start(self):
+        if Observer is not None:
+            try:
+                observer = Observer()
+                observer.schedule(_Handler(self), self.root, recursive=True)
+                observer.daemon = True
+                observer.start()
+                self._observer = observer
+            except Exception as e:
+                print(f"File watching unavailable ({e}); polling the library instead", file=sys.stderr)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=2)
+            self._observer = None
+
+    def property_for(self, path, is_directory):
+        """The property a changed path belongs to, or None if it doesn't affect any."""
+        rel = os.path.relpath(os.path.abspath(path), self.root)
+        parts = rel.split(os.sep)
+        # Outside the library, the library itself, or hidden (.blobs, .page_cache, the index...)
+        if rel == os.curdir or parts[0] == os.pardir or parts[0].startswith('.'):
+            return None
+        if len(parts) == 1:
+            return parts[0] if is_directory else None
+        if len(parts) == 2 and not is_directory and (library_index.is_image_name(parts[1])
+                                                     or parts[1] == DETAILS_FILENAME):
+            return parts[0]
+        return None
+
+    def touched(self, path, is_directory=False):
+        """Note that `path` changed (called from the watchdog thread)."""
+        name = self.property_for(path, is_directory)
+        if name:
+            with self._lock:
+                self._pending.add(name)
+            self._wake.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(None if self.native else self.poll_interval)
+            if self._stopped.wait(DEBOUNCE):
+                break
+            self._wake.clear()
+            with self._lock:
+                names, self._pending = self._pending, set()
+            try:
+                if self.native:
+                    updated, removed = self._reindex(names)
+                else:
+                    updated, removed = self.index.reconcile()
+            except Exception as e:
+                print(f"Could not update the library index: {e}", file=sys.stderr)
+                continue
+            if updated or removed:
+                self.on_change(set(updated), set(removed))
+
+    def _reindex(self, names):
+        updated, removed = set(), set()
+        for name in names:
+            if os.path.isdir(os.path.join(self.root, name)):
+                self.index.update_property(name)
+                updated.add(name)
+            else:
+                self.index.remove_property(name)
+                removed.add(name)
+        return updated, removed
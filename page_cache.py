@@ -0,0 +1,267 @@
+"""
+Compressed on-disk cache of fetched listing pages.
+
+Pages are stored under <library>/.page_cache, keyed by a hash of the
+normalized URL, compressed with zstd when the zstandard package is installed
+and gzip otherwise, next to the response headers they came with. An entry is
+served as-is for TTL seconds; after that it is revalidated with a conditional
+request (If-None-Match / If-Modified-Since) so an unchanged page costs a 304
+instead of a full download. The cache is capped at max_bytes of compressed
+data and evicts the least recently used pages first. Cache hits only update
+the access time in memory; the index is written when a page is stored,
+revalidated or evicted, and by flush().
+
+The cached pages also let the extractors be re-run over a whole library
+without touching the network (download_engine.reextract_library).
+"""
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CACHE_DIRNAME = '.page_cache'
+INDEX_FILENAME = 'index.json'
+
+# Serve a cached page without revalidating for this long
+DEFAULT_TTL = 3600
+# Compressed bytes kept before the least recently used pages are evicted
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Query parameters that never change the page content
+TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid', 'mcid')
+
+
+def normalize_url(url):
+    """Canonical form of a listing URL used as the cache key."""
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip('/') or '/'
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if not k.lower().startswith(TRACKING_PARAMS)]
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(sorted(query)), ''))
+
+
+def cache_key(url):
+    return hashlib.sha1(normalize_url(url).encode('utf-8')).hexdigest()
+
+
+def compress(data):
+    """Return (codec, compressed bytes)."""
+    if zstandard is not None:
+        return 'zstd', zstandard.ZstdCompressor(level=10).compress(data)
+    return 'gzip', gzip.compress(data, compresslevel=6)
+
+
+def decompress(codec, data):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise ValueError("page was cached with zstd but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class CachedPage:
+    """A page read back from the cache."""
+
+    def __init__(self, url, html, headers, fetched):
+        self.url = url
+        self.html = html
+        self.headers = headers
+        self.fetched = fetched
+
+
+class PageCache:
+    """Thread-safe page cache rooted in one directory."""
+
+    def __init__(self, root, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(root, INDEX_FILENAME)
+        self._lock = threading.Lock()
+        self._entries = {}
+        # Access times changed since the index was last written
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r') as f:
+                self._entries = json.load(f).get('entries', {})
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable page cache index {self.index_path}: {e}", file=sys.stderr)
+
+    def _save(self):
+        # Called with the lock held
+        os.makedirs(self.root, exist_ok=True)
+        temp_path = self.index_path + '.tmp'
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump({'entries': self._entries}, f)
+            os.replace(temp_path, self.index_path)
+            self._dirty = False
+        except OSError as e:
+            print(f"Could not save page cache index: {e}", file=sys.stderr)
+
+    def flush(self):
+        """Write access times recorded by lookup() since the index was last saved."""
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def _page_path(self, key, codec):
+        return os.path.join(self.root, key[:2], f"{key}.html.{'zst' if codec == 'zstd' else 'gz'}")
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            try:
+                os.remove(self._page_path(key, entry['codec']))
+            except OSError:
+                pass
+
+    def _evict(self):
+        """Drop least recently used pages until the cache fits in max_bytes."""
+        total = sum(entry['size'] for entry in self._entries.values())
+        for key in sorted(self._entries, key=lambda k: self._entries[k]['accessed']):
+            if total <= self.max_bytes:
+                break
+            total -= self._entries[key]['size']
+            self._remove(key)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def size(self):
+        """Compressed bytes currently stored."""
+        with self._lock:
+            return sum(entry['size'] for entry in self._entries.values())
+
+    def urls(self):
+        with self._lock:
+            return [entry['url'] for entry in self._entries.values()]
+
+    def is_fresh(self, url):
+        with self._lock:
+            entry = self._entries.get(cache_key(url))
+            return entry is not None and time.time() - entry['fetched'] < self.ttl
+
+    def lookup(self, url):
+        """Return the CachedPage for `url` (however old), or None."""
+        key = cache_key(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            try:
+                with open(self._page_path(key, entry['codec']), 'rb') as f:
+                    html = decompress(entry['codec'], f.read()).decode('utf-8')
+            except (OSError, ValueError) as e:
+                print(f"Dropping unreadable cached page for {url}: {e}", file=sys.stderr)
+                self._remove(key)
+                self._save()
+                return None
+            entry['accessed'] = time.time()
+            self._dirty = True
+            return CachedPage(entry['url'], html, entry['headers'], entry['fetched'])
+
+    def store(self, url, html, headers=None):
+        """Compress and store a freshly fetched page."""
+        key = cache_key(url)
+        codec, data = compress(html.encode('utf-8'))
+        path = self._page_path(key, codec)
+        now = time.time()
+        with self._lock:
+            self._remove(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = path + '.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+            self._entries[key] = {
+                'url': normalize_url(url),
+                'codec': codec,
+                'size': len(data),
+                'fetched': now,
+                'accessed': now,
+                'headers': dict(headers or {}),
+            }
+            self._evict()
+            self._save()
+
+    def revalidated(self, url):
+        """Mark a cached page fresh again after a 304 Not Modified."""
+        with self._lock:
+            entry = self._entries.get(cache_key(url))
+            if entry is not None:
+                entry['fetched'] = time.time()
+                self._save()
+
+    def validators(self, url):
+        """Conditional request headers for the cached copy of `url` (empty if none)."""
+        with self._lock:
+            entry = self._entries.get(cache_key(url))
+        if entry is None:
+            return {}
+        stored = {k.lower(): v for k, v in entry['headers'].items()}
+        headers = {}
+        if 'etag' in stored:
+            headers['If-None-Match'] = stored['etag']
+        if 'last-modified' in stored:
+            headers['If-Modified-Since'] = stored['last-modified']
+        return headers
+
+    def fetch(self, url, fetch):
+        """
+        Return the HTML for `url`, using the cache where it is still valid.
+
+        `fetch(headers)` performs the network request with the given extra
+        request headers and returns (status, response headers, text).
+        """
+        if self.is_fresh(url):
+            cached = self.lookup(url)
+            if cached is not None:
+                return cached.html
+        conditional = self.validators(url)
+        status, headers, text = fetch(conditional)
+        if status == 304 and conditional:
+            cached = self.lookup(url)
+            if cached is not None:
+                self.revalidated(url)
+                return cached.html
+            # The cached copy vanished between the request and now: fetch it in full
+            status, headers, text = fetch({})
+        self.store(url, text, headers)
+        return text
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+            self._save()
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def for_library(library_folder):
+    """Return the shared page cache stored in a download library."""
+    root = os.path.abspath(os.path.join(library_folder, CACHE_DIRNAME))
+    with _caches_lock:
+        cache = _caches.get(root)
+        if cache is None:
+            cache = PageCache(root)
+            _caches[root] = cache
+        return cache
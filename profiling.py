@@ -0,0 +1,255 @@
+"""
+Built-in profiling for one download or one gallery load.
+
+A ProfileSession wraps a piece of work in cProfile and tracemalloc and, when
+it stops, writes next to each other in the profiles folder:
+
+    <stem>.pstats            cProfile statistics (python -m pstats <file>, or snakeviz)
+    <stem>.allocations.txt   peak traced memory and the top allocation sites
+    <stem>.trace.json        with trace=True: a Chrome trace of the spans below,
+                             for chrome://tracing or ui.perfetto.dev
+
+Hot paths mark spans with `with profiling.span('image fetch', url=url):` -
+page fetch, parse, details, image fetch/write, thumbnail decode and widget
+build. Outside a session a span costs a global lookup. Spans inside asyncio
+tasks get one trace row per task.
+
+cProfile and tracemalloc are process-wide, so only one session runs at a
+time. Before Python 3.12 cProfile only sees the thread that enabled it, so
+the session also profiles every thread started while it runs; such a thread
+drops its profiler at its next span after the session ends.
+"""
+import asyncio
+import contextlib
+import cProfile
+import json
+import linecache
+import os
+import platform
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+
+PROFILES_DIRNAME = '.profiles'
+
+# Frames kept per allocation; more make tracemalloc slower
+TRACEMALLOC_FRAMES = 5
+# Allocation sites listed in the report
+TOP_ALLOCATIONS = 40
+
+# From 3.12 cProfile uses sys.monitoring: one profiler sees every thread
+SHARED_PROFILER = sys.version_info >= (3, 12)
+
+_lock = threading.Lock()
+_session = None
+_local = threading.local()
+_NO_SPAN = contextlib.nullcontext()
+
+
+def active():
+    """The running ProfileSession, or None."""
+    return _session
+
+
+def _detach_finished():
+    """Drop this thread's profiler if the session that attached it has ended."""
+    profiler = getattr(_local, 'profiler', None)
+    if profiler is not None and _local.session is not _session:
+        profiler.disable()
+        _local.profiler = None
+        _local.session = None
+
+
+def span(name, **args):
+    """Context manager marking `name` in the trace of the running session, if any."""
+    _detach_finished()
+    session = _session
+    if session is None or not session.trace:
+        return _NO_SPAN
+    return session.span(name, args)
+
+
+def _slug(text):
+    return re.sub(r'[^A-Za-z0-9]+', '-', text).strip('-')[:60] or 'profile'
+
+
+def _span_owner():
+    """(trace row id, row name) for the current asyncio task or thread."""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    if task is not None:
+        return id(task), task.get_name()
+    thread = threading.current_thread()
+    return thread.ident, thread.name
+
+
+class ProfileSession:
+    """cProfile + tracemalloc (+ span trace) around one piece of work."""
+
+    def __init__(self, label, folder, trace=False):
+        self.label = label
+        self.folder = folder
+        self.trace = trace
+        self.stem = os.path.join(folder, f"{time.strftime('%Y%m%d-%H%M%S')}-{_slug(label)}")
+        self.paths = []
+        self._events = []
+        self._rows = {}
+        self._profilers = []
+        self._started = None
+        self._stop_tracemalloc = False
+        self._baseline = None
+
+    # --- lifecycle ---
+
+    def start(self):
+        global _session
+        with _lock:
+            if _session is not None:
+                raise RuntimeError(f"already profiling {_session.label}")
+            _session = self
+        self._stop_tracemalloc = not tracemalloc.is_tracing()
+        if self._stop_tracemalloc:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        tracemalloc.reset_peak()
+        self._baseline = tracemalloc.take_snapshot()
+        self._started = time.perf_counter()
+        if SHARED_PROFILER:
+            profiler = cProfile.Profile()
+            self._profilers.append(profiler)
+            profiler.enable()
+        else:
+            threading.setprofile(self._thread_hook)
+            self._profile_thread()
+        return self
+
+    def _profile_thread(self):
+        profiler = cProfile.Profile()
+        self._profilers.append(profiler)
+        _local.profiler = profiler
+        _local.session = self
+        profiler.enable()
+
+    def _thread_hook(self, frame, event, arg):
+        # Runs once in each new thread: enabling the profiler replaces this hook
+        self._profile_thread()
+
+    def stop(self):
+        """End the session and write its files; returns their paths."""
+        global _session
+        seconds = time.perf_counter() - self._started
+        if not SHARED_PROFILER:
+            threading.setprofile(None)
+        for profiler in self._profilers:
+            profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if self._stop_tracemalloc:
+            tracemalloc.stop()
+        with _lock:
+            _session = None
+        _detach_finished()
+
+        os.makedirs(self.folder, exist_ok=True)
+        try:
+            self._write_pstats()
+            self._write_allocations(snapshot, current, peak, seconds)
+            if self.trace:
+                self._write_trace()
+        except OSError as e:
+            print(f"Could not write profile {self.stem}: {e}", file=sys.stderr)
+        return self.paths
+
+    # --- spans ---
+
+    @contextlib.contextmanager
+    def span(self, name, args):
+        row, row_name = _span_owner()
+        self._rows[row] = row_name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            event = {'name': name, 'cat': 'app', 'ph': 'X', 'pid': os.getpid(), 'tid': row,
+                     'ts': round((start - self._started) * 1e6, 1), 'dur': round((end - start) * 1e6, 1)}
+            if args:
+                event['args'] = {k: str(v) for k, v in args.items()}
+            self._events.append(event)
+
+    # --- output ---
+
+    def _write_pstats(self):
+        stats = None
+        for profiler in self._profilers:
+            try:
+                if stats is None:
+                    stats = pstats.Stats(profiler)
+                else:
+                    stats.add(profiler)
+            except TypeError:
+                pass  # a thread that never ran a profiled call
+        if stats is None:
+            return
+        path = self.stem + '.pstats'
+        stats.dump_stats(path)
+        self.paths.append(path)
+
+    def _write_allocations(self, snapshot, current, peak, seconds):
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__),
+                  tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+                  tracemalloc.Filter(False, '<unknown>')]
+        snapshot = snapshot.filter_traces(ignore)
+        growth = snapshot.compare_to(self._baseline.filter_traces(ignore), 'lineno')
+        growth = [stat for stat in growth if stat.size_diff > 0][:TOP_ALLOCATIONS]
+        mb = 1024 * 1024
+        lines = [
+            f"Profile: {self.label}",
+            f"Duration: {seconds:.2f}s",
+            f"Peak traced memory: {peak / mb:.1f} MiB",
+            f"Still allocated at the end: {current / mb:.1f} MiB",
+            "",
+            f"Top {len(growth)} allocation sites by memory still held at the end (net of the start):",
+        ]
+        for stat in growth:
+            frame = stat.traceback[0]
+            lines.append(f"{stat.size_diff / 1024:>10.1f} KiB {stat.count_diff:>+8} blocks  "
+                         f"{frame.filename}:{frame.lineno}")
+            source = linecache.getline(frame.filename, frame.lineno).strip()
+            if source:
+                lines.append(f"{'':>36}{source}")
+        path = self.stem + '.allocations.txt'
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        self.paths.append(path)
+
+    def _write_trace(self):
+        pid = os.getpid()
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': self.label}}]
+        events += [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': row, 'args': {'name': name}}
+                   for row, name in self._rows.items()]
+        events += sorted(self._events, key=lambda e: e['ts'])
+        path = self.stem + '.trace.json'
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms',
+                       'otherData': {'label': self.label, 'python': platform.python_version()}}, f)
+        self.paths.append(path)
+
+
+@contextlib.contextmanager
+def profile(label, folder, trace=False):
+    """Profile the body of a with-statement; yields the ProfileSession."""
+    session = ProfileSession(label, folder, trace).start()
+    try:
+        yield session
+    finally:
+        session.stop()
+
+
+def library_folder(library_folder):
+    """Where profiles of a download library are written."""
+    return os.path.join(library_folder, PROFILES_DIRNAME)
@@ -0,0 +1,113 @@
+"""
+Progress aggregation between download workers and the Tk main loop.
+
+Workers only update counters under a lock; the GUI polls snapshot() at a fixed
+frame rate (POLL_INTERVAL_MS) and redraws once per frame, however many images
+finished in between. This keeps a 30-worker download from flooding Tk with one
+root.after() call per photo.
+"""
+import threading
+import time
+from collections import deque
+
+# How often the GUI polls the aggregator (10 Hz)
+POLL_INTERVAL_MS = 100
+
+# Seconds of history used for the images/s and MB/s rates
+RATE_WINDOW = 5.0
+
+
+class ProgressSnapshot:
+    """Point-in-time view of the aggregated counters."""
+
+    def __init__(self, completed, total, succeeded, failed, bytes_done, images_per_sec, bytes_per_sec,
+                 workers, workers_reason, changed_jobs, landed):
+        self.completed = completed
+        self.total = total
+        self.succeeded = succeeded
+        self.failed = failed
+        self.bytes_done = bytes_done
+        self.images_per_sec = images_per_sec
+        self.bytes_per_sec = bytes_per_sec
+        self.workers = workers
+        self.workers_reason = workers_reason
+        self.changed_jobs = changed_jobs
+        # Image files that finished since the previous snapshot, in arrival order
+        self.landed = landed
+
+
+class ProgressAggregator:
+    """Thread-safe counters for every listing in a download session."""
+
+    def __init__(self, window=RATE_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._jobs = {}
+            self._changed = set()
+            self._succeeded = 0
+            self._failed = 0
+            self._bytes = 0
+            self._events = deque()
+            self._landed = []
+            self._workers = None
+            self._workers_reason = ''
+
+    # --- called from worker threads ---
+
+    def job_progress(self, job_id, completed, total):
+        """Record a listing's completed/total image counts."""
+        with self._lock:
+            self._jobs[job_id] = (completed, total)
+            self._changed.add(job_id)
+
+    def image_done(self, ok, nbytes=0, path=None):
+        """Record one finished image (the bytes it took and, if known, where it landed)."""
+        now = time.monotonic()
+        with self._lock:
+            if ok:
+                self._succeeded += 1
+                self._bytes += nbytes
+                if path:
+                    self._landed.append(path)
+            else:
+                self._failed += 1
+            self._events.append((now, nbytes if ok else 0))
+
+    def workers(self, limit, reason):
+        """Record the adaptive worker count (AIMDController.on_change)."""
+        with self._lock:
+            self._workers = limit
+            self._workers_reason = reason
+
+    # --- called from the main thread ---
+
+    def snapshot(self):
+        """Return a ProgressSnapshot and clear the changed listings and landed files."""
+        now = time.monotonic()
+        with self._lock:
+            while self._events and now - self._events[0][0] > self.window:
+                self._events.popleft()
+            span = min(self.window, now - self._events[0][0]) if self._events else 0.0
+            count = len(self._events)
+            window_bytes = sum(nbytes for _, nbytes in self._events)
+            changed = self._changed
+            self._changed = set()
+            landed = self._landed
+            self._landed = []
+            return ProgressSnapshot(
+                completed=sum(c for c, _ in self._jobs.values()),
+                total=sum(t for _, t in self._jobs.values()),
+                succeeded=self._succeeded,
+                failed=self._failed,
+                bytes_done=self._bytes,
+                images_per_sec=count / span if span > 0.5 else 0.0,
+                bytes_per_sec=window_bytes / span if span > 0.5 else 0.0,
+                workers=self._workers,
+                workers_reason=self._workers_reason,
+                changed_jobs=changed,
+                landed=landed,
+            )
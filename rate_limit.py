@@ -0,0 +1,137 @@
+"""
+Per-host token-bucket rate limiting shared by every fetch.
+
+Each host gets a bucket refilled at `rate` requests/second holding at most
+`burst` tokens. Requests wait for a token instead of sleeping a fixed amount.
+A 429/503 reply with Retry-After closes the bucket until that time has passed,
+so every worker (GUI, CLI, threads or asyncio) pauses together.
+"""
+import asyncio
+import email.utils
+import threading
+import time
+from urllib.parse import urlparse
+
+# (rate per second, burst) for the listing sites and everything else (the CDNs)
+LISTING_RATE = (1.0, 3)
+DEFAULT_RATE = (20.0, 40)
+LISTING_DOMAINS = ('redfin.com', 'zillow.com')
+
+# Cap on how long a single Retry-After may pause a host
+MAX_RETRY_AFTER = 120.0
+
+
+class TokenBucket:
+    """Thread-safe token bucket; reserve() hands out a token and says how long to wait for it."""
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def configure(self, rate, burst):
+        with self._lock:
+            self.rate = float(rate)
+            self.burst = max(1, int(burst))
+            self._tokens = min(self._tokens, self.burst)
+
+    def reserve(self):
+        """Take one token (possibly going into debt) and return the seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            if self.rate > 0:
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 and self.rate > 0 else 0.0
+            return max(wait, self._blocked_until - now)
+
+    def penalize(self, seconds):
+        """Stop handing out usable tokens for `seconds` (e.g. from Retry-After)."""
+        seconds = min(max(0.0, seconds), MAX_RETRY_AFTER)
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._tokens = min(self._tokens, 0.0)
+
+    def acquire(self, is_cancelled=lambda: False):
+        """Block until a token is usable. Returns False if cancelled while waiting."""
+        deadline = time.monotonic() + self.reserve()
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return True
+            if is_cancelled():
+                return False
+            time.sleep(min(remaining, 0.05))
+
+    async def acquire_async(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+_buckets = {}
+_overrides = {}
+_lock = threading.Lock()
+
+
+def _is_listing_host(host):
+    return any(host == d or host.endswith('.' + d) for d in LISTING_DOMAINS)
+
+
+def _default_rate(host):
+    if host in _overrides:
+        return _overrides[host]
+    if _is_listing_host(host):
+        return _overrides.get('listing', LISTING_RATE)
+    return _overrides.get('default', DEFAULT_RATE)
+
+
+def configure(host, rate, burst):
+    """
+    Set rate/burst for a host, or for 'listing' (redfin/zillow pages) or
+    'default' (every other host, i.e. the photo CDNs).
+    """
+    with _lock:
+        _overrides[host] = (rate, burst)
+        for bucket_host, bucket in _buckets.items():
+            if host in (bucket_host, 'default') or (host == 'listing' and _is_listing_host(bucket_host)):
+                bucket.configure(*_default_rate(bucket_host))
+
+
+def bucket_for(url):
+    host = urlparse(url).netloc.lower()
+    with _lock:
+        bucket = _buckets.get(host)
+        if bucket is None:
+            bucket = TokenBucket(*_default_rate(host))
+            _buckets[host] = bucket
+        return bucket
+
+
+def parse_retry_after(value):
+    """Return Retry-After in seconds (numeric or HTTP-date form), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def observe_response(url, status, headers):
+    """Honour Retry-After on throttling responses for every later request to the host."""
+    if status not in (429, 503):
+        return
+    delay = parse_retry_after(headers.get('Retry-After'))
+    if delay is None and status == 429:
+        delay = 1.0
+    if delay:
+        bucket_for(url).penalize(delay)
@@ -14,7 +14,11 @@ def check_dependencies():
             missing.append(package)
             
     if missing:
-        print(f"\nThe following dependencies are missing: {', '.join(missing)}")
+        print(f"\nThe following dependencies are missing: {', '.join(missing)}", file=sys.stderr)
+        if not sys.stdin.isatty():
+            # Headless (cron/pipes): never block on a prompt or eat URLs from stdin
+            print("Install them with: pip install " + ' '.join(missing), file=sys.stderr)
+            sys.exit(1)
         choice = input("Would you like to install them now? (y/n): ").lower()
         if choice == 'y':
             for package in missing:
@@ -27,193 +31,232 @@ def check_dependencies():
 # Check dependencies first
 check_dependencies()
 
-import requests
-from bs4 import BeautifulSoup
+import argparse
+import json
 import os
-import re
-from urllib.parse import urljoin, urlparse
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import cancellation
+import concurrency
+import download_engine
+import download_queue
+import profiling
+import rate_limit
+import retry_policy
+import telemetry
+
+
+class Reporter:
+    """Prints progress either as human-readable lines or as JSON-lines records."""
+
+    def __init__(self, jsonl=False):
+        self.jsonl = jsonl
+        self._lock = threading.Lock()
+
+    def emit(self, event, **fields):
+        with self._lock:
+            if self.jsonl:
+                record = {'event': event, 'time': round(time.time(), 3)}
+                record.update(fields)
+                print(json.dumps(record), flush=True)
+            else:
+                print(self._format(event, fields), flush=True)
+
+    @staticmethod
+    def _format(event, f):
+        if event == 'start':
+            return f"Fetching page: {f['url']}"
+        if event == 'progress':
+            return f"  [{f['url']}] {f['completed']}/{f['total']}"
+        if event == 'workers':
+            return f"  Workers: {f['limit']} ({f['reason']})"
+        if event == 'done':
+            return f"Completed! Downloaded {f['downloaded']}/{f['total']} images to {f['folder']}"
+        if event == 'error':
+            return f"Error: {f['url']} - {f['error']}"
+        if event == 'reextracted':
+            return f"Re-extracted {f['updated']} properties from the page cache ({f['missing']} without a cached page)"
+        if event == 'nothing_to_retry':
+            return f"Nothing to retry in {f['folder']}"
+        if event == 'summary':
+            return (f"\n{f['succeeded']}/{f['listings']} listings succeeded, {f['images']} images "
+                    f"in {f['seconds']}s ({f['failed']} listings and {f['images_failed']} images failed)")
+        return f"{event}: {f}"
+
+
+def read_urls(args):
+    """Collect listing URLs from argv, --file and stdin ('-' or piped input)."""
+    text = ' '.join(u for u in args.urls if u != '-')
+    if args.file:
+        with open(args.file, 'r') as f:
+            text += '\n' + f.read()
+    if '-' in args.urls or (not args.urls and not args.file and not sys.stdin.isatty()):
+        text += '\n' + sys.stdin.read()
+    if not text.strip() and sys.stdin.isatty():
+        # Interactive use: ask for a URL like the original script did
+        text = input("Enter Redfin or Zillow listing URL: ")
+    return download_queue.parse_urls(text)
+
+
+def download_one(url, args, reporter, budget, cancelled):
+    """Download a single listing, reporting progress. Returns the ListingResult or None."""
+    reporter.emit('start', url=url)
+    started = time.time()
+    last_report = [0.0]
+
+    def progress(completed, total, ok):
+        # Keep JSON-lines output readable on big listings: at most ~4 records/s per listing
+        now = time.time()
+        if completed == total or now - last_report[0] >= 0.25:
+            last_report[0] = now
+            reporter.emit('progress', url=url, completed=completed, total=total)
+
+    def workers(limit, reason):
+        if args.verbose:
+            reporter.emit('workers', url=url, limit=limit, reason=reason)
 
-def download_redfin_images(url, output_folder="redfin_images"):
-    """
-    Download all images from a Redfin property listing.
-    
-    Args:
-        url: The Redfin property URL
-        output_folder: Folder to save images (default: 'redfin_images')
-    """
-    # Create output folder if it doesn't exist
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder)
-    
-    print(f"Fetching page: {url}")
-    
-    # Set headers to mimic a browser
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-    
     try:
-        # Fetch the page
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        
-        # Parse HTML
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Extract address from the page
-        address = "property"  # default fallback
-        
-        # Try to find the address in the page title or meta tags
-        title_tag = soup.find('title')
-        if title_tag:
-            # Title format: "25221 Summerhill Ln, Stevenson Ranch, CA 91381 | MLS# SR25185749 | Redfin"
-            title_text = title_tag.get_text()
-            # Extract just the address part (before the first |)
-            if '|' in title_text:
-                address = title_text.split('|')[0].strip()
-        
-        # Fallback: try h1 with class 'full-address'
-        if address == "property":
-            address_tag = soup.find('h1', class_='full-address')
-            if address_tag:
-                address = address_tag.get_text(strip=True)
-        
-        # Clean up address for use as folder name (remove invalid characters)
-        address = re.sub(r'[<>:"/\\|?*]', '', address)  # Remove invalid filename chars
-        address = address.replace(',', '').strip()  # Remove commas
-        
-        # Create property folder with address as name
-        property_folder = os.path.join(output_folder, address)
-        
-        if not os.path.exists(property_folder):
-            os.makedirs(property_folder)
-        
-        print(f"Saving to folder: {address}")
-        
-        # Find all image URLs in the page source
-        # Look for patterns like: /photo/45/bigphoto/749/SR25185749_1.webp
-        images = []
-        
-        # Extract all photo URLs from the HTML
-        photo_pattern = r'ssl\.cdn-redfin\.com/photo/\d+/(?:bigphoto|mbphoto|mbphotov3)/(\d+)/([A-Z0-9]+_\d+(?:_\d+)?)\.(webp|jpg)'
-        matches = re.findall(photo_pattern, response.text)
-        
-        if matches:
-            photo_id = matches[0][0]
-            # Get unique photo identifiers
-            seen = set()
-            for photo_id, photo_name, ext in matches:
-                if photo_name not in seen:
-                    seen.add(photo_name)
-                    images.append((photo_id, photo_name))
-            
-            print(f"Found {len(images)} unique images")
-        
-        # If no images found, try a broader search
-        if not images:
-            print("No photo patterns found, trying broader search...")
-            for img in soup.find_all('img'):
-                src = img.get('src') or img.get('data-src') or img.get('data-lazy-src')
-                if src and 'ssl.cdn-redfin.com/photo' in src and 'bigphoto' in src:
-                    images.append(src)
-        
-        print(f"Found {len(images)} images")
-        
-        # Download each image
-        downloaded = 0
-        failed_urls = []
-        
-        for idx, img_data in enumerate(images, 1):
-            try:
-                # Handle tuple format (photo_id, photo_name)
-                if isinstance(img_data, tuple):
-                    photo_id, photo_name = img_data
-                    
-                    # Try webp first (better quality), fall back to jpg
-                    formats = [
-                        ('webp', f"https://ssl.cdn-redfin.com/photo/45/bigphoto/{photo_id}/{photo_name}.webp"),
-                        ('jpg', f"https://ssl.cdn-redfin.com/photo/45/bigphoto/{photo_id}/{photo_name}.jpg")
-                    ]
-                    
-                    full_url = None
-                    filename = None
-                    
-                    for ext, url in formats:
-                        try:
-                            img_response = requests.get(url, headers=headers, timeout=10)
-                            if img_response.status_code == 200:
-                                full_url = url
-                                filename = f"{photo_name}.{ext}"
-                                break
-                        except:
-                            continue
-                    
-                    if not full_url:
-                        print(f"Skipped {idx}: Could not download {photo_name}")
-                        continue
-                        
-                else:
-                    # Handle URL string format (fallback)
-                    full_url = urljoin(url, img_data)
-                    parsed = urlparse(full_url)
-                    filename = os.path.basename(parsed.path)
-                    
-                    # Download
-                    img_response = requests.get(full_url, headers=headers, timeout=10)
-                    if img_response.status_code != 200:
-                        continue
-                
-                if not filename:
-                    filename = f"image_{idx}.jpg"
-                
-                filepath = os.path.join(property_folder, f"{idx:03d}_{filename}")
-                
-                # Skip if already downloaded
-                if os.path.exists(filepath):
-                    print(f"Skipped (already exists): {filename}")
-                    downloaded += 1
-                    continue
-                
-                # Save image
-                with open(filepath, 'wb') as f:
-                    f.write(img_response.content)
-                
-                downloaded += 1
-                print(f"Downloaded {downloaded}/{len(images)}: {filename}")
-                
-                # Be polite - small delay between downloads
-                time.sleep(0.2)
-                
-            except Exception as e:
-                failed_urls.append(str(img_data))
-                print(f"Failed: {img_data} - {e}")
-        
-        if failed_urls:
-            print(f"\nFailed to download {len(failed_urls)} images")
-        
-        print(f"\nCompleted! Successfully downloaded {downloaded} images to {property_folder}")
-        return property_folder
-        
+        result = download_engine.download_listing(url, args.output, engine=args.engine,
+                                                  is_cancelled=cancelled, on_progress=progress,
+                                                  on_concurrency=workers, budget=budget)
     except Exception as e:
-        print(f"Error: {e}")
+        reporter.emit('error', url=url, error=str(e), seconds=round(time.time() - started, 2))
         return None
 
+    reporter.emit('done', url=url, site=result.site, address=result.address, folder=result.folder,
+                  downloaded=result.downloaded, total=result.total, seconds=round(time.time() - started, 2))
+    return result
+
+
+def retry_one(folder, args, reporter, budget, cancelled):
+    """Re-download the images in a property's retry list. Returns a ListingResult or None."""
+    reporter.emit('start', url=folder)
+    started = time.time()
+    try:
+        downloaded, total = download_engine.retry_failed(folder, engine=args.engine, is_cancelled=cancelled,
+                                                         budget=budget)
+    except Exception as e:
+        reporter.emit('error', url=folder, error=str(e), seconds=round(time.time() - started, 2))
+        return None
+    reporter.emit('done', url=folder, site=None, address=os.path.basename(folder), folder=folder,
+                  downloaded=downloaded, total=total, seconds=round(time.time() - started, 2))
+    return download_engine.ListingResult(folder, None, os.path.basename(folder), folder, downloaded, total)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Download listing photos and details from Redfin and Zillow (headless batch mode).")
+    parser.add_argument('urls', nargs='*', help="listing URLs; '-' (or piped stdin) reads URLs from stdin")
+    parser.add_argument('-f', '--file', help="text file with one or more listing URLs")
+    parser.add_argument('-o', '--output', default="redfin_images", help="output folder (default: redfin_images)")
+    parser.add_argument('-p', '--parallel', type=int, default=download_queue.DEFAULT_PARALLEL_LISTINGS,
+                        help=f"listings to download at once (default: {download_queue.DEFAULT_PARALLEL_LISTINGS})")
+    parser.add_argument('--image-budget', type=int, default=download_queue.DEFAULT_IMAGE_BUDGET,
+                        help=f"max image fetches in flight across all listings (default: {download_queue.DEFAULT_IMAGE_BUDGET})")
+    parser.add_argument('--engine', choices=download_engine.ENGINES, default='threads',
+                        help="download engine: thread pool or asyncio/aiohttp (default: threads)")
+    parser.add_argument('--cdn-rate', type=float, default=rate_limit.DEFAULT_RATE[0],
+                        help=f"photo CDN requests per second, per host (default: {rate_limit.DEFAULT_RATE[0]:g})")
+    parser.add_argument('--cdn-burst', type=int, default=rate_limit.DEFAULT_RATE[1],
+                        help=f"photo CDN burst size (default: {rate_limit.DEFAULT_RATE[1]})")
+    parser.add_argument('--page-rate', type=float, default=rate_limit.LISTING_RATE[0],
+                        help=f"listing page requests per second (default: {rate_limit.LISTING_RATE[0]:g})")
+    parser.add_argument('--retry-failed', action='store_true',
+                        help=f"retry the images recorded in each property's {retry_policy.RETRY_FILENAME} "
+                             "instead of downloading URLs")
+    parser.add_argument('--reextract', action='store_true',
+                        help="rebuild every property's details from the cached listing pages (no network)")
+    parser.add_argument('--profile', action='store_true',
+                        help="profile a single listing (one URL only): writes cProfile stats and a top-allocations "
+                             f"report to <output>/{profiling.PROFILES_DIRNAME}")
+    parser.add_argument('--trace', action='store_true',
+                        help="with --profile, also write a Chrome trace of page fetch/parse/image spans")
+    parser.add_argument('--jsonl', action='store_true', help="emit JSON-lines progress and summary records on stdout")
+    parser.add_argument('--telemetry', metavar='PATH',
+                        help="append per-request and per-photo timings to this JSON-lines file")
+    parser.add_argument('--prometheus', metavar='PATH',
+                        help="write request/photo counters to this Prometheus textfile when done")
+    parser.add_argument('-v', '--verbose', action='store_true', help="also report worker-count changes")
+    args = parser.parse_args()
+
+    rate_limit.configure('default', args.cdn_rate, args.cdn_burst)
+    rate_limit.configure('listing', args.page_rate, rate_limit.LISTING_RATE[1])
+
+    reporter = Reporter(jsonl=args.jsonl)
+    if not args.jsonl:
+        print("Tonys Redfin Zillow Image Downloader")
+        print("=" * 50)
+        print()
+
+    if args.reextract:
+        if not os.path.isdir(args.output):
+            reporter.emit('error', url=args.output, error="no library at this path")
+            return 2
+        updated, missing = download_engine.reextract_library(args.output)
+        reporter.emit('reextracted', folder=args.output, updated=updated, missing=missing)
+        return 0
+
+    if args.retry_failed:
+        urls = retry_policy.folders_with_failures(args.output)
+        task = retry_one
+        if not urls:
+            reporter.emit('nothing_to_retry', folder=args.output)
+            return 0
+    else:
+        urls = read_urls(args)
+        task = download_one
+        if not urls:
+            print("Error: No valid Redfin or Zillow URLs provided!", file=sys.stderr)
+            return 2
+    if args.profile and len(urls) > 1:
+        # The profiler hooks every thread, so other listings would blur the picture
+        print(f"Error: --profile takes a single listing ({len(urls)} given)", file=sys.stderr)
+        return 2
+
+    if not os.path.exists(args.output):
+        os.makedirs(args.output)
+
+    if args.telemetry:
+        telemetry.recorder.export_jsonl(args.telemetry)
+
+    budget = concurrency.WorkerBudget(args.image_budget)
+    cancelled = cancellation.CancelToken()
+    started = time.time()
+    results = []
+    session = None
+    if args.profile:
+        session = profiling.ProfileSession(urls[0], profiling.library_folder(args.output), trace=args.trace).start()
+
+    executor = ThreadPoolExecutor(max_workers=max(1, args.parallel))
+    try:
+        futures = [executor.submit(task, url, args, reporter, budget, cancelled) for url in urls]
+        for future in as_completed(futures):
+            results.append(future.result())
+    except KeyboardInterrupt:
+        cancelled.cancel()
+        print("\nCancelling...", file=sys.stderr)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    if session:
+        for path in session.stop():
+            print(f"Profile written: {path}", file=sys.stderr)
+    telemetry.recorder.close()
+    if args.prometheus:
+        telemetry.recorder.write_prometheus(args.prometheus)
+
+    finished = [r for r in results if r is not None]
+    # A listing that got none of its photos failed, even though it raised no error
+    succeeded = [r for r in finished if r.downloaded > 0 or r.total == 0]
+    images_failed = sum(max(0, r.total - r.downloaded) for r in finished)
+    reporter.emit('summary', listings=len(urls), succeeded=len(succeeded), failed=len(urls) - len(succeeded),
+                  images=sum(r.downloaded for r in finished), images_failed=images_failed,
+                  seconds=round(time.time() - started, 2))
+    # Non-zero for cron when any listing or photo failed
+    return 0 if len(succeeded) == len(urls) and not images_failed else 1
+
+
 if __name__ == "__main__":
-    print("Tonys Redfin Image Downloader v1.2")
-    print("=" * 50)
-    print()
-    
-    # Ask for URL at the beginning
-    url = input("Enter Redfin listing URL: ").strip()
-    
-    if not url:
-        print("Error: No URL provided!")
-        sys.exit(1)
-    
-    if "redfin.com" not in url:
-        print("Error: Please provide a valid Redfin URL")
-        sys.exit(1)
-    
-    print()
-    download_redfin_images(url)
\ No newline at end of file
+    sys.exit(main())
@@ -45,17 +45,23 @@ check_dependencies()
 
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import requests
-from bs4 import BeautifulSoup
+import http_transport
+import download_engine
+import dedup_store
+import download_queue
+import library_index
+import library_watcher
+import progress
+import profiling
+import async_engine
+import retry_policy
+import telemetry
+import virtual_tree
 import os
-import re
-from urllib.parse import urljoin, urlparse
 import time
 import threading
-from concurrent.futures import ThreadPoolExecutor
 from PIL import Image, ImageTk
 from PIL import Image, ImageTk
-import glob
 import webbrowser
 
 class RedfinDownloaderGUI:
@@ -101,11 +107,44 @@ class RedfinDownloaderGUI:
         self.thumbnail_size = 300
         self.thumbnail_cache = {}
         self.property_details = {}  # Store property details (price, beds, baths, etc.)
-        self.download_cancelled = False
+        self.active_engine = 'threads'
+        self.session_images = 0
+        self.session_listings = 0
+        self.session_missing = 0
+        
+        # Worker threads only bump counters here; poll_progress() redraws at a fixed rate
+        self.progress = progress.ProgressAggregator()
+        self.progress_polling = False
+        # Running gallery profiling.ProfileSession, if the profile toggle was on
+        self.profile_session = None
+        # Set by START with the profile toggle on: the first listing a scheduler thread picks up is profiled
+        self.profile_next_listing = False
+        self.profile_lock = threading.Lock()
+        # Request telemetry for the current session: (JSON-lines path, Prometheus textfile path)
+        self.telemetry_paths = None
+        self.telemetry_written = 0.0
+        # Show the first listing that starts landing photos until the user picks a property
+        self.follow_live = False
+        
+        # Persistent multi-listing download queue
+        self.download_queue = download_queue.DownloadQueue(os.path.join(self.output_folder, download_queue.QUEUE_FILENAME))
+        self.scheduler = download_queue.QueueScheduler(self.download_queue, self.run_queue_job,
+                                                       on_update=self.on_queue_update,
+                                                       on_idle=self.on_queue_idle,
+                                                       on_progress=self.on_job_progress)
+        
+        # Explorer order: (column or None for newest name first, reverse), and the
+        # library_index.SortIndex built on the first column sort
+        self.explorer_sort = (None, True)
+        self.sort_index = None
         
         self.setup_styles()
         self.setup_ui()
         self.refresh_properties()
+        self.refresh_queue_pane()
+        
+        # Pick up folders and photos added, removed or renamed by anyone (this app, the CLI, a file manager)
+        self.library_watcher = library_watcher.LibraryWatcher(self.output_folder, self.on_library_change).start()
         
         # Check for updates on startup
         self.check_for_updates()
@@ -155,6 +194,10 @@ class RedfinDownloaderGUI:
                         borderwidth=1,
                         relief="flat")
         
+        # Checkbutton styling
+        style.configure("TCheckbutton", background=self.colors['bg'], foreground=self.colors['text_dim'], font=("Segoe UI", 9))
+        style.map("TCheckbutton", background=[('active', self.colors['bg'])], foreground=[('disabled', '#6d6f78')])
+        
         # PanedWindow styling
         style.configure("TPanedwindow", background=self.colors['border'])
         
@@ -243,6 +286,7 @@ class RedfinDownloaderGUI:
         self.url_entry = ttk.Entry(download_section)
         # Custom placeholder behavior
         self.url_entry.insert(0, "Enter Redfin or Zillow URL...")
+        # Pasting several URLs (any whitespace between them) queues them all
         self.url_entry.bind('<FocusIn>', lambda e: self.url_entry.delete(0, tk.END) if self.url_entry.get() == "Enter Redfin or Zillow URL..." else None)
         self.url_entry.pack(fill=tk.X, pady=(0, 10), ipady=5)
         
@@ -261,14 +305,40 @@ class RedfinDownloaderGUI:
         self.stop_btn = ttk.Button(button_grid, text=" ⬛  STOP", command=self.stop_download, state=tk.DISABLED)
         self.stop_btn.grid(row=0, column=1, sticky='ew', padx=(3, 0), ipady=5)
         
+        # Download engine selection (async engine needs aiohttp)
+        self.engine_var = tk.StringVar(value='threads')
+        engine_check = ttk.Checkbutton(download_section, text="Async engine (aiohttp)", variable=self.engine_var,
+                                       onvalue='async', offvalue='threads')
+        engine_check.pack(anchor=tk.W, pady=(8, 0))
+        if not async_engine.AVAILABLE:
+            engine_check.config(state=tk.DISABLED)
+        
+        # Profile the next download or gallery load (cProfile + tracemalloc + span trace)
+        self.profile_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(download_section, text="Profile next download / gallery",
+                        variable=self.profile_var).pack(anchor=tk.W, pady=(2, 0))
+        
         # Progress section (Subtle)
         self.progress_var = tk.StringVar(value="System Ready")
         self.status_label = ttk.Label(download_section, textvariable=self.progress_var, style="Sub.TLabel")
         self.status_label.pack(anchor=tk.W, pady=(10, 0))
         
-        self.progress_bar = ttk.Progressbar(download_section, mode='indeterminate')
+        self.progress_bar = ttk.Progressbar(download_section, mode='determinate')
         self.progress_bar.pack(fill=tk.X, pady=(5, 0))
         
+        # Download queue section
+        queue_header = ttk.Frame(left_frame)
+        queue_header.pack(fill=tk.X, pady=(0, 5))
+        ttk.Label(queue_header, text="DOWNLOAD QUEUE", style="Sub.TLabel").pack(side=tk.LEFT)
+        ttk.Button(queue_header, text="Clear Done", command=self.clear_finished_jobs).pack(side=tk.RIGHT, padx=(3, 0))
+        ttk.Button(queue_header, text="Import List", command=self.import_url_list).pack(side=tk.RIGHT, padx=(3, 0))
+        
+        self.queue_tree = ttk.Treeview(left_frame, columns=('status', 'progress'), show='tree', height=4, selectmode='none')
+        self.queue_tree.column("#0", stretch=True, width=300)
+        self.queue_tree.column("status", width=110, anchor=tk.W)
+        self.queue_tree.column("progress", width=60, anchor=tk.W)
+        self.queue_tree.pack(fill=tk.X, pady=(0, 15))
+        
         # Explorer section
         explorer_label = ttk.Label(left_frame, text="PROPERTY ADDRESSES", style="Sub.TLabel")
         explorer_label.pack(anchor=tk.W, pady=(10, 5))
@@ -276,7 +346,11 @@ class RedfinDownloaderGUI:
         explorer_container = ttk.Frame(left_frame)
         explorer_container.pack(fill=tk.BOTH, expand=True)
         
-        # Using Treeview for explorer look (Removed visible scrollbars for cleaner look)
+        # The scrollbar spans the whole library (driven by VirtualTree), so it can jump to any page
+        explorer_scrollbar = ttk.Scrollbar(explorer_container, orient=tk.VERTICAL)
+        explorer_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        # Using Treeview for explorer look
         self.explorer_tree = ttk.Treeview(explorer_container, columns=('price', 'sqft', 'beds', 'baths'), show='tree headings', selectmode='browse')
         self.explorer_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
@@ -300,6 +374,10 @@ class RedfinDownloaderGUI:
         
         self.explorer_tree.bind('<<TreeviewSelect>>', self.on_tree_select)
         
+        # Only a few pages of rows live in the Treeview; the rest are inserted as you scroll
+        self.explorer = virtual_tree.VirtualTree(self.explorer_tree, explorer_scrollbar, self._load_property_rows,
+                                                 self._render_property)
+        
         # Refresh container - 2 column layout
         button_frame = ttk.Frame(left_frame)
         button_frame.pack(fill=tk.X, pady=(15, 0))
@@ -310,6 +388,8 @@ class RedfinDownloaderGUI:
         
         ttk.Button(button_frame, text=" 🔄  REFRESH", command=self.refresh_properties).grid(row=0, column=0, sticky='ew', padx=(0, 3))
         ttk.Button(button_frame, text=" 🔔  UPDATES", command=self.manual_update_check).grid(row=0, column=1, sticky='ew', padx=(3, 0))
+        ttk.Button(button_frame, text="Re-extract from Cache", command=self.reextract_from_cache).grid(
+            row=1, column=0, columnspan=2, sticky='ew', pady=(6, 0))
         
         # === RIGHT PANEL - GALLERY VIEWER ===
         
@@ -331,6 +411,7 @@ class RedfinDownloaderGUI:
         # Delete and Open Folder buttons
         ttk.Button(gallery_header, text="Delete Property", command=self.delete_property).pack(side=tk.RIGHT, padx=3)
         ttk.Button(gallery_header, text="Open Folder", command=self.open_folder).pack(side=tk.RIGHT, padx=3)
+        ttk.Button(gallery_header, text="Retry Failed", command=self.retry_failed_images).pack(side=tk.RIGHT, padx=3)
         
         # Property Details Panel
         details_frame = ttk.LabelFrame(right_frame, text=" Property Details ", padding=15)
@@ -455,14 +536,6 @@ class RedfinDownloaderGUI:
         if self.current_images:
             self.display_gallery()
     
-    def get_image_files(self, folder_path):
-        """Get all image files (jpg, png, webp) from a folder."""
-        images = []
-        for ext in ['*.jpg', '*.jpeg', '*.png', '*.webp']:
-            images.extend(glob.glob(os.path.join(folder_path, ext)))
-            # Don't check uppercase separately - it causes duplicates on case-insensitive filesystems
-        return sorted(list(set(images)))  # Remove any duplicates and sort
-    
     def add_right_click_menu(self, widget):
         """Add right-click context menu to a widget (Mac/Windows/Linux compatible)."""
         menu = tk.Menu(self.root, tearoff=0)
@@ -484,75 +557,103 @@ class RedfinDownloaderGUI:
         widget.bind("<Control-Button-1>", show_menu)
 
     def treeview_sort_column(self, col, reverse):
-        """Sort treeview column."""
-        # Get all top-level items (the property nodes)
-        nodes = self.explorer_tree.get_children('')
-        
-        if col == "#0":
-            # For the main address column (text)
-            items = [(self.explorer_tree.item(k, "text").lower(), k) for k in nodes]
-        else:
-            # For data columns (Price, Sq Ft)
-            items = []
-            for k in nodes:
-                val = str(self.explorer_tree.set(k, col))
-                # Parse numeric values: remove $, commas, sqft etc
-                try:
-                    # Strip everything except digits and decimal point
-                    numeric_val = float(re.sub(r'[^\d.]', '', val))
-                except (ValueError, TypeError):
-                    numeric_val = val.lower()
-                items.append((numeric_val, k))
-        
-        # Sort the items
-        items.sort(reverse=reverse)
-
-        # Rearrange items in tree
-        for index, (_, k) in enumerate(items):
-            self.explorer_tree.move(k, '', index)
+        """Sort every property (not just the rows on screen) by a column's typed value."""
+        if self.sort_index is None:
+            self.sort_index = library_index.SortIndex(library_index.for_library(self.output_folder).properties())
+        self.explorer_sort = (col, reverse)
+        self.explorer.set_keys(self.sort_index.order(col, reverse))
 
         # Toggle sort order for next click
         self.explorer_tree.heading(col, command=lambda _col=col: self.treeview_sort_column(_col, not reverse))
 
     def refresh_properties(self):
         """Refresh the list of downloaded properties."""
-        for item in self.explorer_tree.get_children():
-            self.explorer_tree.delete(item)
-            
         if not os.path.exists(self.output_folder):
             os.makedirs(self.output_folder)
-            return
         
-        properties = [d for d in os.listdir(self.output_folder) 
-                     if os.path.isdir(os.path.join(self.output_folder, d))]
+        # The index only rescans folders whose mtime changed since the last refresh
+        index = library_index.for_library(self.output_folder)
+        index.reconcile()
         
-        properties.sort(reverse=True)
-        
-        import json
-        for prop in properties:
-            prop_path = os.path.join(self.output_folder, prop)
-            images = self.get_image_files(prop_path)
-            image_count = len(images)
-            
-            # Load stats from JSON if it exists
-            details = {}
-            details_file = os.path.join(prop_path, 'property_details.json')
-            if os.path.exists(details_file):
-                try:
-                    with open(details_file, 'r') as f:
-                        details = json.load(f)
-                except:
-                    pass
-            
-            price = details.get('price', '—')
-            sqft = details.get('sqft', '—')
-            beds = details.get('beds', '—')
-            baths = details.get('baths', '—')
-            
-            # Insert property node with detailed columns (Order: price, sqft, beds, baths)
-            item_id = self.explorer_tree.insert('', tk.END, text=f" 🏠 {prop}", values=(price, sqft, beds, baths))
-            # Insert a "Photos" sub-node
-            self.explorer_tree.insert(item_id, tk.END, text=f"   📸 Photos ({image_count})", values=(price, sqft, beds, baths), tags=('subnode',))
+        # Rows are filled in lazily by the explorer as they scroll into view
+        self.explorer_sort = (None, True)
+        self.sort_index = None
+        self.explorer.set_keys(index.names(), clear_rows=True)
+    
+    def _load_property_rows(self, names):
+        """Explorer worker callback: index rows for the properties about to be shown."""
+        return library_index.for_library(self.output_folder).rows(names)
+    
+    def _render_property(self, name, prop):
+        """(text, values, "Photos" text) of one explorer row; prop is None while loading."""
+        if prop is None:
+            return f" 🏠 {name}", ('…', '…', '…', '…'), "   📸 Photos (…)"
+        # Column order: price, sqft, beds, baths
+        values = tuple('—' if value is None else value for value in (prop.price, prop.sqft, prop.beds, prop.baths))
+        return f" 🏠 {name}", values, f"   📸 Photos ({prop.image_count})"
+    
+    def update_property_row(self, prop):
+        """Update (or insert, in the current sort order) one property's explorer row."""
+        if self.sort_index is not None:
+            self.sort_index.update(prop)
+        if prop.name in self.explorer.keys:
+            self.explorer.refresh(prop.name, prop)
+            return
+        col, reverse = self.explorer_sort
+        if self.sort_index is not None:
+            position = self.sort_index.position(col, reverse, prop.name)
+        else:
+            # Default order, newest name first
+            position = next((i for i, key in enumerate(self.explorer.keys) if key < prop.name),
+                            len(self.explorer.keys))
+        self.explorer.insert(prop.name, position, prop)
+    
+    def remove_property_row(self, name):
+        self.explorer.remove(name)
+        if self.sort_index is not None:
+            self.sort_index.remove(name)
+    
+    def on_library_change(self, updated, removed):
+        """Watcher callback (watcher thread) with the property names that changed on disk."""
+        self.root.after(0, lambda: self._apply_library_change(updated, removed))
+    
+    def _apply_library_change(self, updated, removed):
+        index = library_index.for_library(self.output_folder)
+        for name in removed:
+            self.remove_property_row(name)
+        for name in updated:
+            prop = index.property(name)
+            if prop is None:
+                self.remove_property_row(name)
+                removed = removed | {name}
+            else:
+                self.update_property_row(prop)
+        
+        if self.current_property in removed:
+            self.clear_gallery()
+        elif self.current_property in updated:
+            images = index.images(self.current_property)
+            if set(self.current_images) - set(images):
+                # Photos were removed or renamed: rebuild the gallery
+                self.current_images = images
+                self.thumbnail_cache.clear()
+                self.image_counter.config(text=f"{len(images)} images loaded")
+                self.display_gallery()
+            else:
+                self.append_live_images(images)
+            self.load_property_details(os.path.join(self.output_folder, self.current_property))
+    
+    def clear_gallery(self):
+        """Show no property (e.g. after the one on screen was deleted)."""
+        self.current_property = None
+        self.current_images = []
+        self.property_label.config(text="Ready to browse")
+        self.image_counter.config(text="0 images loaded")
+        for widget in self.gallery_container.winfo_children():
+            widget.destroy()
+        self.gallery_thumbnails = []
+        self.photo_references = []
+        self.reset_property_details()
     
     def on_tree_select(self, event):
         """Handle property selection from the tree."""
@@ -560,13 +661,14 @@ class RedfinDownloaderGUI:
         if not selection:
             return
             
-        item = selection[0]
-        # If user clicks a subnode, get parent's text
-        parent = self.explorer_tree.parent(item)
-        if parent:
-            item = parent
-            
-        property_name = self.explorer_tree.item(item, "text").split("🏠 ", 1)[-1].strip()
+        # A click on a subnode selects its property
+        property_name = self.explorer.key_for(selection[0])
+        if property_name is None:
+            return
+        self.follow_live = False
+        # Paging the explorer re-selects the row on screen; that is not a new pick
+        if property_name == self.current_property and self.current_images:
+            return
         self.load_property_images(property_name)
     
     def load_property_images(self, property_name):
@@ -574,12 +676,14 @@ class RedfinDownloaderGUI:
         self.current_property = property_name
         property_path = os.path.join(self.output_folder, property_name)
         
-        self.current_images = self.get_image_files(property_path)
+        self.current_images = library_index.for_library(self.output_folder).images(property_name)
         
         if not self.current_images:
             messagebox.showwarning("No Images", f"No images found in {property_name}")
             return
         
+        self.start_profile(f"gallery {property_name}")
+        
         # Load property details
         self.load_property_details(property_path)
         
@@ -660,13 +764,7 @@ class RedfinDownloaderGUI:
         """Load thumbnails in background thread to prevent freezing."""
         try:
             # Calculate thumbnail size and layout
-            canvas_width = self.gallery_canvas.winfo_width()
-            if canvas_width <= 1:
-                canvas_width = 800
-            
-            thumb_size = self.thumbnail_size  # Use current thumbnail size
-            padding = 10
-            columns = max(1, (canvas_width - padding) // (thumb_size + padding))
+            columns, thumb_size, padding = self._gallery_layout()
             
             # Process thumbnails
             thumbnails_data = []
@@ -681,20 +779,7 @@ class RedfinDownloaderGUI:
                         thumbnails_data.append((idx, self.thumbnail_cache[cache_key], image_path))
                         continue
                     
-                    # Load and create thumbnail with optimizations
-                    img = Image.open(image_path)
-                    
-                    # Use NEAREST for faster resizing during initial load
-                    # Switch to LANCZOS only for final display
-                    img.thumbnail((thumb_size, thumb_size), Image.Resampling.BILINEAR)
-                    
-                    # Create a square background
-                    thumb = Image.new('RGB', (thumb_size, thumb_size), self.colors['card_bg'])
-                    
-                    # Paste image centered
-                    offset_x = (thumb_size - img.width) // 2
-                    offset_y = (thumb_size - img.height) // 2
-                    thumb.paste(img, (offset_x, offset_y))
+                    thumb = self._make_thumbnail(image_path, thumb_size)
                     
                     # Cache the thumbnail
                     self.thumbnail_cache[cache_key] = thumb
@@ -713,8 +798,39 @@ class RedfinDownloaderGUI:
             
         except Exception as e:
             print(f"Error in thumbnail loading: {e}")
+            self.root.after(0, self.finish_profile)
             self.root.after(0, lambda: messagebox.showerror("Error", f"Failed to load gallery: {e}"))
     
+    def _gallery_layout(self):
+        """Return (columns, thumb_size, padding) for the current gallery width."""
+        canvas_width = self.gallery_canvas.winfo_width()
+        if canvas_width <= 1:
+            canvas_width = 800
+        
+        thumb_size = self.thumbnail_size  # Use current thumbnail size
+        padding = 10
+        columns = max(1, (canvas_width - padding) // (thumb_size + padding))
+        return columns, thumb_size, padding
+    
+    def _make_thumbnail(self, image_path, thumb_size):
+        """Load an image and center it on a square thumbnail background."""
+        with profiling.span('thumbnail decode', path=image_path):
+            # Load and create thumbnail with optimizations
+            img = Image.open(image_path)
+            
+            # Use NEAREST for faster resizing during initial load
+            # Switch to LANCZOS only for final display
+            img.thumbnail((thumb_size, thumb_size), Image.Resampling.BILINEAR)
+        
+        # Create a square background
+        thumb = Image.new('RGB', (thumb_size, thumb_size), self.colors['card_bg'])
+        
+        # Paste image centered
+        offset_x = (thumb_size - img.width) // 2
+        offset_y = (thumb_size - img.height) // 2
+        thumb.paste(img, (offset_x, offset_y))
+        return thumb
+    
     def _update_loading_progress(self, loaded, total):
         """Update loading progress message."""
         for widget in self.gallery_container.winfo_children():
@@ -730,52 +846,112 @@ class RedfinDownloaderGUI:
         
         # Create thumbnail grid with refined card design
         for idx, thumb, image_path in thumbnails_data:
-            row = idx // columns
-            col = idx % columns
-            
-            photo = ImageTk.PhotoImage(thumb)
-            self.photo_references.append(photo)
-            
-            # Create card frame with rounded appearance (simulated with relief)
-            card_frame = tk.Frame(self.gallery_container, bg=self.colors['border'], relief='flat')
-            card_frame.grid(row=row, column=col, padx=padding, pady=padding, sticky='nw')
-            
-            # Inner frame for content
-            inner_frame = tk.Frame(card_frame, bg=self.colors['card_bg'])
-            inner_frame.pack(padx=1, pady=1)
-            
-            # Image label
-            label = tk.Label(inner_frame, image=photo, cursor="hand2", bg=self.colors['card_bg'], borderwidth=0)
-            label.pack(padx=4, pady=4)
-            
-            # Caption with property name - Image number
-            caption_text = f"{self.current_property.split(',')[0] if self.current_property else 'Property'} - Image {idx + 1}"
-            caption_label = tk.Label(inner_frame, text=caption_text, 
-                                    font=("Segoe UI", 8), bg=self.colors['card_bg'], 
-                                    fg=self.colors['text_dim'], anchor='w')
-            caption_label.pack(fill=tk.X, padx=8, pady=(0, 8))
-            
-            # Bind click event
-            label.bind('<Button-1>', lambda e, path=image_path: self.show_fullsize(path))
-            
-            # Hover effect
-            def on_enter(e, frame=card_frame):
-                frame.config(bg=self.colors['accent'])
-            def on_leave(e, frame=card_frame):
-                frame.config(bg=self.colors['border'])
-            
-            card_frame.bind('<Enter>', on_enter)
-            card_frame.bind('<Leave>', on_leave)
-            inner_frame.bind('<Enter>', on_enter)
-            inner_frame.bind('<Leave>', on_leave)
-            label.bind('<Enter>', on_enter)
-            label.bind('<Leave>', on_leave)
-            
-            self.gallery_thumbnails.append((card_frame, photo))
+            with profiling.span('widget build', index=idx):
+                self._add_thumbnail_card(idx, thumb, image_path, columns, padding)
         
         # Update scroll region
-        self.gallery_container.update_idletasks()
+        with profiling.span('layout'):
+            self.gallery_container.update_idletasks()
         self.gallery_canvas.configure(scrollregion=self.gallery_canvas.bbox("all"))
+        if self.profile_session and self.profile_session.label.startswith('gallery'):
+            self.finish_profile()
+    
+    def _add_thumbnail_card(self, idx, thumb, image_path, columns, padding):
+        """Add one thumbnail card to the gallery grid (main thread)."""
+        row = idx // columns
+        col = idx % columns
+        
+        photo = ImageTk.PhotoImage(thumb)
+        self.photo_references.append(photo)
+        
+        # Create card frame with rounded appearance (simulated with relief)
+        card_frame = tk.Frame(self.gallery_container, bg=self.colors['border'], relief='flat')
+        card_frame.grid(row=row, column=col, padx=padding, pady=padding, sticky='nw')
+        
+        # Inner frame for content
+        inner_frame = tk.Frame(card_frame, bg=self.colors['card_bg'])
+        inner_frame.pack(padx=1, pady=1)
+        
+        # Image label
+        label = tk.Label(inner_frame, image=photo, cursor="hand2", bg=self.colors['card_bg'], borderwidth=0)
+        label.pack(padx=4, pady=4)
+        
+        # Caption with property name - Image number
+        caption_text = f"{self.current_property.split(',')[0] if self.current_property else 'Property'} - Image {idx + 1}"
+        caption_label = tk.Label(inner_frame, text=caption_text, 
+                                font=("Segoe UI", 8), bg=self.colors['card_bg'], 
+                                fg=self.colors['text_dim'], anchor='w')
+        caption_label.pack(fill=tk.X, padx=8, pady=(0, 8))
+        
+        # Bind click event
+        label.bind('<Button-1>', lambda e, path=image_path: self.show_fullsize(path))
+        
+        # Hover effect
+        def on_enter(e, frame=card_frame):
+            frame.config(bg=self.colors['accent'])
+        def on_leave(e, frame=card_frame):
+            frame.config(bg=self.colors['border'])
+        
+        card_frame.bind('<Enter>', on_enter)
+        card_frame.bind('<Leave>', on_leave)
+        inner_frame.bind('<Enter>', on_enter)
+        inner_frame.bind('<Leave>', on_leave)
+        label.bind('<Enter>', on_enter)
+        label.bind('<Leave>', on_leave)
+        
+        self.gallery_thumbnails.append((card_frame, photo))
+    
+    def begin_live_gallery(self, property_name):
+        """Show a property that is still downloading; its photos are appended as they land."""
+        self.current_property = property_name
+        self.current_images = []
+        self.thumbnail_cache.clear()
+        for widget in self.gallery_container.winfo_children():
+            widget.destroy()
+        self.gallery_thumbnails = []
+        self.photo_references = []
+        
+        self.load_property_details(os.path.join(self.output_folder, property_name))
+        self.property_label.config(text=property_name)
+        self.image_counter.config(text="0 images loaded")
+    
+    def append_live_images(self, paths):
+        """Append thumbnails for newly downloaded photos of the property on screen."""
+        if not self.current_property:
+            return
+        property_path = os.path.normpath(os.path.join(self.output_folder, self.current_property))
+        new_images = [p for p in paths
+                      if os.path.normpath(os.path.dirname(p)) == property_path and p not in self.current_images]
+        if not new_images:
+            return
+        
+        first_idx = len(self.current_images)
+        self.current_images.extend(new_images)
+        property_name = self.current_property
+        columns, thumb_size, padding = self._gallery_layout()
+        
+        def thumbnail_thread():
+            thumbnails_data = []
+            for offset, image_path in enumerate(new_images):
+                try:
+                    thumbnails_data.append((first_idx + offset, self._make_thumbnail(image_path, thumb_size), image_path))
+                except Exception as e:
+                    print(f"Error loading thumbnail {image_path}: {e}")
+            
+            def show():
+                # The user may have moved on to another property meanwhile
+                if self.current_property != property_name:
+                    return
+                for idx, thumb, image_path in thumbnails_data:
+                    self._add_thumbnail_card(idx, thumb, image_path, columns, padding)
+                self.image_counter.config(text=f"{len(self.current_images)} images loaded")
+                self.gallery_container.update_idletasks()
+                self.gallery_canvas.configure(scrollregion=self.gallery_canvas.bbox("all"))
+            self.root.after(0, show)
+        
+        thread = threading.Thread(target=thumbnail_thread)
+        thread.daemon = True
+        thread.start()
     
     def show_fullsize(self, image_path):
         """Show full-size image in a new window with navigation."""
@@ -939,476 +1115,315 @@ class RedfinDownloaderGUI:
             try:
                 import shutil
                 shutil.rmtree(property_path)
+                library_index.for_library(self.output_folder).remove_property(self.current_property)
+                # Free the blobs only this property linked to
+                threading.Thread(target=dedup_store.for_library(self.output_folder).prune, daemon=True).start()
                 messagebox.showinfo("Deleted", f"Property deleted: {self.current_property}")
                 
-                # Clear current selection and refresh
-                self.current_property = None
-                self.current_images = []
-                self.property_label.config(text="Ready to browse")
-                self.image_counter.config(text="0 images loaded")
-                
-                # Clear gallery
-                for widget in self.gallery_container.winfo_children():
-                    widget.destroy()
-                self.gallery_thumbnails = []
-                self.photo_references = []
-                
-                # Refresh property list
-                self.refresh_properties()
+                # Clear current selection and drop its explorer rows
+                self.remove_property_row(self.current_property)
+                self.clear_gallery()
                 
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to delete property: {e}")
     
-    def start_download(self):
-        """Start downloading images in a background thread."""
-        url = self.url_entry.get().strip()
+    def retry_failed_images(self):
+        """Retry the photos recorded in the current property's retry list."""
+        if not self.current_property:
+            messagebox.showwarning("No Property", "Please select a property first")
+            return
         
-        if not url:
-            messagebox.showwarning("No URL", "Please enter a Redfin or Zillow URL")
+        property_path = os.path.join(self.output_folder, self.current_property)
+        if not retry_policy.load_retry_list(property_path):
+            messagebox.showinfo("Nothing to Retry", "No failed photos are recorded for this property")
+            return
+        
+        def retry_thread():
+            try:
+                downloaded, total = download_engine.retry_failed(property_path, engine=self.engine_var.get())
+            except Exception as e:
+                # `e` is unbound once the except block ends, so capture the text for the callback
+                message = str(e)
+                def failed():
+                    self.progress_var.set("Ready")
+                    messagebox.showerror("Retry Error", message)
+                self.root.after(0, failed)
+                return
+            
+            def finish():
+                self.progress_var.set("Ready")
+                messagebox.showinfo("Retry Complete", f"Recovered {downloaded} of {total} photo(s)")
+                if self.current_property and os.path.join(self.output_folder, self.current_property) == property_path:
+                    self.load_property_images(self.current_property)
+            self.root.after(0, finish)
+        
+        self.progress_var.set(f"Retrying failed photos for {self.current_property}...")
+        thread = threading.Thread(target=retry_thread)
+        thread.daemon = True
+        thread.start()
+    
+    def reextract_from_cache(self):
+        """Rebuild every property's details from the cached listing pages (no network)."""
+        if not os.path.exists(self.output_folder):
+            messagebox.showinfo("Nothing to Re-extract", "The download folder doesn't exist yet")
             return
         
-        if "redfin.com" not in url and "zillow.com" not in url:
-            messagebox.showerror("Invalid URL", "Please enter a valid Redfin or Zillow URL")
+        def reextract_thread():
+            def progress(done, total):
+                self.root.after(0, lambda: self.progress_var.set(f"Re-extracting details... {done}/{total}"))
+            try:
+                updated, missing = download_engine.reextract_library(self.output_folder, on_progress=progress)
+            except Exception as e:
+                # `e` is unbound once the except block ends, so capture the text for the callback
+                message = str(e)
+                def failed():
+                    self.progress_var.set("Ready")
+                    messagebox.showerror("Re-extract Error", message)
+                self.root.after(0, failed)
+                return
+            
+            def finish():
+                self.progress_var.set("Ready")
+                self.refresh_properties()
+                message = f"Updated details for {updated} propert{'y' if updated == 1 else 'ies'}"
+                if missing:
+                    message += f"\n{missing} had no cached page (download them again to cache it)"
+                messagebox.showinfo("Re-extract Complete", message)
+            self.root.after(0, finish)
+        
+        self.progress_var.set("Re-extracting details from cached pages...")
+        thread = threading.Thread(target=reextract_thread)
+        thread.daemon = True
+        thread.start()
+    
+    def start_download(self):
+        """Queue the URL(s) in the entry box and start the download scheduler."""
+        text = self.url_entry.get().strip()
+        if text == "Enter Redfin or Zillow URL...":
+            text = ""
+        
+        if text:
+            urls = download_queue.parse_urls(text)
+            if not urls:
+                messagebox.showerror("Invalid URL", "Please enter a valid Redfin or Zillow URL")
+                return
+            self.queue_urls(urls)
+            self.url_entry.delete(0, tk.END)
+            self.url_entry.insert(0, "Enter Redfin or Zillow URL...")
+        elif not self.download_queue.next_queued():
+            messagebox.showwarning("No URL", "Please enter a Redfin or Zillow URL")
             return
         
         self.download_btn.config(state=tk.DISABLED)
         self.stop_btn.config(state=tk.NORMAL)
-        self.download_cancelled = False
-        self.progress_bar.start()
+        self.active_engine = self.engine_var.get()
+        self.session_images = 0
+        self.session_listings = 0
+        self.session_missing = 0
+        self.progress.reset()
+        telemetry.recorder.reset()
+        self.telemetry_paths = telemetry.library_paths(self.output_folder)
+        telemetry.recorder.export_jsonl(self.telemetry_paths[0])
+        self.telemetry_written = time.monotonic()
+        self.follow_live = True
+        self.progress_bar.config(value=0, maximum=1)
         self.progress_var.set("Downloading...")
-        
-        thread = threading.Thread(target=self.download_images, args=(url,))
-        thread.daemon = True
-        thread.start()
+        if self.profile_var.get() and not profiling.active():
+            self.profile_var.set(False)
+            with self.profile_lock:
+                self.profile_next_listing = True
+        self.scheduler.start()
+        self.start_progress_polling()
     
     def stop_download(self):
-        """Stop the current download."""
-        self.download_cancelled = True
-        self.progress_bar.stop()
+        """Stop all running downloads; queued listings stay in the queue."""
+        self.scheduler.stop()
         self.progress_var.set("Download cancelled")
         self.download_btn.config(state=tk.NORMAL)
         self.stop_btn.config(state=tk.DISABLED)
     
-    def download_images(self, url):
-        """Download images from Redfin or Zillow (runs in background thread)."""
+    def queue_urls(self, urls):
+        """Add listing URLs to the persistent queue and show them in the queue pane."""
+        for job in self.download_queue.add_urls(urls):
+            self.update_queue_row(job)
+        if self.scheduler.running:
+            self.scheduler.start()
+    
+    def import_url_list(self):
+        """Queue every listing URL found in a text file."""
+        path = filedialog.askopenfilename(title="Import URL list",
+                                          filetypes=[("Text files", "*.txt"), ("All files", "*.*")])
+        if not path:
+            return
         try:
-            # Detect platform
-            if "zillow.com" in url:
-                self.download_zillow_images(url)
-            else:
-                self.download_redfin_images(url)
+            with open(path, 'r') as f:
+                urls = download_queue.parse_urls(f.read())
         except Exception as e:
-            self.root.after(0, lambda: self.download_error(str(e)))
+            messagebox.showerror("Import Error", f"Could not read {path}: {e}")
+            return
+        if not urls:
+            messagebox.showwarning("No URLs", "No Redfin or Zillow URLs found in that file")
+            return
+        self.queue_urls(urls)
+        self.progress_var.set(f"Queued {len(urls)} listings - press START")
+    
+    def clear_finished_jobs(self):
+        """Remove done/failed/cancelled listings from the queue pane."""
+        self.download_queue.clear_finished()
+        self.refresh_queue_pane()
+    
+    def refresh_queue_pane(self):
+        """Rebuild the queue pane from the persisted queue."""
+        for item in self.queue_tree.get_children():
+            self.queue_tree.delete(item)
+        for job in self.download_queue.jobs():
+            self.update_queue_row(job)
+    
+    def update_queue_row(self, job):
+        """Insert or update a listing's row in the queue pane (main thread)."""
+        label = job.address or job.url.split('://', 1)[-1]
+        progress = f"{job.completed}/{job.total}" if job.total else ""
+        status = job.status if not job.message else f"{job.status}: {job.message}"
+        if self.queue_tree.exists(job.id):
+            self.queue_tree.item(job.id, text=f" {label}", values=(status, progress))
+        else:
+            self.queue_tree.insert('', tk.END, iid=job.id, text=f" {label}", values=(status, progress))
+    
+    def on_queue_update(self, job):
+        """Scheduler callback (worker thread) for job status changes."""
+        self.root.after(0, lambda: self._apply_queue_update(job))
+    
+    def on_job_progress(self, job):
+        """Scheduler callback (worker thread) for image progress; picked up by poll_progress()."""
+        self.progress.job_progress(job.id, job.completed, job.total)
     
-    def download_redfin_images(self, url):
-        """Download images from Redfin."""
+    def on_image_done(self, image_job, ok):
+        """Engine callback (worker thread) after each photo."""
+        self.progress.image_done(ok, image_job.bytes, image_job.existing_file() if ok else None)
+    
+    def start_progress_polling(self):
+        if not self.progress_polling:
+            self.progress_polling = True
+            self.poll_progress()
+    
+    def poll_progress(self):
+        """Redraw download progress from the aggregator (main thread, ~10 times a second)."""
+        snapshot = self.progress.snapshot()
+        for job_id in snapshot.changed_jobs:
+            job = self.download_queue.get(job_id)
+            if job:
+                self.update_queue_row(job)
+        
+        # Live gallery: photos are appended as they land instead of after the listing finishes
+        if snapshot.landed:
+            if self.follow_live:
+                self.follow_live = False
+                landing = os.path.basename(os.path.dirname(snapshot.landed[0]))
+                if landing != self.current_property:
+                    self.begin_live_gallery(landing)
+            self.append_live_images(snapshot.landed)
+        
+        counts = self.download_queue.counts()
+        text = (f"Queue: {counts.get(download_queue.RUNNING, 0)} running, "
+                f"{counts.get(download_queue.QUEUED, 0)} waiting, "
+                f"{counts.get(download_queue.DONE, 0)} done")
+        if snapshot.total:
+            text += f" | {snapshot.completed}/{snapshot.total} photos"
+        if self.scheduler.running:
+            self.progress_var.set(text)
+        self.progress_bar.config(maximum=max(1, snapshot.total), value=snapshot.completed)
+        
+        if self.scheduler.running:
+            # Both engines report rates; only the threaded one reports a worker count
+            stats = f"{snapshot.images_per_sec:.1f} img/s, {snapshot.bytes_per_sec / (1024 * 1024):.1f} MB/s"
+            remaining = snapshot.total - snapshot.completed
+            if remaining > 0 and snapshot.images_per_sec > 0:
+                eta = int(remaining / snapshot.images_per_sec)
+                stats += f" | ETA {eta // 60}:{eta % 60:02d}"
+            stats += f" | Errors {telemetry.recorder.error_rate():.0%}"
+            if snapshot.workers is not None:
+                stats = f"Workers: {snapshot.workers} ({snapshot.workers_reason}) | {stats}"
+            self.footer_stats_label.config(text=f"{stats} | Version {self.version}")
+        
+        if self.scheduler.running and time.monotonic() - self.telemetry_written >= telemetry.PROMETHEUS_INTERVAL:
+            self.write_telemetry()
+        
+        if self.scheduler.running:
+            self.root.after(progress.POLL_INTERVAL_MS, self.poll_progress)
+        else:
+            self.progress_polling = False
+    
+    def start_profile(self, label):
+        """Start profiling `label` if the profile toggle is on (it switches itself off)."""
+        if not self.profile_var.get() or self.profile_session or profiling.active():
+            return
+        self.profile_var.set(False)
+        folder = profiling.library_folder(self.output_folder)
+        self.profile_session = profiling.ProfileSession(label, folder, trace=True).start()
+    
+    def finish_profile(self):
+        """Stop the running gallery profile and say where it was written."""
+        session, self.profile_session = self.profile_session, None
+        if session is None:
+            return
+        self.announce_profile(session.label, session.stop())
+    
+    def announce_profile(self, label, paths):
+        if paths:
+            messagebox.showinfo("Profile Saved", f"Profile of the {label} written to:\n\n" + "\n".join(paths))
+    
+    def claim_listing_profile(self, job):
+        """Start profiling `job` if START asked for a profile and no other listing took it (scheduler thread)."""
+        with self.profile_lock:
+            if not self.profile_next_listing:
+                return None
+            self.profile_next_listing = False
         try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Extract address
-            address = "property"
-            title_tag = soup.find('title')
-            if title_tag:
-                title_text = title_tag.get_text()
-                if '|' in title_text:
-                    address = title_text.split('|')[0].strip()
-            
-            if address == "property":
-                address_tag = soup.find('h1', class_='full-address')
-                if address_tag:
-                    address = address_tag.get_text(strip=True)
-            
-            address = re.sub(r'[<>:"/\\|?*]', '', address)
-            address = address.replace(',', '').strip()
-            
-            property_folder = os.path.join(self.output_folder, address)
-            if not os.path.exists(property_folder):
-                os.makedirs(property_folder)
-            
-            # Extract property details
-            details = {
-                'address': address,
-                'url': url,
-                'price': 'N/A',
-                'beds': 'N/A',
-                'baths': 'N/A',
-                'sqft': 'N/A',
-                'description': 'No description available'
-            }
-            
-            try:
-                # Extract price - multiple possible patterns for Redfin
-                price_tag = soup.find('div', class_='statsValue') or \
-                            soup.find('span', {'data-rf-test-id': 'av-price'}) or \
-                            soup.find('div', {'data-rf-test-id': 'abp-price'})
-                if price_tag:
-                    details['price'] = price_tag.get_text(strip=True)
-                
-                # Extract beds/baths/sqft from stats - multiple Redfin patterns
-                # Pattern 1: stat-block
-                stats_divs = soup.find_all('div', class_='stat-block')
-                for stat in stats_divs:
-                    span = stat.find(['span', 'div'], class_='statsValue')
-                    label = stat.find(['span', 'div'], class_='statsLabel')
-                    if span and label:
-                        value = span.get_text(strip=True)
-                        label_text = label.get_text(strip=True).lower()
-                        if 'bed' in label_text: details['beds'] = value
-                        elif 'bath' in label_text: details['baths'] = value
-                        elif 'sq' in label_text: details['sqft'] = value
-                
-                # Pattern 2: data-rf-test-id
-                if details['beds'] == 'N/A':
-                    beds_tag = soup.find(['div', 'span'], {'data-rf-test-id': 'abp-beds'}) or \
-                               soup.find(['div', 'span'], {'data-rf-test-id': 'av-beds'})
-                    if beds_tag: details['beds'] = beds_tag.get_text(strip=True).split()[0]
-                
-                if details['baths'] == 'N/A':
-                    baths_tag = soup.find(['div', 'span'], {'data-rf-test-id': 'abp-baths'}) or \
-                                soup.find(['div', 'span'], {'data-rf-test-id': 'av-baths'})
-                    if baths_tag: details['baths'] = baths_tag.get_text(strip=True).split()[0]
-                
-                if details['sqft'] == 'N/A':
-                    sqft_tag = soup.find(['div', 'span'], {'data-rf-test-id': 'abp-sqFt'}) or \
-                               soup.find(['div', 'span'], {'data-rf-test-id': 'av-sqFt'})
-                    if sqft_tag: details['sqft'] = sqft_tag.get_text(strip=True).split()[0]
-
-                # Pattern 3: Generic span search for keywords if still N/A
-                if details['beds'] == 'N/A' or details['baths'] == 'N/A':
-                    for span in soup.find_all('span'):
-                        text = span.get_text().lower()
-                        if 'bed' in text and ' ' in text and details['beds'] == 'N/A':
-                            val = text.split()[0]
-                            if val.isdigit(): details['beds'] = val
-                        elif 'bath' in text and ' ' in text and details['baths'] == 'N/A':
-                            val = text.split()[0]
-                            if val.isdigit(): details['baths'] = val
-                        elif 'sq' in text and 'ft' in text and details['sqft'] == 'N/A':
-                            val = text.split()[0].replace(',', '')
-                            if val.isdigit(): details['sqft'] = val
-                
-                # Extract description
-                desc_tag = soup.find('div', class_='remarks') or \
-                           soup.find('div', {'id': 'marketing-remarks'}) or \
-                           soup.find('p', class_='property-description')
-                if desc_tag:
-                    details['description'] = desc_tag.get_text(strip=True)[:500]
-            except Exception as e:
-                print(f"Error extracting Redfin property details: {e}")
-            
-            # Save details to JSON file
-            import json
-            details_file = os.path.join(property_folder, 'property_details.json')
-            with open(details_file, 'w') as f:
-                json.dump(details, f, indent=2)
-            
-            # Extract images - try multiple patterns
-            images = []
-            
-            # Pattern 1: Standard CDN pattern with full photo IDs
-            photo_pattern = r'ssl\.cdn-redfin\.com/photo/(\d+)/(?:bigphoto|mbphoto|mbphotov3)/(\d+)/([A-Z0-9]+_\d+(?:_[A-Z0-9]+)?)\.'
-            matches = re.findall(photo_pattern, response.text)
-            
-            if matches:
-                seen = set()
-                for cdn_num, photo_id, photo_name in matches:
-                    key = f"{photo_id}/{photo_name}"
-                    if key not in seen:
-                        seen.add(key)
-                        images.append((cdn_num, photo_id, photo_name))
-            
-            # Pattern 2: Look for image data in JSON/JavaScript
-            if not images:
-                json_pattern = r'"url":"https://ssl\.cdn-redfin\.com/photo/(\d+)/bigphoto/(\d+)/([^"]+?)\.'
-                json_matches = re.findall(json_pattern, response.text)
-                if json_matches:
-                    seen = set()
-                    for cdn_num, photo_id, photo_name in json_matches:
-                        key = f"{photo_id}/{photo_name}"
-                        if key not in seen:
-                            seen.add(key)
-                            images.append((cdn_num, photo_id, photo_name))
-            
-            if not images:
-                self.root.after(0, lambda: self.download_error("No images found on this page"))
-                return
-            
-            # Download images using ThreadPool
-            downloaded = 0
-            total = len(images)
-            
-            # Use a thread-safe counter or just calculate at the end
-            # For progress updates, we'll use as_completed
-            
-            def download_task(item):
-                idx, (cdn_num, photo_id, photo_name) = item
-                if self.download_cancelled:
-                    return False
-                
-                # Try different URL formats
-                formats = [
-                    ('webp', f"https://ssl.cdn-redfin.com/photo/{cdn_num}/bigphoto/{photo_id}/{photo_name}.webp"),
-                    ('jpg', f"https://ssl.cdn-redfin.com/photo/{cdn_num}/bigphoto/{photo_id}/{photo_name}.jpg"),
-                ]
-                
-                for ext, img_url in formats:
-                    try:
-                        filepath = os.path.join(property_folder, f"{idx:03d}_{photo_name}.{ext}")
-                        if os.path.exists(filepath):
-                            return True
-                        
-                        img_response = requests.get(img_url, headers=headers, timeout=10)
-                        if img_response.status_code == 200 and len(img_response.content) > 1000:
-                            with open(filepath, 'wb') as f:
-                                f.write(img_response.content)
-                            return True
-                    except:
-                        continue
-                return False
-
-            with ThreadPoolExecutor(max_workers=10) as executor:
-                futures = {executor.submit(download_task, item): item for item in enumerate(images, 1)}
-                completed = 0
-                
-                from concurrent.futures import as_completed
-                for future in as_completed(futures):
-                    if self.download_cancelled:
-                        # Cancel remaining futures
-                        for f in futures:
-                            f.cancel()
-                        break
-                    
-                    if future.result():
-                        downloaded += 1
-                    completed += 1
-                    self.root.after(0, lambda c=completed, t=total: self.progress_var.set(f"Downloading {c}/{t}..."))
-
-            if self.download_cancelled:
-                self.root.after(0, lambda: self.progress_var.set(f"Cancelled - Downloaded {downloaded}/{total}"))
-                return
-                
-            self.root.after(0, lambda: self.download_complete(address, downloaded))
-            
-        except Exception as e:
-            self.root.after(0, lambda: self.download_error(str(e)))
+            return profiling.ProfileSession(f"download {job.url}", profiling.library_folder(self.output_folder),
+                                            trace=True).start()
+        except RuntimeError as e:
+            print(f"Not profiling {job.url}: {e}")
+            return None
+    
+    def write_telemetry(self):
+        """Rewrite the Prometheus textfile in the library's .telemetry folder."""
+        self.telemetry_written = time.monotonic()
+        path = self.telemetry_paths[1]
+        threading.Thread(target=telemetry.recorder.write_prometheus, args=(path,), daemon=True).start()
     
-    def download_zillow_images(self, url):
-        """Download images from Zillow."""
+    def _apply_queue_update(self, job):
+        self.update_queue_row(job)
+        if job.status == download_queue.DONE:
+            self.session_listings += 1
+            self.session_images += job.downloaded
+            self.session_missing += max(0, job.total - job.downloaded)
+            prop = library_index.for_library(self.output_folder).property(job.address)
+            if prop:
+                self.update_property_row(prop)
+    
+    def on_queue_idle(self):
+        """Scheduler callback (worker thread) once nothing is left to run."""
+        self.root.after(0, self.download_complete)
+    
+    def run_queue_job(self, job):
+        """Download one queued listing from Redfin or Zillow (runs in a scheduler thread)."""
+        session = self.claim_listing_profile(job)
         try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Extract address from Zillow
-            address = "property"
-            title_tag = soup.find('title')
-            if title_tag:
-                title_text = title_tag.get_text()
-                if '|' in title_text:
-                    address = title_text.split('|')[0].strip()
-            
-            address = re.sub(r'[<>:"/\\|?*]', '', address)
-            address = address.replace(',', '').strip()
-            
-            property_folder = os.path.join(self.output_folder, address)
-            if not os.path.exists(property_folder):
-                os.makedirs(property_folder)
-            
-            # Extract Zillow property details
-            details = {
-                'address': address,
-                'url': url,
-                'price': 'N/A',
-                'beds': 'N/A',
-                'baths': 'N/A',
-                'sqft': 'N/A',
-                'description': 'No description available'
-            }
-            
-            try:
-                # Attempt to find Zillow's JSON data in script tags (much more reliable)
-                import json
-                script_tag = soup.find('script', id='__NEXT_DATA__')
-                if script_tag:
-                    data = json.loads(script_tag.string)
-                    try:
-                        # Navigate the complex Zillow JSON structure
-                        # CRITICAL: gdpClientCache is often a STRING of JSON, not a dict
-                        gdp_raw = data.get('props', {}).get('pageProps', {}).get('componentProps', {}).get('gdpClientCache', '{}')
-                        
-                        gdp_data = {}
-                        if isinstance(gdp_raw, str):
-                            gdp_data = json.loads(gdp_raw)
-                        else:
-                            gdp_data = gdp_raw
-                        
-                        # Find the key that contains property data (e.g., "ForSalePriorityQuery...")
-                        cache_key = next((k for k in gdp_data.keys() if 'PriorityQuery' in k), None)
-                        
-                        if cache_key:
-                            prop = gdp_data[cache_key].get('property', {})
-                            
-                            if details['price'] == 'N/A' and prop.get('price'):
-                                details['price'] = f"${prop.get('price', 0):,}"
-                            if details['beds'] == 'N/A' and prop.get('bedrooms'):
-                                details['beds'] = str(prop.get('bedrooms'))
-                            if details['baths'] == 'N/A' and prop.get('bathrooms'):
-                                details['baths'] = str(prop.get('bathrooms'))
-                            if details['sqft'] == 'N/A' and prop.get('livingArea'):
-                                details['sqft'] = f"{prop.get('livingArea', 0):,}"
-                            if details['description'] == 'No description available' and prop.get('description'):
-                                details['description'] = prop.get('description')
-                    except Exception as e:
-                        print(f"Zillow JSON parsing error: {e}")
-
-                # Fallback to HTML parsing if JSON failed or missed something
-                if details['price'] == 'N/A':
-                    price_tag = soup.find(['span', 'div'], {'data-testid': 'price'})
-                    if price_tag: details['price'] = price_tag.get_text(strip=True)
-                
-                # Improved HTML stats fallback (Zillow uses same test-id for all 3 stats)
-                if details['beds'] == 'N/A' or details['baths'] == 'N/A' or details['sqft'] == 'N/A':
-                    stat_containers = soup.find_all(['div', 'span'], {'data-testid': 'bed-bath-sqft-fact-container'})
-                    for container in stat_containers:
-                        text = container.get_text(separator=' ').lower()
-                        # Extract the first number found in this specific container
-                        num_match = re.search(r'([\d,]+)', text)
-                        if num_match:
-                            val = num_match.group(1)
-                            if 'bed' in text and details['beds'] == 'N/A': details['beds'] = val
-                            elif 'bath' in text and details['baths'] == 'N/A': details['baths'] = val
-                            elif 'sq' in text and details['sqft'] == 'N/A': details['sqft'] = val
-
-                # Final fallback for stats string like "3 bd 2 ba 1,752 sqft"
-                if details['beds'] == 'N/A' or details['sqft'] == 'N/A':
-                    stats_container = soup.find('div', {'data-testid': 'bed-bath-sqft-facts'}) or \
-                                      soup.find('p', class_='ds-bed-bath-living-area')
-                    if stats_container:
-                        stats_text = stats_container.get_text(separator=' ').lower()
-                        beds_match = re.search(r'(\d+)\s*(?:bd|bed)', stats_text)
-                        baths_match = re.search(r'(\d+)\s*(?:ba|bath)', stats_text)
-                        sqft_match = re.search(r'([\d,]+)\s*sqft', stats_text)
-                        if beds_match and details['beds'] == 'N/A': details['beds'] = beds_match.group(1)
-                        if baths_match and details['baths'] == 'N/A': details['baths'] = baths_match.group(1)
-                        if sqft_match and details['sqft'] == 'N/A': details['sqft'] = sqft_match.group(1)
-
-                if details['description'] == 'No description available':
-                    desc_tag = soup.find('p', {'data-testid': 'main-content'}) or \
-                               soup.find('div', {'data-testid': 'description'})
-                    if desc_tag: details['description'] = desc_tag.get_text(strip=True)
-
-            except Exception as e:
-                print(f"Error extracting Zillow property details: {e}")
-                
-            # Save details to JSON file
-            import json
-            details_file = os.path.join(property_folder, 'property_details.json')
-            with open(details_file, 'w') as f:
-                json.dump(details, f, indent=2)
-            
-            # Extract Zillow images
-            images = []
-            zillow_pattern = r'https://photos\.zillowstatic\.com/fp/([a-f0-9]+)-(?:cc_ft_\d+|uncropped_scaled_within_\d+_\d+)'
-            matches = re.findall(zillow_pattern, response.text)
-            
-            if matches:
-                seen = set()
-                for photo_id in matches:
-                    if photo_id not in seen:
-                        seen.add(photo_id)
-                        images.append(photo_id)
-            
-            if not images:
-                json_pattern = r'"hiResImageLink":"(https://photos\.zillowstatic\.com/fp/[^"]+)"'
-                json_matches = re.findall(json_pattern, response.text)
-                if json_matches:
-                    seen = set()
-                    for img_url in json_matches:
-                        photo_id_match = re.search(r'/fp/([a-f0-9]+)-', img_url)
-                        if photo_id_match:
-                            photo_id = photo_id_match.group(1)
-                            if photo_id not in seen:
-                                seen.add(photo_id)
-                                images.append(photo_id)
-            
-            if not images:
-                self.root.after(0, lambda: self.download_error("No images found on this Zillow page"))
-                return
-            
-            # Download images using ThreadPool
-            downloaded = 0
-            total = len(images)
-            
-            def download_zillow_task(item):
-                idx, photo_id = item
-                if self.download_cancelled:
-                    return False
-                
-                size_options = ['cc_ft_1536', 'cc_ft_1344', 'cc_ft_960', 'uncropped_scaled_within_1536_1024']
-                
-                for size in size_options:
-                    try:
-                        img_url = f"https://photos.zillowstatic.com/fp/{photo_id}-{size}.webp"
-                        filepath = os.path.join(property_folder, f"{idx:03d}_{photo_id}.webp")
-                        
-                        if os.path.exists(filepath):
-                            return True
-                        
-                        img_response = requests.get(img_url, headers=headers, timeout=10)
-                        if img_response.status_code == 200 and len(img_response.content) > 1000:
-                            with open(filepath, 'wb') as f:
-                                f.write(img_response.content)
-                            return True
-                        else:
-                            # Try JPG fallback
-                            img_url_jpg = img_url.replace('.webp', '.jpg')
-                            img_response = requests.get(img_url_jpg, headers=headers, timeout=10)
-                            if img_response.status_code == 200 and len(img_response.content) > 1000:
-                                filepath = filepath.replace('.webp', '.jpg')
-                                with open(filepath, 'wb') as f:
-                                    f.write(img_response.content)
-                                return True
-                    except:
-                        continue
-                return False
-
-            with ThreadPoolExecutor(max_workers=10) as executor:
-                futures = {executor.submit(download_zillow_task, item): item for item in enumerate(images, 1)}
-                completed = 0
-                
-                from concurrent.futures import as_completed
-                for future in as_completed(futures):
-                    if self.download_cancelled:
-                        # Cancel remaining futures
-                        for f in futures:
-                            f.cancel()
-                        break
-                    
-                    if future.result():
-                        downloaded += 1
-                    completed += 1
-                    self.root.after(0, lambda c=completed, t=total: self.progress_var.set(f"Downloading {c}/{t}..."))
-
-            if self.download_cancelled:
-                self.root.after(0, lambda: self.progress_var.set(f"Cancelled - Downloaded {downloaded}/{total}"))
-                return
-                
-            self.root.after(0, lambda: self.download_complete(address, downloaded))
-            
-        except Exception as e:
-            self.root.after(0, lambda: self.download_error(str(e)))
+            result = download_engine.download_listing(
+                job.url,
+                self.output_folder,
+                engine=self.active_engine,
+                is_cancelled=job.token,
+                on_progress=lambda c, t, ok: job.report_progress(c, t),
+                on_concurrency=self.progress.workers,
+                budget=job.budget,
+                on_image=self.on_image_done
+            )
+        finally:
+            if session:
+                paths = session.stop()
+                self.root.after(0, lambda: self.announce_profile(session.label, paths))
+        return result.address, result.downloaded
     
     def check_for_updates(self):
         """Check for updates from GitHub releases."""
@@ -1416,7 +1431,7 @@ class RedfinDownloaderGUI:
             try:
                 # GitHub API endpoint for latest release
                 api_url = "https://api.github.com/repos/BigTonyTones/Tonys-Redfin-Zillow-Image-Downloader/releases/latest"
-                response = requests.get(api_url, timeout=5)
+                response = http_transport.get(api_url, timeout=5)
                 
                 if response.status_code == 200:
                     release_data = response.json()
@@ -1468,7 +1483,7 @@ class RedfinDownloaderGUI:
                     return
                 
                 # Download update
-                response = requests.get(download_url, stream=True)
+                response = http_transport.get(download_url, stream=True, timeout=http_transport.PAGE_TIMEOUT)
                 response.raise_for_status()
                 
                 update_zip = "update_temp.zip"
@@ -1554,7 +1569,7 @@ class RedfinDownloaderGUI:
                 self.root.after(0, lambda: self.progress_var.set("Checking for updates..."))
                 
                 api_url = "https://api.github.com/repos/BigTonyTones/Tonys-Redfin-Zillow-Image-Downloader/releases/latest"
-                response = requests.get(api_url, timeout=10)
+                response = http_transport.get(api_url, timeout=http_transport.API_TIMEOUT)
                 
                 if response.status_code == 200:
                     release_data = response.json()
@@ -1576,29 +1591,36 @@ class RedfinDownloaderGUI:
         thread.daemon = True
         thread.start()
     
-    def download_complete(self, address, count):
-        """Handle successful download completion."""
-        self.progress_bar.stop()
-        self.progress_var.set("Ready")
+    def download_complete(self):
+        """Handle the download queue draining (or stopping)."""
+        if self.scheduler.running:
+            return
+        # Final redraw so the bar and queue rows show the finished counts
+        self.poll_progress()
+        if self.telemetry_paths:
+            self.write_telemetry()
+            telemetry.recorder.close()
+        with self.profile_lock:
+            # The queue ended before a listing claimed the profile
+            self.profile_next_listing = False
         self.download_btn.config(state=tk.NORMAL)
+        self.stop_btn.config(state=tk.DISABLED)
         
-        messagebox.showinfo("Success", f"Downloaded {count} images!\n\nSaved to: {address}")
-        
-        self.refresh_properties()
-        self.url_entry.delete(0, tk.END)
-        self.url_entry.insert(0, "Enter Redfin or Zillow URL...")
+        counts = self.download_queue.counts()
+        failed = counts.get(download_queue.FAILED, 0)
+        if self.session_listings or failed:
+            self.progress_var.set("Ready")
+            message = f"Downloaded {self.session_images} images from {self.session_listings} listing(s)!"
+            if self.session_missing:
+                message += (f"\n\n{self.session_missing} photo(s) could not be downloaded - select the property "
+                            f"and press Retry Failed to try them again.")
+            if failed:
+                message += f"\n\n{failed} listing(s) failed - see the download queue for details."
+            messagebox.showinfo("Success", message)
         
         # Update stats
         if hasattr(self, 'footer_stats_label'):
-            self.footer_stats_label.config(text=f"Last Download: {count} images | Version {self.version}")
-    
-    def download_error(self, error_msg):
-        """Handle download error."""
-        self.progress_bar.stop()
-        self.progress_var.set("Error occurred")
-        self.download_btn.config(state=tk.NORMAL)
-        
-        messagebox.showerror("Download Error", f"Failed to download images:\n{error_msg}")
+            self.footer_stats_label.config(text=f"Last Download: {self.session_images} images | Version {self.version}")
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,150 @@
+"""
+Retry policy for image fetches.
+
+Failures are classified as transient (timeouts, dropped connections, 408/429/
+5xx) or permanent (404 and other 4xx, placeholder-sized bodies). Transient
+failures are retried with jittered exponential backoff, drawing on a retry
+budget shared by the whole listing so a sick CDN can't turn one job into a
+retry storm. Images that still fail are written to a per-property
+failed_images.json that a later run can pick up.
+"""
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+import requests
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+TRANSIENT = 'transient'
+PERMANENT = 'permanent'
+
+TRANSIENT_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+TIMEOUT_EXCEPTIONS = (requests.Timeout, asyncio.TimeoutError, TimeoutError)
+CONNECTION_EXCEPTIONS = (requests.ConnectionError, requests.exceptions.ChunkedEncodingError, ConnectionError)
+if aiohttp is not None:
+    CONNECTION_EXCEPTIONS += (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)
+
+MAX_ATTEMPTS = 4
+BASE_DELAY = 0.5
+MAX_DELAY = 20.0
+# Retries allowed per listing: this many per image, but never fewer than MIN_RETRY_BUDGET
+RETRIES_PER_IMAGE = 1
+MIN_RETRY_BUDGET = 10
+
+RETRY_FILENAME = 'failed_images.json'
+
+
+def classify_status(status):
+    """Classify a non-successful HTTP status."""
+    return TRANSIENT if status in TRANSIENT_STATUSES else PERMANENT
+
+
+def classify_exception(exc):
+    """Return (kind, label) for an exception raised while fetching."""
+    if isinstance(exc, TIMEOUT_EXCEPTIONS):
+        return TRANSIENT, 'timeout'
+    if isinstance(exc, CONNECTION_EXCEPTIONS):
+        return TRANSIENT, 'connection'
+    return PERMANENT, f"{type(exc).__name__}: {exc}"
+
+
+class RetryBudget:
+    """Thread-safe count of retries a listing may still spend."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def take(self):
+        with self._lock:
+            if self.used >= self.limit:
+                return False
+            self.used += 1
+            return True
+
+
+class RetryPolicy:
+    """Decides whether and when to retry a failed attempt."""
+
+    def __init__(self, budget, max_attempts=MAX_ATTEMPTS, base_delay=BASE_DELAY, max_delay=MAX_DELAY):
+        self.budget = budget
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @classmethod
+    def for_jobs(cls, job_count):
+        return cls(RetryBudget(max(MIN_RETRY_BUDGET, job_count * RETRIES_PER_IMAGE)))
+
+    def should_retry(self, kind, attempt):
+        return kind == TRANSIENT and attempt < self.max_attempts and self.budget.take()
+
+    def delay(self, attempt):
+        """Full-jitter exponential backoff for the given (1-based) attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def sleep(self, attempt, is_cancelled=lambda: False):
+        """Back off before the next attempt. Returns False if cancelled meanwhile."""
+        deadline = time.monotonic() + self.delay(attempt)
+        while time.monotonic() < deadline:
+            if is_cancelled():
+                return False
+            time.sleep(min(0.05, max(0.0, deadline - time.monotonic())))
+        return True
+
+    async def sleep_async(self, attempt):
+        await asyncio.sleep(self.delay(attempt))
+
+
+# --- per-property retry list ---
+
+def retry_list_path(property_folder):
+    return os.path.join(property_folder, RETRY_FILENAME)
+
+
+def write_retry_list(property_folder, failed_jobs):
+    """Record images that could not be downloaded (or clear the list if none failed)."""
+    path = retry_list_path(property_folder)
+    if not failed_jobs:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    data = {
+        'updated': time.time(),
+        'failed': [job.to_dict() for job in failed_jobs],
+    }
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(temp_path, path)
+
+
+def load_retry_list(property_folder):
+    """Return the list of failed job dicts recorded for a property (empty if none)."""
+    path = retry_list_path(property_folder)
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, 'r') as f:
+            return json.load(f).get('failed', [])
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable retry list {path}: {e}", file=sys.stderr)
+        return []
+
+
+def folders_with_failures(library_folder):
+    """Property folders in a library that have a retry list."""
+    if not os.path.isdir(library_folder):
+        return []
+    return [os.path.join(library_folder, d) for d in sorted(os.listdir(library_folder))
+            if not d.startswith('.') and os.path.exists(retry_list_path(os.path.join(library_folder, d)))]
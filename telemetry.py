@@ -0,0 +1,423 @@
+"""
+Per-request telemetry for every fetch.
+
+Each HTTP request made through http_transport or the async engine fills in a
+RequestRecord: seconds spent resolving DNS, connecting, in the TLS handshake,
+waiting for the first byte and transferring the body, plus status, bytes,
+attempt number and the format/size variant it tried. The process-wide
+`recorder` aggregates records per host, finished photos per job, and time,
+bytes and errors per listing (keyed by the listing page URL). It can export
+them as JSON lines (one object per request, per photo and per finished
+listing) and as a Prometheus textfile for node_exporter's textfile collector.
+The textfile only carries per-host and whole-run totals; a listing's own
+rollup goes to the JSON lines when it finishes, and is then dropped.
+
+Connections that are reused from the pool report zero DNS/connect/TLS time.
+aiohttp does not report the TLS handshake separately, so on the async engine
+it is counted in `connect`.
+"""
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+PHASES = ('dns', 'connect', 'tls', 'ttfb', 'transfer')
+
+TELEMETRY_DIRNAME = '.telemetry'
+JSONL_FILENAME = 'requests.jsonl'
+PROM_FILENAME = 'redfin_downloader.prom'
+METRIC_PREFIX = 'redfin_downloader'
+
+# The JSON-lines file is rotated to <name>.1 once it grows past this
+MAX_JSONL_BYTES = 50 * 1024 * 1024
+
+# Seconds of history used for the recent error rate
+ERROR_WINDOW = 30.0
+# Seconds between Prometheus textfile rewrites during a download
+PROMETHEUS_INTERVAL = 5.0
+
+
+class RequestRecord:
+    """Timings and outcome of one HTTP request."""
+
+    def __init__(self, url, kind='request', listing=None, variant=None, attempt=1, listing_url=None):
+        self.url = url
+        self.host = urlparse(url).netloc.lower()
+        self.kind = kind
+        self.listing = listing
+        # The listing page this request belongs to; a page request is its own listing
+        self.listing_url = listing_url or (url if kind == 'page' else None)
+        self.variant = variant
+        self.attempt = attempt
+        self.begin()
+
+    def begin(self):
+        """(Re)start the clock; called once the request is actually about to go out."""
+        self.ts = time.time()
+        self.started = time.perf_counter()
+        self.dns = 0.0
+        self.connect = 0.0
+        self.tls = 0.0
+        self.reused = True
+        self.headers_at = None
+        self.finished_at = None
+        self.status = None
+        self.bytes = 0
+        self.error = None
+
+    def connection_opened(self, dns, connect, tls=0.0):
+        self.reused = False
+        self.dns = dns
+        self.connect = connect
+        self.tls = tls
+
+    def headers_received(self, status, elapsed=None):
+        """Record the status line; `elapsed` is the seconds from start to headers if known."""
+        self.status = status
+        now = time.perf_counter()
+        self.headers_at = min(now, self.started + elapsed) if elapsed is not None else now
+
+    def phases(self):
+        end = self.finished_at or time.perf_counter()
+        headers = self.headers_at or end
+        ttfb = max(0.0, headers - self.started - self.dns - self.connect - self.tls)
+        transfer = max(0.0, end - headers) if self.headers_at else 0.0
+        return {'dns': self.dns, 'connect': self.connect, 'tls': self.tls, 'ttfb': ttfb, 'transfer': transfer}
+
+    def to_dict(self):
+        data = {
+            'type': 'request',
+            'ts': round(self.ts, 3),
+            'kind': self.kind,
+            'host': self.host,
+            'url': self.url,
+            'status': self.status,
+            'bytes': self.bytes,
+            'reused': self.reused,
+            'attempt': self.attempt,
+        }
+        data.update({k: round(v, 4) for k, v in self.phases().items()})
+        data['total'] = round((self.finished_at or time.perf_counter()) - self.started, 4)
+        if self.listing:
+            data['listing'] = self.listing
+        if self.variant:
+            data['variant'] = self.variant
+        if self.error:
+            data['error'] = self.error
+        return data
+
+
+class HostStats:
+    """Counters for one host."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.retries = 0
+        self.new_connections = 0
+        self.bytes = 0
+        self.statuses = {}
+        self.phase_seconds = {phase: 0.0 for phase in PHASES}
+
+    def add(self, record):
+        self.requests += 1
+        if record.error or (record.status or 0) >= 400:
+            self.errors += 1
+        if record.status in (429, 503):
+            self.throttled += 1
+        if record.attempt > 1:
+            self.retries += 1
+        if not record.reused:
+            self.new_connections += 1
+        self.bytes += record.bytes
+        status = str(record.status) if record.status is not None else 'error'
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        for phase, seconds in record.phases().items():
+            self.phase_seconds[phase] += seconds
+
+    def to_dict(self):
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'throttled': self.throttled,
+            'retries': self.retries,
+            'new_connections': self.new_connections,
+            'bytes': self.bytes,
+            'statuses': dict(self.statuses),
+            'avg_seconds': {p: s / self.requests for p, s in self.phase_seconds.items()} if self.requests else {},
+        }
+
+
+class ListingStats:
+    """Counters for one listing (a download job), from its page fetch to its last photo."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.bytes = 0
+        self.images = {'ok': 0, 'failed': 0}
+        self.first = None
+        self.last = None
+
+    def _active(self, started, finished):
+        self.first = started if self.first is None else min(self.first, started)
+        self.last = finished if self.last is None else max(self.last, finished)
+
+    def add(self, record, finished):
+        self.requests += 1
+        if record.error or (record.status or 0) >= 400:
+            self.errors += 1
+        self.bytes += record.bytes
+        self._active(record.ts, finished)
+
+    def add_image(self, ok, finished):
+        self.images['ok' if ok else 'failed'] += 1
+        self._active(finished, finished)
+
+    @property
+    def seconds(self):
+        return self.last - self.first if self.first is not None else 0.0
+
+    def to_dict(self):
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'bytes': self.bytes,
+            'images_ok': self.images['ok'],
+            'images_failed': self.images['failed'],
+            'seconds': round(self.seconds, 3),
+        }
+
+
+_local = threading.local()
+
+
+def current():
+    """The RequestRecord being sent on this thread, or None."""
+    return getattr(_local, 'record', None)
+
+
+@contextlib.contextmanager
+def active(record):
+    """Make `record` the current one on this thread, so new connections report their timings to it."""
+    previous = current()
+    _local.record = record
+    try:
+        yield record
+    finally:
+        _local.record = previous
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Recorder:
+    """Thread-safe aggregation and export of request and photo telemetry."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Serializes textfile rewrites, which run on background threads
+        self._prometheus_lock = threading.Lock()
+        self._jsonl = None
+        self._jsonl_path = None
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._hosts = {}
+            self._listings = {}
+            self._listings_done = {'ok': 0, 'failed': 0}
+            self._listing_seconds = 0.0
+            self._images = {'ok': 0, 'failed': 0}
+            self._variants = {}
+            self._recent = deque()
+
+    # --- export targets ---
+
+    def export_jsonl(self, path):
+        """Append every finished request and photo to `path` as JSON lines (None stops)."""
+        with self._lock:
+            if self._jsonl is not None:
+                self._jsonl.close()
+                self._jsonl = None
+            self._jsonl_path = path
+            if path:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                self._jsonl = open(path, 'a', buffering=1)
+
+    def _write(self, data):
+        # Called with the lock held
+        if self._jsonl is None:
+            return
+        try:
+            self._jsonl.write(json.dumps(data) + '\n')
+            if self._jsonl.tell() > MAX_JSONL_BYTES:
+                self._jsonl.close()
+                os.replace(self._jsonl_path, self._jsonl_path + '.1')
+                self._jsonl = open(self._jsonl_path, 'a', buffering=1)
+        except (OSError, ValueError) as e:
+            print(f"Telemetry export stopped: {e}", file=sys.stderr)
+            self._jsonl = None
+
+    def close(self):
+        self.export_jsonl(None)
+
+    # --- called from the engines ---
+
+    def finish(self, record, error=None):
+        """Close a request record, aggregate it and export it."""
+        record.finished_at = time.perf_counter()
+        if error:
+            record.error = str(error)
+        failed = bool(record.error) or (record.status or 0) >= 400
+        with self._lock:
+            stats = self._hosts.get(record.host)
+            if stats is None:
+                stats = self._hosts[record.host] = HostStats()
+            stats.add(record)
+            if record.listing_url:
+                self._listing(record.listing_url).add(record, time.time())
+            self._recent.append((time.monotonic(), failed))
+            self._write(record.to_dict())
+
+    def job_done(self, job, ok):
+        """Aggregate and export one finished photo (an ImageJob)."""
+        with self._lock:
+            self._images['ok' if ok else 'failed'] += 1
+            if job.listing_url:
+                self._listing(job.listing_url).add_image(ok, time.time())
+            if ok and job.variant:
+                self._variants[job.variant] = self._variants.get(job.variant, 0) + 1
+            data = {
+                'type': 'job',
+                'ts': round(time.time(), 3),
+                'listing': job.listing,
+                'index': job.index,
+                'ok': ok,
+                'requests': job.requests,
+                'variant': job.variant,
+                'bytes': job.bytes,
+                'elapsed': round(job.elapsed, 4),
+            }
+            if job.failure and not ok:
+                data['failure'] = job.failure
+            self._write(data)
+
+    def _listing(self, url):
+        # Called with the lock held
+        stats = self._listings.get(url)
+        if stats is None:
+            stats = self._listings[url] = ListingStats()
+        return stats
+
+    def listing_done(self, url, address=None):
+        """
+        Export and forget the rollup of a listing whose download (or retry) has
+        finished; it counts as failed if any photo failed or none arrived.
+        Returns the rollup as a dict.
+        """
+        with self._lock:
+            stats = self._listings.pop(url, None) or ListingStats()
+            rollup = stats.to_dict()
+            failed = rollup['images_failed'] > 0 or rollup['images_ok'] == 0
+            self._listings_done['failed' if failed else 'ok'] += 1
+            self._listing_seconds += stats.seconds
+            data = {'type': 'listing', 'ts': round(time.time(), 3), 'url': url}
+            if address:
+                data['listing'] = address
+            data.update(rollup)
+            self._write(data)
+        return rollup
+
+    # --- reporting ---
+
+    def hosts(self):
+        """Per-host counters as plain dicts."""
+        with self._lock:
+            return {host: stats.to_dict() for host, stats in self._hosts.items()}
+
+    def listings(self):
+        """Counters of the listings still in progress, keyed by listing URL."""
+        with self._lock:
+            return {url: stats.to_dict() for url, stats in self._listings.items()}
+
+    def error_rate(self, window=ERROR_WINDOW):
+        """Fraction of requests that failed over the last `window` seconds."""
+        cutoff = time.monotonic() - window
+        with self._lock:
+            while self._recent and self._recent[0][0] < cutoff:
+                self._recent.popleft()
+            if not self._recent:
+                return 0.0
+            return sum(1 for _, failed in self._recent if failed) / len(self._recent)
+
+    def prometheus_text(self):
+        """Counters in the Prometheus text exposition format."""
+        with self._lock:
+            hosts = {host: stats for host, stats in sorted(self._hosts.items())}
+            listings_done = dict(self._listings_done)
+            listing_seconds = self._listing_seconds
+            images = dict(self._images)
+            variants = dict(sorted(self._variants.items()))
+        p = METRIC_PREFIX
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {p}_{name} {help_text}")
+            lines.append(f"# TYPE {p}_{name} {kind}")
+            for labels, value in samples:
+                label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                lines.append(f"{p}_{name}{{{label_text}}} {value}" if label_text else f"{p}_{name} {value}")
+
+        metric('requests_total', 'counter', "HTTP requests by host and status.",
+               [({'host': h, 'status': status}, n) for h, s in hosts.items() for status, n in sorted(s.statuses.items())])
+        metric('request_errors_total', 'counter', "Requests that failed or returned 4xx/5xx.",
+               [({'host': h}, s.errors) for h, s in hosts.items()])
+        metric('throttled_total', 'counter', "429/503 responses.",
+               [({'host': h}, s.throttled) for h, s in hosts.items()])
+        metric('retries_total', 'counter', "Requests that were retries of an earlier attempt.",
+               [({'host': h}, s.retries) for h, s in hosts.items()])
+        metric('connections_opened_total', 'counter', "New TCP connections (the rest reused the pool).",
+               [({'host': h}, s.new_connections) for h, s in hosts.items()])
+        metric('response_bytes_total', 'counter', "Body bytes received.",
+               [({'host': h}, s.bytes) for h, s in hosts.items()])
+        metric('phase_seconds_total', 'counter', "Seconds spent per request phase (dns, connect, tls, ttfb, transfer).",
+               [({'host': h, 'phase': phase}, f"{s.phase_seconds[phase]:.6f}") for h, s in hosts.items()
+                for phase in PHASES])
+        metric('images_total', 'counter', "Photos finished, by result.",
+               [({'result': result}, n) for result, n in sorted(images.items())])
+        metric('image_variant_total', 'counter', "Photos downloaded, by the format/size variant that worked.",
+               [({'variant': v}, n) for v, n in variants.items()])
+        metric('listings_total', 'counter', "Listings finished, by result (failed if any photo failed).",
+               [({'result': result}, n) for result, n in sorted(listings_done.items())])
+        metric('listing_seconds_total', 'counter', "Seconds from first request to last photo, summed over listings.",
+               [({}, f"{listing_seconds:.3f}")])
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        """Atomically (re)write a Prometheus textfile (safe to call from several threads)."""
+        with self._prometheus_lock:
+            text = self.prometheus_text()
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                with open(temp_path, 'w') as f:
+                    f.write(text)
+                os.replace(temp_path, path)
+            except OSError as e:
+                print(f"Could not write Prometheus textfile {path}: {e}", file=sys.stderr)
+
+
+recorder = Recorder()
+
+
+def library_paths(library_folder):
+    """(JSON-lines path, Prometheus textfile path) inside a download library."""
+    folder = os.path.join(library_folder, TELEMETRY_DIRNAME)
+    return os.path.join(folder, JSONL_FILENAME), os.path.join(folder, PROM_FILENAME)
@@ -0,0 +1,47 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import download_engine
+import redfin_downloader
+from conftest import FIXTURES
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(FIXTURES), 'cdn_server.py')
+
+
+@pytest.fixture
+def missing_photos_server():
+    """A stand-in server that answers every photo request with 404."""
+    process = subprocess.Popen([sys.executable, SERVER_SCRIPT, '--port', '0', '--photos', '2',
+                                '--latency', '0', '--jitter', '0', '--not-found', '1.0'],
+                               stdout=subprocess.PIPE, text=True)
+    try:
+        yield json.loads(process.stdout.readline())
+    finally:
+        process.kill()
+        process.wait()
+
+
+def test_listing_without_photos_fails_the_batch(missing_photos_server, tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(download_engine, 'REDFIN_CDN', f"{missing_photos_server['cdn']}/photo")
+    url = f"{missing_photos_server['pages']}/redfin.com/CA/Testville/1-Benchmark-Way-90000/home/1"
+    monkeypatch.setattr(sys, 'argv', ['redfin_downloader.py', '--jsonl', '-o', str(tmp_path), url])
+
+    assert redfin_downloader.main() == 1
+
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    summary = records[-1]
+    assert summary['event'] == 'summary'
+    assert (summary['succeeded'], summary['failed'], summary['images_failed']) == (0, 1, 2)
+
+
+def test_profile_rejects_several_listings(tmp_path, monkeypatch, capsys):
+    urls = [f'https://www.redfin.com/CA/Testville/{n}-Test-Way-90000/home/{n}' for n in (1, 2)]
+    monkeypatch.setattr(sys, 'argv', ['redfin_downloader.py', '--profile', '-o', str(tmp_path)] + urls)
+
+    assert redfin_downloader.main() == 2
+    assert '--profile takes a single listing' in capsys.readouterr().err
+    assert not os.listdir(tmp_path)
@@ -0,0 +1,64 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import async_engine
+import cancellation
+import download_engine
+from conftest import FIXTURES
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(FIXTURES), 'cdn_server.py')
+
+# The request's guarantee: a cancelled download stops within this many seconds
+CANCEL_DEADLINE = 0.2
+# Photos take ~10 s each at this bandwidth, so the cancel always lands mid-transfer
+BANDWIDTH_KBS = 50
+IMAGE_KB = 500
+CANCEL_AFTER = 1.5
+
+
+@pytest.fixture(scope='module')
+def slow_server():
+    process = subprocess.Popen([sys.executable, SERVER_SCRIPT, '--port', '0', '--photos', '8',
+                                '--image-kb', str(IMAGE_KB), '--bandwidth', str(BANDWIDTH_KBS),
+                                '--latency', '5', '--jitter', '0'],
+                               stdout=subprocess.PIPE, text=True)
+    try:
+        yield json.loads(process.stdout.readline())
+    finally:
+        process.kill()
+        process.wait()
+
+
+@pytest.mark.parametrize('engine', ['threads', 'async'])
+def test_cancel_mid_transfer_stops_within_deadline(engine, slow_server, tmp_path, monkeypatch):
+    if engine == 'async' and not async_engine.AVAILABLE:
+        pytest.skip("aiohttp is not installed")
+    monkeypatch.setattr(download_engine, 'REDFIN_CDN', f"{slow_server['cdn']}/photo")
+    monkeypatch.setattr(download_engine, 'ZILLOW_CDN', f"{slow_server['cdn']}/fp")
+    url = f"{slow_server['pages']}/redfin.com/CA/Testville/1-Cancel-Way-90000/home/1"
+    token = cancellation.CancelToken()
+    images = []
+    cancelled_at = []
+
+    def cancel_later():
+        time.sleep(CANCEL_AFTER)
+        cancelled_at.append(time.perf_counter())
+        token.cancel()
+
+    threading.Thread(target=cancel_later, daemon=True).start()
+    try:
+        download_engine.download_listing(url, str(tmp_path), engine=engine, is_cancelled=token,
+                                         on_image=lambda job, ok: images.append(ok))
+    except Exception:
+        pass  # a cancelled download may end with an error; only the timing matters here
+    finished = time.perf_counter()
+
+    assert cancelled_at, "the download finished before it could be cancelled"
+    assert not any(images), "a photo completed, so the cancel did not land mid-transfer"
+    assert finished - cancelled_at[0] < CANCEL_DEADLINE
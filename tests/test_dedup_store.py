@@ -0,0 +1,44 @@
+import os
+
+import dedup_store
+
+
+def _write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def test_adopt_links_duplicates_and_prune_frees_deleted(tmp_path):
+    store = dedup_store.DedupStore(str(tmp_path))
+    assert store.enabled
+    for name in ('a', 'b'):
+        os.makedirs(tmp_path / name)
+        _write(tmp_path / name / 'part', b'photo')
+    assert store.adopt(str(tmp_path / 'a' / 'part'), str(tmp_path / 'a' / '1.jpg'), 'ab' * 32) is False
+    assert store.adopt(str(tmp_path / 'b' / 'part'), str(tmp_path / 'b' / '1.jpg'), 'ab' * 32) is True
+    assert os.stat(tmp_path / 'a' / '1.jpg').st_nlink == 3
+
+    os.remove(tmp_path / 'a' / '1.jpg')
+    assert store.prune() == (0, 0)
+    os.remove(tmp_path / 'b' / '1.jpg')
+    assert store.prune() == (1, 5)
+
+
+def test_without_hardlinks_images_stay_single_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(dedup_store, 'links_supported', lambda folder: False)
+    store = dedup_store.DedupStore(str(tmp_path))
+    _write(tmp_path / 'part', b'photo')
+    assert store.adopt(str(tmp_path / 'part'), str(tmp_path / '1.jpg'), 'cd' * 32) is False
+    assert (tmp_path / '1.jpg').read_bytes() == b'photo'
+    assert list(store.iter_blobs()) == []
+    assert store.prune() == (0, 0)
+
+
+def test_failed_link_leaves_one_file(tmp_path, monkeypatch):
+    store = dedup_store.DedupStore(str(tmp_path))
+    assert store.enabled
+    monkeypatch.setattr(dedup_store, 'hardlink', lambda src, dst: False)
+    _write(tmp_path / 'part', b'photo')
+    store.adopt(str(tmp_path / 'part'), str(tmp_path / '1.jpg'), 'ef' * 32)
+    assert (tmp_path / '1.jpg').read_bytes() == b'photo'
+    assert list(store.iter_blobs()) == []
@@ -0,0 +1,34 @@
+import pytest
+
+import extractors
+from conftest import fixture_html
+
+URL = 'https://www.zillow.com/homedetails/742-Evergreen-Ter/20531234_zpid/'
+
+
+def test_zillow_numeric_price_is_formatted():
+    details = extractors.extract_zillow(fixture_html('zillow_next_data.html'), URL).details
+    assert details['price'] == '$875,000'
+    assert details['sqft'] == '2,210'
+
+
+@pytest.mark.parametrize('extract', [extractors.extract_zillow, extractors.extract_zillow_soup])
+def test_zillow_non_numeric_price_is_kept(extract):
+    html = fixture_html('zillow_next_data.html').replace('\\"price\\": 875000', '\\"price\\": \\"Contact agent\\"')
+    listing = extract(html, URL)
+    assert listing.details['price'] == 'Contact agent'
+    assert listing.details['sqft'] == '2,210'
+    assert listing.images
+
+
+@pytest.mark.parametrize('extract', [extractors.extract_zillow, extractors.extract_zillow_soup])
+def test_zillow_zero_bedrooms_is_kept(extract):
+    html = fixture_html('zillow_next_data.html').replace('\\"bedrooms\\": 4', '\\"bedrooms\\": 0')
+    assert extract(html, URL).details['beds'] == '0'
+
+
+@pytest.mark.parametrize('extract', [extractors.extract_zillow, extractors.extract_zillow_soup])
+def test_zillow_json_fields_are_not_mixed_with_html(extract):
+    details = extract(fixture_html('zillow_partial_json.html'), URL).details
+    assert details['price'] == '$429,900'
+    assert details['sqft'] == 'N/A'
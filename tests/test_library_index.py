@@ -0,0 +1,21 @@
+import os
+
+import library_index
+import library_watcher
+
+
+def test_uppercase_extensions_are_indexed_and_watched(tmp_path):
+    folder = tmp_path / '1 Test Way'
+    folder.mkdir()
+    for name in ('001_a.JPG', '002_b.WebP', '003_c.jpg', 'notes.txt', '.hidden.jpg'):
+        (folder / name).write_bytes(b'x')
+
+    index = library_index.LibraryIndex(str(tmp_path))
+    index.reconcile()
+    assert index.property('1 Test Way').image_count == 3
+    assert [os.path.basename(p) for p in index.images('1 Test Way')] == ['001_a.JPG', '002_b.WebP', '003_c.jpg']
+    index.close()
+
+    watcher = library_watcher.LibraryWatcher(str(tmp_path), lambda updated, removed: None)
+    assert watcher.property_for(str(folder / '004_d.PNG'), False) == '1 Test Way'
+    assert watcher.property_for(str(folder / 'notes.txt'), False) is None
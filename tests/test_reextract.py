@@ -0,0 +1,46 @@
+import json
+import os
+
+import download_engine
+import extractors
+import library_index
+import page_cache
+from conftest import fixture_html
+
+URL = 'https://www.redfin.com/OR/Portland/88-Maple-Ave-97201/home/1'
+
+
+def test_reextract_updates_details_and_index(tmp_path):
+    library = str(tmp_path)
+    html = fixture_html('redfin_test_ids.html')
+    address = extractors.extract_listing(html, URL).address
+    folder = os.path.join(library, address)
+    os.makedirs(folder)
+    extractors.save_details(folder, {'address': address, 'url': URL, 'price': 'N/A'})
+    page_cache.for_library(library).store(URL, html)
+
+    assert download_engine.reextract_library(library) == (1, 0)
+
+    with open(os.path.join(folder, extractors.DETAILS_FILENAME)) as f:
+        assert json.load(f)['price'] == '$649,900'
+    row = library_index.for_library(library).property(address)
+    assert row is not None
+    assert row.price == '$649,900'
+    assert row.price_cents == 64990000
+
+
+def test_reextract_writes_page_cache_index_once(tmp_path, monkeypatch):
+    library = str(tmp_path)
+    html = fixture_html('redfin_test_ids.html')
+    cache = page_cache.for_library(library)
+    for n in range(5):
+        url = f'{URL[:-1]}{n}'
+        folder = os.path.join(library, f'Property {n}')
+        os.makedirs(folder)
+        extractors.save_details(folder, {'address': f'Property {n}', 'url': url})
+        cache.store(url, html)
+
+    saves = []
+    monkeypatch.setattr(cache, '_save', lambda: saves.append(1))
+    assert download_engine.reextract_library(library) == (5, 0)
+    assert len(saves) == 1
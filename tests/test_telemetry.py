@@ -0,0 +1,67 @@
+import json
+import threading
+
+import telemetry
+
+LISTING = 'https://www.redfin.com/CA/Testville/1-Test-Way-90000/home/1'
+
+
+class _Job:
+    listing = '1 Test Way'
+    listing_url = LISTING
+    index = 1
+    requests = 1
+    variant = 'webp'
+    bytes = 1000
+    elapsed = 0.1
+    failure = None
+
+
+def _finish(recorder, url, status, size, **kwargs):
+    record = telemetry.RequestRecord(url, **kwargs)
+    record.headers_received(status)
+    record.bytes = size
+    recorder.finish(record)
+
+
+def test_listing_rollup_is_exported(tmp_path):
+    recorder = telemetry.Recorder()
+    path = tmp_path / 'requests.jsonl'
+    recorder.export_jsonl(str(path))
+    _finish(recorder, LISTING, 200, 5000, kind='page')
+    _finish(recorder, 'https://cdn.example/1.webp', 200, 1000, kind='image', listing_url=LISTING)
+    _finish(recorder, 'https://cdn.example/2.webp', 404, 0, kind='image', listing_url=LISTING)
+    recorder.job_done(_Job(), True)
+    recorder.job_done(_Job(), False)
+    rollup = recorder.listing_done(LISTING, '1 Test Way')
+    recorder.close()
+
+    assert recorder.listings() == {}
+    assert (rollup['requests'], rollup['errors'], rollup['bytes']) == (3, 1, 6000)
+    assert (rollup['images_ok'], rollup['images_failed']) == (1, 1)
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    listing = [line for line in lines if line['type'] == 'listing']
+    assert len(listing) == 1
+    assert listing[0]['url'] == LISTING and listing[0]['listing'] == '1 Test Way'
+    assert listing[0]['errors'] == 1
+
+    text = recorder.prometheus_text()
+    assert LISTING not in text
+    assert 'redfin_downloader_listings_total{result="failed"} 1' in text
+    assert 'redfin_downloader_listings_total{result="ok"} 0' in text
+
+
+def test_concurrent_prometheus_writes_leave_a_complete_file(tmp_path):
+    recorder = telemetry.Recorder()
+    for n in range(200):
+        _finish(recorder, f'https://host{n}.example/', 200, 10)
+    path = str(tmp_path / 'metrics.prom')
+    threads = [threading.Thread(target=recorder.write_prometheus, args=(path,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with open(path) as f:
+        assert f.read() == recorder.prometheus_text()
+    assert [p.name for p in tmp_path.iterdir()] == ['metrics.prom']
@@ -0,0 +1,304 @@
+"""
+A ttk.Treeview that only holds a window of a long list.
+
+The explorer can list tens of thousands of properties. A Treeview with an
+item (plus a "Photos" child) for each of them is slow to fill and holds a lot
+of memory. VirtualTree keeps the full ordered list of keys in Python and
+inserts at most MAX_PAGES pages of PAGE_SIZE rows into the Treeview.
+Scrolling near either end of the window inserts the next page and drops the
+page at the far end. An optional scrollbar, driven by this class, shows the
+position in the whole list, and dragging it jumps straight to any page.
+
+Rows go in with placeholder text. A background thread then fills them in
+through `load_rows(keys)`, a page at a time, and loaded rows are cached so
+scrolling back costs nothing.
+"""
+import queue
+import threading
+
+# Rows inserted at a time, and the most pages kept in the Treeview at once
+PAGE_SIZE = 100
+MAX_PAGES = 3
+# Fraction of the window from either end at which the next page is inserted
+EDGE = 0.2
+
+
+class VirtualTree:
+    """
+    Windowed view of `keys` in a ttk.Treeview.
+
+    `scrollbar` may be None. load_rows(keys) -> {key: row} runs on a worker
+    thread; render(key, row) -> (text, values, child_text) builds a row's
+    cells on the main thread, with row None while it is still loading.
+    """
+
+    def __init__(self, tree, scrollbar, load_rows, render):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.load_rows = load_rows
+        self.render = render
+        self.keys = []
+        self.rows = {}
+        self.items = {}
+        self.open_keys = set()
+        self.selected = None
+        self.start = 0
+        self.end = 0
+        self._keys_by_item = {}
+        self._generation = 0
+        self._paging = False
+        self._requests = queue.Queue()
+        self._requested = set()
+        self._worker = None
+
+        tree.configure(yscrollcommand=self._on_tree_scroll)
+        if scrollbar is not None:
+            scrollbar.configure(command=self._on_scrollbar)
+        tree.bind('<<TreeviewSelect>>', self._on_select, add='+')
+        tree.bind('<<TreeviewOpen>>', lambda e: self._on_open(True), add='+')
+        tree.bind('<<TreeviewClose>>', lambda e: self._on_open(False), add='+')
+
+    # --- the model ---
+
+    def set_keys(self, keys, clear_rows=False):
+        """Show a new ordered list of keys, scrolled to the top."""
+        self._generation += 1
+        self._requested.clear()
+        if clear_rows:
+            self.rows.clear()
+        self.keys = list(keys)
+        self._clear_window()
+        self._show(0, min(len(self.keys), PAGE_SIZE * 2))
+        self.tree.yview_moveto(0)
+
+    def key_for(self, item):
+        """The key of a row or of its "Photos" child."""
+        parent = self.tree.parent(item)
+        return self._keys_by_item.get(parent or item)
+
+    def refresh(self, key, row):
+        """Store a freshly loaded row for `key` and redraw it if it is in the window."""
+        self.rows[key] = row
+        item = self.items.get(key)
+        if item is not None:
+            self._draw(key, item)
+
+    def insert(self, key, position, row=None):
+        """Add `key` to the list at `position`."""
+        if row is not None:
+            self.rows[key] = row
+        self.keys.insert(position, key)
+        if position < self.start:
+            self.start += 1
+            self.end += 1
+        elif position <= self.end and (position < self.end or self.end - self.start < PAGE_SIZE * MAX_PAGES):
+            self._insert_item(key, position - self.start)
+            self.end += 1
+        self._update_scrollbar()
+
+    def remove(self, key):
+        """Drop `key` from the list."""
+        try:
+            position = self.keys.index(key)
+        except ValueError:
+            return
+        del self.keys[position]
+        self.rows.pop(key, None)
+        self.open_keys.discard(key)
+        if position < self.start:
+            self.start -= 1
+            self.end -= 1
+        elif position < self.end:
+            self._delete_item(key)
+            self.end -= 1
+        if self.selected == key:
+            self.selected = None
+        self._update_scrollbar()
+
+    # --- Treeview items ---
+
+    def _draw(self, key, item):
+        text, values, child_text = self.render(key, self.rows.get(key))
+        self.tree.item(item, text=text, values=values)
+        for child in self.tree.get_children(item):
+            self.tree.item(child, text=child_text, values=values)
+
+    def _insert_item(self, key, index):
+        text, values, child_text = self.render(key, self.rows.get(key))
+        item = self.tree.insert('', index, text=text, values=values, open=key in self.open_keys)
+        self.tree.insert(item, 'end', text=child_text, values=values, tags=('subnode',))
+        self.items[key] = item
+        self._keys_by_item[item] = key
+        if key == self.selected:
+            self.tree.selection_set(item)
+        if key not in self.rows:
+            self._request(key)
+
+    def _delete_item(self, key):
+        item = self.items.pop(key, None)
+        if item is not None:
+            self._keys_by_item.pop(item, None)
+            self.tree.delete(item)
+
+    def _clear_window(self):
+        self.tree.delete(*self.tree.get_children())
+        self.items.clear()
+        self._keys_by_item.clear()
+        self.start = self.end = 0
+
+    def _show(self, start, end):
+        """Make keys[start:end] the window, reusing the items already inserted."""
+        for key in self.keys[self.start:min(start, self.end)] + self.keys[max(end, self.start):self.end]:
+            self._delete_item(key)
+        if start >= self.end or end <= self.start:
+            self._clear_window()
+            for offset, key in enumerate(self.keys[start:end]):
+                self._insert_item(key, offset)
+        else:
+            for offset, key in enumerate(self.keys[start:self.start]):
+                self._insert_item(key, offset)
+            kept = min(self.end, end) - start
+            for offset, key in enumerate(self.keys[max(self.end, start):end]):
+                self._insert_item(key, kept + offset)
+        self.start, self.end = start, end
+        self._update_scrollbar()
+
+    def _displayed_rows(self, start, end):
+        """Rows the Treeview draws for keys[start:end] (open properties show their child)."""
+        return sum(2 if key in self.open_keys else 1 for key in self.keys[start:end])
+
+    # --- scrolling ---
+
+    def _update_scrollbar(self, first=None, last=None):
+        if self.scrollbar is None:
+            return
+        if first is None:
+            first, last = (float(f) for f in self.tree.yview())
+        total = len(self.keys)
+        if not total:
+            self.scrollbar.set(0, 1)
+            return
+        window = self.end - self.start
+        self.scrollbar.set((self.start + first * window) / total, (self.start + last * window) / total)
+
+    def _on_tree_scroll(self, first, last):
+        first, last = float(first), float(last)
+        self._update_scrollbar(first, last)
+        if self._paging:
+            return
+        near_end = last > 1 - EDGE and self.end < len(self.keys)
+        near_start = first < EDGE and self.start > 0
+        if near_end or near_start:
+            self._paging = True
+            self.tree.after_idle(self._page, near_end)
+
+    def _page(self, forward):
+        """Slide the window one page, keeping the row at the top of the view in place."""
+        try:
+            first = float(self.tree.yview()[0])
+            top = self._key_at(first)
+            if forward:
+                end = min(len(self.keys), self.end + PAGE_SIZE)
+                start = max(self.start, end - PAGE_SIZE * MAX_PAGES)
+            else:
+                start = max(0, self.start - PAGE_SIZE)
+                end = min(self.end, start + PAGE_SIZE * MAX_PAGES)
+            self._show(start, end)
+            self._scroll_to_key(top)
+        finally:
+            self._paging = False
+
+    def _key_at(self, fraction):
+        """The key of the row at `fraction` of the window's height."""
+        # The view's top sits on a row boundary; the half row absorbs float error
+        target = fraction * self._displayed_rows(self.start, self.end) + 0.5
+        rows = 0
+        for key in self.keys[self.start:self.end]:
+            rows += 2 if key in self.open_keys else 1
+            if rows > target:
+                return key
+        return self.keys[self.end - 1] if self.end else None
+
+    def _scroll_to_key(self, key):
+        if key is None or key not in self.items:
+            return
+        before = self._displayed_rows(self.start, self.keys.index(key, self.start, self.end))
+        self.tree.yview_moveto(before / max(1, self._displayed_rows(self.start, self.end)))
+
+    def _on_scrollbar(self, action, *args):
+        if action == 'moveto':
+            self.scroll_to(int(float(args[0]) * len(self.keys)))
+        else:
+            self.tree.yview(action, *args)
+
+    def scroll_to(self, position):
+        """Bring keys[position] to the top of the view, loading its page if needed."""
+        if not self.keys:
+            return
+        position = max(0, min(position, len(self.keys) - 1))
+        if not self.start <= position < self.end:
+            start = max(0, min(position - PAGE_SIZE, len(self.keys) - PAGE_SIZE * 2))
+            self._show(start, min(len(self.keys), start + PAGE_SIZE * 2))
+        self._scroll_to_key(self.keys[position])
+
+    def see(self, key):
+        """Scroll `key` into view and select it."""
+        if key not in self.keys:
+            return
+        self.selected = key
+        self.scroll_to(self.keys.index(key))
+        item = self.items.get(key)
+        if item is not None:
+            self.tree.selection_set(item)
+
+    # --- events ---
+
+    def _on_select(self, event):
+        selection = self.tree.selection()
+        # Dropping a page deselects its rows; that isn't the user picking nothing
+        if selection:
+            self.selected = self.key_for(selection[0])
+
+    def _on_open(self, is_open):
+        key = self.key_for(self.tree.focus())
+        if key is not None:
+            if is_open:
+                self.open_keys.add(key)
+            else:
+                self.open_keys.discard(key)
+
+    # --- background loading ---
+
+    def _request(self, key):
+        if key in self._requested:
+            return
+        self._requested.add(key)
+        self._requests.put((self._generation, key))
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._load_loop, daemon=True)
+            self._worker.start()
+
+    def _load_loop(self):
+        while True:
+            batch = [self._requests.get()]
+            while len(batch) < PAGE_SIZE:
+                try:
+                    batch.append(self._requests.get_nowait())
+                except queue.Empty:
+                    break
+            generation = batch[-1][0]
+            keys = [key for gen, key in batch if gen == generation]
+            try:
+                rows = self.load_rows(keys)
+            except Exception as e:
+                print(f"Could not load explorer rows: {e}")
+                rows = {}
+            self.tree.after(0, self._loaded, generation, keys, rows)
+
+    def _loaded(self, generation, keys, rows):
+        if generation != self._generation:
+            return
+        for key in keys:
+            self._requested.discard(key)
+            if key in rows:
+                self.refresh(key, rows[key])